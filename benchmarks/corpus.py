@@ -0,0 +1,209 @@
+"""Generates a reproducible corpus of specfiles for the benchmarks.
+
+The corpus contains a tiny specfile, typical Fedora specfiles of perl, python,
+ruby, php and R packages and a pathological specfile of about 100000 lines
+with a huge %changelog, many subpackages and thousands of make lines, and
+a specfile with very long BuildRequires and Requires lines.
+The same seed always gives the same specfiles.
+
+Run it as a script to write the corpus to a directory:
+    python benchmarks/corpus.py DIR
+"""
+import os
+import random
+import sys
+
+DEFAULT_SEED = 2014
+
+TINY = '''Name: spam
+Version: 1.0
+Release: 1%{{?dist}}
+Summary: Spam {word}
+License: MIT
+
+%description
+Spam.
+
+%files
+'''
+
+HEADER = '''Name:           {name}
+Version:        {version}
+Release:        1%{{?dist}}
+Summary:        The {word} module for {lang}
+License:        GPLv2+
+URL:            http://example.com/{name}
+Source0:        http://example.com/{name}-%{{version}}.tar.gz
+BuildArch:      noarch
+{build_requires}
+{requires}
+Provides:       {name}-{word} = %{{version}}-%{{release}}
+Obsoletes:      {name}-{word} < 0.1
+
+%description
+This is %{{name}}, the {word} module.
+{description}
+'''
+
+LANGUAGES = {
+    'perl': {
+        'name': 'perl-{Word}-{Other}',
+        'build_requires': ['perl(ExtUtils::MakeMaker)', 'perl(Test::More) >= 0.88', 'perl({Word}::{Other})'],
+        'requires': ['perl(:MODULE_COMPAT_%(eval "`%{{__perl}} -V:version`"; echo $version))',
+                     'perl({Word})'],
+        'prep': '%setup -q -n {Word}-{Other}-%{{version}}',
+        'build': ['%{{__perl}} Makefile.PL INSTALLDIRS=vendor', 'make %{{?_smp_mflags}}'],
+        'install': ['make pure_install DESTDIR=$RPM_BUILD_ROOT',
+                    'find $RPM_BUILD_ROOT -type f -name .packlist -exec rm -f {{}} \\;',
+                    '%{{_fixperms}} $RPM_BUILD_ROOT/*'],
+        'check': ['make test'],
+        'files': ['%doc Changes README', '%{{perl_vendorlib}}/*', '%{{_mandir}}/man3/*'],
+    },
+    'python': {
+        'name': 'python-{word}',
+        'build_requires': ['python2-devel', 'python-setuptools', 'python-{other}', 'python-sphinx'],
+        'requires': ['python-{other} >= 1.0', 'python-six'],
+        'prep': '%setup -q -n {word}-%{{version}}',
+        'build': ['%{{__python}} setup.py build', 'sphinx-build docs html'],
+        'install': ['%{{__python}} setup.py install -O1 --skip-build --root %{{buildroot}}'],
+        'check': ['nosetests -v', 'py.test {word}/tests'],
+        'files': ['%doc README.rst', '%{{python_sitelib}}/{word}', '%{{python_sitelib}}/{word}-*.egg-info'],
+    },
+    'ruby': {
+        'name': 'rubygem-{word}',
+        'build_requires': ['rubygems-devel', 'rubygem(rspec)', 'rubygem({other})'],
+        'requires': ['ruby(release)', 'rubygem({other})'],
+        'prep': 'gem unpack %{{SOURCE0}}\n%setup -q -D -T -n {word}-%{{version}}\n'
+                'gem spec %{{SOURCE0}} -l --ruby > {word}.gemspec',
+        'build': ['gem build {word}.gemspec', '%gem_install'],
+        'install': ['mkdir -p %{{buildroot}}%{{gem_dir}}', 'cp -a .%{{gem_dir}}/* \\\n    %{{buildroot}}%{{gem_dir}}/'],
+        'check': ['pushd .%{{gem_instdir}}', 'rspec spec', 'testrb -Ilib test', 'popd'],
+        'files': ['%dir %{{gem_instdir}}', '%{{gem_libdir}}', '%{{gem_spec}}'],
+    },
+    'php': {
+        'name': 'php-pear-{Word}',
+        'build_requires': ['php-pear(PEAR)', 'php-channel({other})'],
+        'requires': ['php-common >= 5.3', 'php-pear(PEAR)'],
+        'prep': '%setup -q -c\ncd {Word}-%{{version}}',
+        'build': ['# Empty build section'],
+        'install': ['%{{__pear}} install --nodeps --packagingroot $RPM_BUILD_ROOT package.xml',
+                    'rm -rf $RPM_BUILD_ROOT%{{pear_metadir}}/.??*'],
+        'check': ['%{{__php}} -n run-tests.php', '%{{__pecl}} list'],
+        'files': ['%{{pear_xmldir}}/{Word}.xml', '%{{pear_phpdir}}/{Word}'],
+    },
+    'R': {
+        'name': 'R-{word}',
+        'build_requires': ['R-devel', 'tex(latex)', 'R-{other}'],
+        'requires': ['R-core', 'R-{other}'],
+        'prep': '%setup -q -c -n {word}',
+        'build': [''],
+        'install': ['mkdir -p %{{buildroot}}%{{_libdir}}/R/library',
+                    '%{{_bindir}}/R CMD INSTALL -l %{{buildroot}}%{{_libdir}}/R/library {word}'],
+        'check': ['%{{_bindir}}/R CMD check {word}'],
+        'files': ['%dir %{{_libdir}}/R/library/{word}', '%{{_libdir}}/R/library/{word}/R'],
+    },
+}
+
+WORDS = ['spam', 'eggs', 'ham', 'bacon', 'sausage', 'beans', 'toast', 'lobster',
+         'thermidor', 'truffle', 'pate', 'brandy', 'shrimp', 'sauce', 'parrot']
+
+
+def _words(rng):
+    word, other = rng.sample(WORDS, 2)
+    return {'word': word, 'other': other, 'Word': word.capitalize(), 'Other': other.capitalize()}
+
+
+def _changelog(rng, entries, lines_per_entry=3):
+    lines = []
+    for i in range(entries):
+        lines.append('* Mon Jan {0:02d} 2014 John Doe <john@doe.com> - 1.{1}-1'.format(
+            i % 28 + 1, entries - i))
+        for j in range(lines_per_entry):
+            lines.append('- {0} make install of %{{name}} {1}'.format(rng.choice(WORDS), j))
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def language_spec(lang, rng, subpackages=1, changelog_entries=5):
+    """Returns a typical specfile of a package written in lang."""
+    data = LANGUAGES[lang]
+    fmt = _words(rng)
+    fmt['lang'] = lang
+    fmt['name'] = data['name'].format(**fmt)
+    fmt['version'] = '{0}.{1}'.format(rng.randint(0, 9), rng.randint(0, 99))
+    fmt['build_requires'] = '\n'.join('BuildRequires:  ' + r.format(**fmt) for r in data['build_requires'])
+    fmt['requires'] = '\n'.join('Requires:       ' + r.format(**fmt) for r in data['requires'])
+    fmt['description'] = 'It is used with {0} and {1}.'.format(*rng.sample(WORDS, 2))
+
+    parts = [HEADER.format(**fmt)]
+    for i in range(subpackages):
+        sub = '{0}-{1}'.format(fmt['name'], WORDS[i % len(WORDS)] + str(i))
+        parts.append('%package -n {0}\nSummary: Part {1} of %{{name}}\nRequires: %{{name}} = '
+                     '%{{version}}-%{{release}}\n\n%description -n {0}\nPart {1}.\n'.format(sub, i))
+    parts.append('%prep\n' + data['prep'].format(**fmt) + '\n')
+    for section in ('build', 'install', 'check'):
+        parts.append('%{0}\n{1}\n'.format(section, '\n'.join(c.format(**fmt) for c in data[section])))
+    parts.append('%files\n' + '\n'.join(f.format(**fmt) for f in data['files']) + '\n')
+    for i in range(subpackages):
+        sub = '{0}-{1}'.format(fmt['name'], WORDS[i % len(WORDS)] + str(i))
+        parts.append('%files -n {0}\n%{{_datadir}}/{0}\n'.format(sub))
+    parts.append('%changelog\n' + _changelog(rng, changelog_entries))
+    return '\n'.join(parts)
+
+
+def pathological_spec(rng, lines=100000):
+    """Returns specfile of about given number of lines: most of them are %changelog,
+    the rest are many subpackages and thousands of make lines.
+    """
+    subpackages = lines // 100
+    make_lines = lines // 10
+    spec = language_spec('perl', rng, subpackages=subpackages, changelog_entries=lines // 6)
+    build = ['%build']
+    for i in range(make_lines):
+        build.append(rng.choice(['make %{{?_smp_mflags}} -C dir{0}', 'make -C dir{0} \\\n  V=1',
+                                 '%{{__perl}} -pi -e "s/{0}/x/" file{0}', '# make nothing {0}',
+                                 'install -m 644 file{0} %{{buildroot}}']).format(i))
+    return spec.replace('%build\n', '\n'.join(build) + '\n', 1)
+
+
+def long_requires_spec(rng, lines=20, deps_per_line=2000):
+    """Returns specfile with given number of BuildRequires and Requires lines,
+    each with many dependencies: versioned, comma separated and rich ones.
+    """
+    def dependency(i):
+        word = rng.choice(WORDS)
+        return rng.choice(['perl({0}::Mod{1})', 'python-{0}{1} >= 1.{1}', 'rubygem({0}{1}), ',
+                           '({0}{1} or {0}-compat{1})', '%{{name}}-{0}{1}%{{?_isa}} = %{{version}}-%{{release}}',
+                           '/usr/bin/{0}{1}']).format(word, i)
+
+    tags = []
+    for i in range(lines):
+        tag = 'BuildRequires' if i % 2 == 0 else 'Requires'
+        tags.append('{0}: {1}'.format(tag, ' '.join(dependency(j) for j in range(deps_per_line))))
+    return TINY.format(word=rng.choice(WORDS)).replace('\n\n%description', '\n' + '\n'.join(tags) + '\n\n%description', 1)
+
+
+def generate(seed=DEFAULT_SEED, big_lines=100000):
+    """Returns dict mapping names of the specfiles in the corpus to their text."""
+    rng = random.Random(seed)
+    corpus = {'tiny.spec': TINY.format(word=rng.choice(WORDS))}
+    for lang in sorted(LANGUAGES):
+        corpus['{0}.spec'.format(lang)] = language_spec(lang, rng, subpackages=2, changelog_entries=20)
+    corpus['pathological.spec'] = pathological_spec(rng, big_lines)
+    corpus['long-requires.spec'] = long_requires_spec(rng)
+    return corpus
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit('usage: {0} DIR'.format(sys.argv[0]))
+    directory = sys.argv[1]
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for name, text in sorted(generate().items()):
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
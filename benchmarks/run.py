@@ -0,0 +1,233 @@
+"""Benchmarks of spec2scl on the synthetic corpus (see corpus.py).
+
+Times splitting specfiles to sections, transform_one_liners,
+transform_more_liners, find_whole_commands and whole conversions of typical
+specfiles, the pathological one and one with very long dependency lines, and
+measures peak memory of converting the pathological specfile and the time
+of importing spec2scl.bin. Results are compared to a stored baseline and the
+run fails if any of them got worse by more than the threshold, or if the
+import takes longer than IMPORT_TIME_BUDGET.
+
+Timings are stored relative to a calibration loop run on the same machine,
+so a baseline recorded on one machine is roughly usable on another one.
+Still, it's best to record the baseline on the machine running the check:
+    python benchmarks/run.py --save
+    python benchmarks/run.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+import corpus  # noqa: E402
+import spec2scl.transformers  # noqa: E402
+from spec2scl.bin import default_options  # noqa: E402
+from spec2scl.convertor import Convertor  # noqa: E402
+from spec2scl.specfile import Specfile  # noqa: E402
+from spec2scl.transformer import Transformer  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+# timings of the same code on a busy machine differ by tens of percent
+DEFAULT_THRESHOLD = 1.5
+# seconds "import spec2scl.bin" may take; it took about 35 ms when this was
+# written, importing jinja2 and subprocess eagerly made it over 70 ms
+IMPORT_TIME_BUDGET = 0.07
+
+OPTIONS = default_options()
+
+COMMAND_PATTERN = r'^make\s+'
+
+
+def calibrate(repeat=20):
+    """Returns time of a fixed pure Python workload, to scale timings by."""
+    def workload():
+        lines = ['make install DESTDIR=%{buildroot} N=' + str(i) for i in range(20000)]
+        return sum(len(line.split()) for line in lines if line.startswith('make'))
+
+    return min(timeit.repeat(workload, number=1, repeat=repeat))
+
+
+def best_time(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def subtransformers():
+    return [cls(options=dict(OPTIONS)) for cls in Transformer.subtransformers]
+
+
+def transform_sections(specs, method):
+    """Returns function applying given method of every subtransformer to every
+    section of the specs.
+    """
+    transformers = subtransformers()
+    sections = [(text, Specfile(text).sections) for text in specs]
+
+    def run():
+        for text, spec_sections in sections:
+            for section in spec_sections:
+                for t in transformers:
+                    getattr(t, method)(text, section.name, section.text)
+
+    return run
+
+
+def find_commands(specs):
+    import re
+
+    pattern = re.compile(COMMAND_PATTERN, re.MULTILINE)
+    transformer = Transformer(dict(OPTIONS))
+    sections = [section.text for text in specs for section in Specfile(text).sections]
+
+    def run():
+        for text in sections:
+            transformer.find_whole_commands(pattern, text)
+
+    return run
+
+
+def convert(specs):
+    def run():
+        for text in specs:
+            str(Convertor(text, dict(OPTIONS)).convert())
+
+    return run
+
+
+def peak_memory(text):
+    """Returns peak memory (in bytes) allocated while converting text."""
+    import tracemalloc
+
+    # warm up, so that compiling the rules isn't counted
+    str(Convertor(text, dict(OPTIONS)).convert())
+    tracemalloc.start()
+    try:
+        str(Convertor(text, dict(OPTIONS)).convert())
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def import_time(repeat):
+    """Returns the best cumulative time (in seconds) of importing spec2scl.bin
+    in a new interpreter, as reported by python -X importtime.
+    """
+    times = []
+    # the first run may need to compile the sources
+    for i in range(repeat + 1):
+        process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', 'import spec2scl.bin'],
+                                   cwd=os.path.dirname(BENCHMARKS_DIR), stderr=subprocess.PIPE,
+                                   universal_newlines=True)
+        stderr = process.communicate()[1]
+        for line in stderr.splitlines():
+            fields = [f.strip() for f in line.split('|')]
+            if i and len(fields) == 3 and fields[2] == 'spec2scl.bin':
+                times.append(int(fields[1]) / 1000000.0)
+    return min(times)
+
+
+def run_benchmarks(spec_corpus, repeat):
+    """Returns dict mapping benchmark names to (value, unit)."""
+    special = ('pathological.spec', 'long-requires.spec')
+    typical = [text for name, text in sorted(spec_corpus.items()) if name not in special]
+    big = [spec_corpus['pathological.spec']]
+    groups = [('typical', typical), ('pathological', big),
+              ('long_requires', [spec_corpus['long-requires.spec']])]
+
+    # compile the rules of all transformers first
+    convert(typical)()
+
+    results = {}
+    for group, specs in groups:
+        benchmarks = [
+            ('split', lambda: [Specfile(text) for text in specs]),
+            ('one_liners', transform_sections(specs, 'transform_one_liners')),
+            ('more_liners', transform_sections(specs, 'transform_more_liners')),
+            ('find_whole_commands', find_commands(specs)),
+            ('convert', convert(specs)),
+        ]
+        for name, func in benchmarks:
+            results['{0}.{1}'.format(group, name)] = (best_time(func, repeat), 's')
+
+    if sys.version_info >= (3, 4):
+        results['pathological.peak_memory'] = (peak_memory(big[0]), 'B')
+    if sys.version_info >= (3, 7):
+        results['startup.import_time'] = (import_time(repeat), 's')
+    return results
+
+
+def normalize(results, calibration):
+    return dict((name, value / calibration if unit == 's' else value)
+                for name, (value, unit) in results.items())
+
+
+def compare(normalized, baseline, threshold):
+    """Returns list of (name, ratio, regressed) for benchmarks in both results."""
+    rows = []
+    for name in sorted(normalized):
+        if name in baseline and baseline[name] > 0:
+            ratio = normalized[name] / baseline[name]
+            rows.append((name, ratio, ratio > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark spec2scl on a synthetic corpus.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='Baseline file (default: %(default)s).')
+    parser.add_argument('--save', action='store_true',
+                        help='Store the results as the new baseline instead of comparing.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Fail if a result is worse than the baseline times this (default: %(default)s).')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of runs of each benchmark, the best one counts (default: %(default)s).')
+    parser.add_argument('--seed', type=int, default=corpus.DEFAULT_SEED,
+                        help='Seed of the corpus (default: %(default)s).')
+    parser.add_argument('--lines', type=int, default=100000,
+                        help='Approximate number of lines of the pathological specfile (default: %(default)s).')
+    args = parser.parse_args()
+
+    spec_corpus = corpus.generate(args.seed, args.lines)
+    calibration = calibrate()
+    results = run_benchmarks(spec_corpus, args.repeat)
+    normalized = normalize(results, calibration)
+
+    print('{0:40} {1:>14}'.format('benchmark', 'result'))
+    for name, (value, unit) in sorted(results.items()):
+        shown = '{0:.2f} ms'.format(value * 1000) if unit == 's' else '{0:.1f} MiB'.format(value / 1048576.0)
+        print('{0:40} {1:>14}'.format(name, shown))
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'seed': args.seed, 'lines': args.lines, 'results': normalized},
+                      f, indent=4, sort_keys=True)
+            f.write('\n')
+        print('Baseline saved to {0}.'.format(args.baseline))
+        return
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except IOError:
+        sys.exit('No baseline in {0}, record one with --save.'.format(args.baseline))
+    if (baseline['seed'], baseline['lines']) != (args.seed, args.lines):
+        sys.exit('Baseline was recorded with a different corpus.')
+
+    rows = compare(normalized, baseline['results'], args.threshold)
+    print('')
+    print('{0:40} {1:>14}'.format('compared to baseline', 'ratio'))
+    for name, ratio, regressed in rows:
+        print('{0:40} {1:>13.2f}x{2}'.format(name, ratio, '  REGRESSION' if regressed else ''))
+    over_budget = results.get('startup.import_time', (0, 's'))[0] > IMPORT_TIME_BUDGET
+    if over_budget:
+        print('Importing spec2scl.bin takes over {0:.0f} ms.'.format(IMPORT_TIME_BUDGET * 1000))
+    if over_budget or any(regressed for name, ratio, regressed in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
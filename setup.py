@@ -49,7 +49,9 @@ setup(
                     ] + install_requires,
     install_requires=install_requires,
     cmdclass={'test': PyTest},
-    entry_points={'console_scripts': ['spec2scl = spec2scl.bin:main']},
+    entry_points={'console_scripts': ['spec2scl = spec2scl.bin:main',
+                                      'spec2scl-client = spec2scl.client:main',
+                                      'spec2scl-index = spec2scl.index:main']},
     classifiers=['Development Status :: 4 - Beta',
                  'Environment :: Console',
                  'Intended Audience :: Developers',
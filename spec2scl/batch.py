@@ -0,0 +1,326 @@
+import heapq
+import json
+import os
+
+from spec2scl.convertor import Convertor
+from spec2scl.incremental import IncrementalState
+
+# arguments of convert_parallel's func in a worker process, followed by func itself
+_worker_args = ()
+# seconds convert_parallel waits for a result before checking that no worker was killed
+_POLL_INTERVAL = 0.5
+
+
+def read_spec(path):
+    with open(path) as f:
+        return f.read()
+
+
+def write_spec(path, text):
+    """Replaces the file at path (or the file it links to) with text (or bytes)
+    atomically: text is written to a temporary file in the same directory,
+    which is then renamed over the original, keeping its permissions.
+    """
+    import tempfile
+
+    path = os.path.realpath(path)
+    fd, tmp_path = tempfile.mkstemp(prefix='.{0}.'.format(os.path.basename(path)),
+                                    dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(text, bytes) else 'w') as f:
+            f.write(text)
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.rename(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def iter_paths(f, delimiter='\n', chunk_size=65536):
+    """Yields paths read from a file object, without reading it all at once.
+    Empty items are skipped.
+    """
+    rest = ''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        items = (rest + chunk).split(delimiter)
+        rest = items.pop()
+        for item in items:
+            if item:
+                yield item
+    if rest:
+        yield rest
+
+
+def new_result(path):
+    """Returns result of processing the specfile at path, see convert_path,
+    with nothing done yet.
+    """
+    return {'path': path, 'converted': None, 'changed': False, 'cache': None,
+            'skipped': None, 'stats': None, 'error': None}
+
+
+def convert_path(path, options, cache=None, state_dir=None):
+    """Converts the specfile at given path, using the cache if given. If state_dir
+    is given, sections converted in previous runs are kept there and reused.
+    Returns: dict with 'path', 'converted' (text, None on error), 'changed' (whether
+        the converted text differs from the original), 'cache' ('hit', 'miss'
+        or None if no cache was used), 'skipped' (names of the transformers that
+        were skipped, None if nothing was transformed), 'stats' (ConversionStats
+        of this specfile if options['stats'] is set, else None) and 'error'
+        (message or None)
+    """
+    result = new_result(path)
+    try:
+        spec = read_spec(path)
+    except (IOError, UnicodeError) as e:
+        result['error'] = 'Could not open file: {0}'.format(e)
+        return result
+
+    try:
+        state = None
+        if state_dir:
+            state = IncrementalState(state_dir, path, options)
+        options = dict(options)
+        if options.get('stats') is not None:
+            # collected separately, so that they can be sent back from a worker process
+            from spec2scl.stats import ConversionStats
+            options['stats'] = result['stats'] = ConversionStats()
+        convertor = Convertor(spec=spec, options=options, cache=cache, state=state)
+        result['converted'] = str(convertor.convert())
+        result['changed'] = result['converted'] != spec
+        if convertor.cache_hit is not None:
+            result['cache'] = 'hit' if convertor.cache_hit else 'miss'
+        result['skipped'] = convertor.skipped_transformers
+    except Exception as e:
+        result['error'] = 'Could not convert {0}: {1}'.format(path, e)
+
+    return result
+
+
+def check_path(path, options, cache=None, state_dir=None):
+    """Checks whether the specfile at given path is SCL ready, see Convertor.check.
+    The cache and state_dir are not used, they are accepted so that it can be
+    used instead of convert_path.
+    Returns: convert_path-like result with 'converted' always None, 'changed' True
+        if the specfile is not SCL ready and 'change' (transformer name, function
+        name, section name) of the first rule that would rewrite it, or None
+    """
+    result = new_result(path)
+    result['change'] = None
+    try:
+        spec = read_spec(path)
+    except (IOError, UnicodeError) as e:
+        result['error'] = 'Could not open file: {0}'.format(e)
+        return result
+
+    try:
+        result['change'] = Convertor(spec=spec, options=options).check()
+        result['changed'] = result['change'] is not None
+    except Exception as e:
+        result['error'] = 'Could not check {0}: {1}'.format(path, e)
+
+    return result
+
+
+def preload_transformers(options):
+    """Imports all transformers and compiles their rules for given options."""
+    import spec2scl.transformers
+    from spec2scl import transformer
+
+    for t in transformer.Transformer.subtransformers:
+        t.get_rule_table(options.get('skip_functions', []))
+
+
+def spec_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def convert_serial(paths, options, cache=None, state_dir=None, func=convert_path):
+    """Converts specfiles one by one.
+    Args:
+        func: function to process each path with, convert_path or check_path
+    Yields: func results
+    """
+    for path in paths:
+        yield func(path, options, cache, state_dir)
+
+
+def _init_worker(*args):
+    global _worker_args
+    _worker_args = args
+    preload_transformers(args[0])
+
+
+def _convert_in_worker(path):
+    func = _worker_args[-1]
+    try:
+        return func(path, *_worker_args[:-1])
+    except Exception as e:
+        # otherwise the pool would never call back with a result
+        return _error_result(path, e)
+
+
+def _error_result(path, error):
+    result = new_result(path)
+    result['error'] = 'Could not convert {0}: {1}'.format(path, error)
+    return result
+
+
+def _worker_pids(pool):
+    # workers only exit when the pool is closed, so if the pids change, one was
+    # killed (e.g. by the OOM killer) and its conversion will never finish
+    return set(process.pid for process in pool._pool)
+
+
+def convert_parallel(paths, options, jobs, window=None, cache=None, state_dir=None, func=convert_path):
+    """Converts specfiles in a pool of worker processes.
+
+    Only a bounded number of paths is read ahead from paths (which may be a
+    generator) and at most 2 * jobs specfiles are being converted at a time.
+    Of the paths read ahead, the biggest specfiles are started first, so that
+    they don't hold up the end of the run.
+    If a worker process is killed, the rest is converted by a new pool and the
+    specfiles being converted at that time are converted again, one at a time,
+    so that only the one that kills a worker again is reported as an error.
+    Args:
+        func: function to process each path with, convert_path or check_path
+    Yields: func results in the order in which conversions finish
+    """
+    import multiprocessing
+    try:
+        import queue
+    except ImportError:
+        import Queue as queue
+
+    window = window or jobs * 8
+    paths = iter(paths)
+    pending = []  # heap of (-size, sequence number, path)
+    sequence = 0
+    retry = []  # (sequence number, path) of conversions to run again, alone
+    retried = set()
+
+    def start_pool():
+        new_pool = multiprocessing.Pool(jobs, _init_worker, (options, cache, state_dir, func))
+        return new_pool, _worker_pids(new_pool), queue.Queue(), {}
+
+    # results are put to the queue as (sequence number, result), running maps
+    # sequence numbers of the conversions in progress to their paths
+    pool, pids, results, running = start_pool()
+    try:
+        while True:
+            for path in paths:
+                heapq.heappush(pending, (-spec_size(path), sequence, path))
+                sequence += 1
+                if len(pending) >= window:
+                    break
+            while (retry or pending) and len(running) < (1 if retry else 2 * jobs):
+                if retry:
+                    if running:
+                        break
+                    number, path = retry.pop(0)
+                    retried.add(number)
+                else:
+                    size, number, path = heapq.heappop(pending)
+
+                def callback(result, number=number, results=results):
+                    results.put((number, result))
+
+                pool.apply_async(_convert_in_worker, (path, ), callback=callback)
+                running[number] = path
+            if not running:
+                break
+            try:
+                number, result = results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if _worker_pids(pool) == pids:
+                    continue
+                pool.terminate()
+                pool.join()
+                for number in sorted(running):
+                    if number in retried:
+                        yield _error_result(running[number], 'worker process exited unexpectedly')
+                    else:
+                        retry.append((number, running[number]))
+                pool, pids, results, running = start_pool()
+                continue
+            del running[number]
+            yield result
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def read_manifest(f):
+    """Reads metapackages to generate from a manifest file object. Each line
+    contains name of a metapackage, optionally followed by whitespace and
+    a comma separated list of variables in the same format as --variables.
+    Empty lines and lines starting with '#' are skipped.
+    Yields: (name, variables) tuples, variables is None if not given
+    """
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split(None, 1)
+        yield fields[0], fields[1] if len(fields) > 1 else None
+
+
+def convert_manifest(entries, options, output_dir):
+    """Generates metapackage specfiles into output_dir as <name>.spec, all with
+    one template environment. Files that already have the same content are
+    not written again.
+    Args:
+        entries: (name, variables) tuples as returned by read_manifest, if
+            variables is None, options['variables'] are used
+    Yields: convert_path-like results with 'path' being the generated specfile
+    """
+    for name, variables in entries:
+        path = os.path.join(output_dir, name + '.spec')
+        result = new_result(path)
+        try:
+            meta_options = dict(options, meta_spec=True)
+            if variables is not None:
+                meta_options['variables'] = variables
+            result['converted'] = Convertor(spec=name, options=meta_options).convert()
+        except Exception as e:
+            result['error'] = 'Could not generate {0}: {1}'.format(name, e)
+            yield result
+            continue
+
+        try:
+            result['changed'] = read_spec(path) != result['converted']
+        except IOError:
+            result['changed'] = True
+        if result['changed']:
+            try:
+                if not os.path.isdir(output_dir):
+                    os.makedirs(output_dir)
+                write_spec(path, result['converted'])
+            except (IOError, OSError) as e:
+                result['error'] = 'Could not write file: {0}'.format(e)
+        yield result
+
+
+def progress_record(result):
+    """Returns one-line JSON record describing a convert_path result."""
+    if result['error']:
+        record = {'path': result['path'], 'status': 'error', 'error': result['error']}
+    else:
+        record = {'path': result['path'], 'status': 'changed' if result['changed'] else 'unchanged'}
+    if result['cache']:
+        record['cache'] = result['cache']
+    return json.dumps(record, sort_keys=True)
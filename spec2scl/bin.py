@@ -1,23 +1,36 @@
 import argparse
+import os
 import sys
 
+from spec2scl import batch
+from spec2scl import cache
+from spec2scl import settings
+from spec2scl.contents import SclContents
 from spec2scl.convertor import Convertor
 
 
+def server_socket():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or cache.default_directory()
+    return os.path.join(runtime_dir, 'spec2scl.sock')
+
+
 def handle_scl_deps(no_deps_convert, args_list_file):
     scl_deps = True
     if no_deps_convert:
         scl_deps = False
     elif args_list_file:
-        scl_deps = []
-        with open(args_list_file) as l:
-            for i in l.readlines():
-                scl_deps.append(i.strip())
+        from spec2scl import index
+
+        names = index.read_names(args_list_file)
+        if names is None:
+            scl_deps = SclContents.from_file(args_list_file)
+        else:
+            scl_deps = SclContents(names)
 
     return scl_deps
 
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(description='Convert RPM specfile to be SCL ready.')
     parser.add_argument('specfiles',
                         help='Paths to the specfiles or name of the meta package, see --meta-specfile.',
@@ -29,11 +42,64 @@ def main():
                         action='store_true',
                         help='If used, spec2scl will produce metapackage specfile based on ARGUMENT, ARGUMENT must be the metapackage name, see SCL docs for metapackage naming.',
                         )
+    parser.add_argument('--manifest',
+                        required=False,
+                        metavar='FILE',
+                        help='Generate metapackage specfiles listed in FILE ("-" for stdin), one per line: metapackage name, optionally followed by variables in the format of --variables. Implies --meta-specfile.',
+                        )
+    parser.add_argument('-o', '--output-dir',
+                        required=False,
+                        metavar='DIR',
+                        default='.',
+                        help='Directory to write the specfiles generated from --manifest or converted with --git to (default: current directory).',
+                        )
+    parser.add_argument('--git',
+                        required=False,
+                        action='store_true',
+                        help='ARGUMENTs are git repositories, convert specfiles committed in them without checking them out and write them to --output-dir/<repository name>/ (or see --write-tree).',
+                        )
+    parser.add_argument('--git-rev',
+                        required=False,
+                        metavar='REV',
+                        default='HEAD',
+                        help='Revision to convert specfiles of with --git (default: %(default)s).',
+                        )
+    parser.add_argument('--git-since',
+                        required=False,
+                        metavar='REV',
+                        help='With --git, only convert specfiles added or changed between REV and --git-rev.',
+                        )
+    parser.add_argument('--write-tree',
+                        required=False,
+                        action='store_true',
+                        help='With --git, store the converted specfiles in each repository as a tree object (--git-rev with the specfiles replaced) and print "<repository> <tree>", instead of writing them to --output-dir.',
+                        )
     parser.add_argument('-i',
                         help='Convert in place (replaces old specfiles with the new generated ones). Mandatory when multiple specfiles are to be converted.',
                         required=False,
                         action='store_true'
                         )
+    parser.add_argument('-j', '--jobs',
+                        required=False,
+                        type=int,
+                        default=1,
+                        help='Number of specfiles to convert (or check) in parallel, used only with -i and --check (default: 1).',
+                        )
+    parser.add_argument('--files-from',
+                        required=False,
+                        metavar='FILE',
+                        help='Convert in place specfiles listed in FILE (one per line), or NUL-separated on stdin if FILE is "-".',
+                        )
+    parser.add_argument('--progress',
+                        required=False,
+                        action='store_true',
+                        help='When converting in place, print a JSON record about each converted specfile to stderr.',
+                        )
+    parser.add_argument('--check',
+                        required=False,
+                        action='store_true',
+                        help='Don\'t convert the specfiles, only print those that are not SCL ready yet (and the first rule that would change them) and exit with 1 if there are any.',
+                        )
     parser.add_argument('-m', '--meta-runtime-dep',
                         required=False,
                         help='If used, runtime dependency on the scl runtime package will be added. The dependency is not added by default.',
@@ -44,12 +110,88 @@ def main():
                         default="",
                         help='Comma separated list of transformer functions to skip',
                         )
+    parser.add_argument('-t', '--transformers',
+                        required=False,
+                        help='Comma separated list of transformers to use (e.g. generic,perl). By default, only transformers that can change the specfile are used.',
+                        )
+    parser.add_argument('--pass-through',
+                        required=False,
+                        metavar='SECTIONS',
+                        help='Comma separated list of sections (e.g. %%changelog) to copy to the output as they are, without applying any rules to them.',
+                        )
+    parser.add_argument('--fused',
+                        required=False,
+                        action='store_true',
+                        help='Find all commands to wrap in scl enable in one pass over each section, instead of one pass per transformer. A command matched by more transformers is only wrapped once.',
+                        )
+    parser.add_argument('--verbose',
+                        required=False,
+                        action='store_true',
+                        help='Print the transformers that were skipped for each specfile to stderr.',
+                        )
+    parser.add_argument('--stats',
+                        required=False,
+                        action='store_true',
+                        help='Print how many times each transformer rule was used and how long it took to stderr.',
+                        )
+    parser.add_argument('--stats-json',
+                        required=False,
+                        metavar='FILE',
+                        help='Write the statistics collected as for --stats to FILE as JSON.',
+                        )
     parser.add_argument('-v', '--variables',
                         required=False,
                         default="",
                         help='List of variables separated with comma, used only with --meta-specfile option',
                         )
 
+    parser.add_argument('--cache-dir',
+                        required=False,
+                        metavar='DIR',
+                        default=cache.default_directory(),
+                        help='Directory to cache converted specfiles in with --cache (default: %(default)s).',
+                        )
+    parser.add_argument('--cache-size',
+                        required=False,
+                        metavar='MB',
+                        type=int,
+                        default=cache.DEFAULT_MAX_SIZE // (1024 * 1024),
+                        help='Maximum size of the cache, least recently used entries are removed when it grows bigger (default: %(default)s).',
+                        )
+    parser.add_argument('--cache',
+                        required=False,
+                        action='store_true',
+                        help='Cache converted specfiles (and the metapackage template) in --cache-dir and reuse them.',
+                        )
+    parser.add_argument('--no-cache',
+                        required=False,
+                        dest='cache',
+                        action='store_false',
+                        help='Don\'t use the cache of converted specfiles (the default).',
+                        )
+    parser.add_argument('--incremental',
+                        required=False,
+                        action='store_true',
+                        help='Remember converted sections of each specfile (in the cache directory) and only convert sections that changed since the last run.',
+                        )
+
+    parser.add_argument('--serve',
+                        required=False,
+                        action='store_true',
+                        help='Run as a daemon converting specfiles sent by spec2scl-client over a Unix socket, see --socket.',
+                        )
+    parser.add_argument('--socket',
+                        required=False,
+                        metavar='PATH',
+                        default=server_socket(),
+                        help='Unix socket of the daemon (default: %(default)s).',
+                        )
+    parser.add_argument('--server-counters',
+                        required=False,
+                        action='store_true',
+                        help='Print request counters of the daemon listening on --socket and exit.',
+                        )
+
     grp = parser.add_mutually_exclusive_group(required=False)
     grp.add_argument('-n', '--no-deps-convert',
                      required=False,
@@ -58,62 +200,397 @@ def main():
                      )
     grp.add_argument('-l', '--list-file',
                      required=False,
-                     help='List of the packages/provides, that will be in the SCL (to convert Requires/BuildRequires properly).',
+                     help='List of the packages/provides, that will be in the SCL (to convert Requires/BuildRequires properly). '
+                          'Entries may contain * and ? wildcards, or be regexes prefixed with "re:". '
+                          'An index created by spec2scl-index can be used instead.',
                      metavar='SCL_CONTENTS_LIST'
                      )
 
-    args = parser.parse_args()
+    return parser
+
+
+def convertor_options(args):
+    """Returns options for Convertor given by the parsed command line arguments.
+    Raises: IOError if the SCL contents list can't be read, ValueError if it's invalid
+    """
+    transformers = None
+    if args.transformers is not None:
+        transformers = [t for t in args.transformers.split(',') if t]
+
+    pass_through_sections = None
+    if args.pass_through is not None:
+        pass_through_sections = [s if s.startswith('%') else '%' + s
+                                 for s in args.pass_through.split(',') if s]
+
+    return {'scl_deps': handle_scl_deps(args.no_deps_convert, args.list_file),
+            'meta_runtime_dep': args.meta_runtime_dep,
+            'skip_functions': args.skip_functions.split(','),
+            'transformers': transformers,
+            'pass_through_sections': pass_through_sections,
+            'fused': args.fused,
+            'variables': args.variables,
+            'meta_spec': args.meta_specfile}
 
-    if len(args.specfiles) > 1 and not args.i:
+
+def default_options(**options):
+    """Returns options for Convertor with the defaults of the command line,
+    updated by the given ones.
+    """
+    defaults = convertor_options(build_parser().parse_args([]))
+    defaults.update(options)
+    return defaults
+
+
+def parse_args(parser, argv=None):
+    """Parses and checks the command line arguments.
+    Returns: (args, whether to read the specfile from stdin, options for Convertor)
+    """
+    args = parser.parse_args(argv)
+    without_specfiles = args.serve or args.server_counters
+
+    if without_specfiles and (args.specfiles or args.files_from or args.manifest or args.i):
+        parser.error('--serve and --server-counters don\'t take any specfiles.')
+
+    if args.manifest:
+        if args.specfiles or args.files_from or args.i:
+            parser.error('--manifest can\'t be used with specfiles, --files-from or -i.')
+        args.meta_specfile = True
+
+    if args.git:
+        if args.files_from or args.i or args.manifest or args.meta_specfile or without_specfiles:
+            parser.error('--git can\'t be used with --files-from, -i, --manifest, --meta-specfile or --serve.')
+        if not args.specfiles:
+            parser.error('You must specify git repositories to convert specfiles from.')
+    elif args.git_since or args.write_tree:
+        parser.error('--git-since and --write-tree can only be used with --git.')
+
+    from_stdin = (not sys.stdin.isatty() and args.files_from != '-' and not args.manifest and
+                  not without_specfiles and not args.git)
+
+    if args.check and (args.manifest or args.meta_specfile or args.git or without_specfiles):
+        parser.error('--check can\'t be used with --manifest, --meta-specfile, --git or --serve.')
+
+    if len(args.specfiles) > 1 and not args.i and not args.git and not args.check:
         parser.error('You can only convert more specfiles using -i (in place) mode.')
 
-    if len(args.specfiles) == 0 and sys.stdin.isatty():
+    if args.files_from and args.meta_specfile:
+        parser.error('--files-from can\'t be used with --meta-specfile.')
+
+    if args.files_from:
+        args.i = True
+    elif len(args.specfiles) == 0 and not from_stdin and not args.manifest and not without_specfiles:
         parser.error('You must either specify specfile(s) or reading from stdin.')
 
-    if len(args.specfiles) > 0 and not sys.stdin.isatty():
+    if len(args.specfiles) > 0 and from_stdin:
         parser.error(
             'You must either specify specfile(s) or reading from stdin, not both.')
 
+    if args.jobs < 1:
+        parser.error('Number of jobs must be at least 1.')
+
     try:
-        scl_deps = handle_scl_deps(args.no_deps_convert, args.list_file)
+        options = convertor_options(args)
     except IOError as e:
         print('Could not open file: {0}'.format(e))
         sys.exit(1)
+    except ValueError as e:
+        parser.error('{0}: {1}'.format(args.list_file, e))
+
+    if options['transformers'] is not None:
+        unknown = sorted(set(options['transformers']) - set(transformer_names()))
+        if unknown:
+            parser.error('Unknown transformer(s): {0} (available: {1}).'.format(
+                ', '.join(unknown), ', '.join(sorted(transformer_names()))))
+
+    if options['pass_through_sections'] is not None:
+        unknown = sorted(set(options['pass_through_sections']) - set(settings.SPECFILE_SECTIONS))
+        if unknown:
+            parser.error('Unknown section(s): {0}.'.format(', '.join(unknown)))
+
+    return args, from_stdin, options
+
+
+def main():
+    parser = build_parser()
+    args, from_stdin, options = parse_args(parser)
+    execute(args, options, from_stdin)
+
+
+def execute(args, options, from_stdin):
+    if args.serve:
+        from spec2scl import server
+        server.serve(args, options, create_cache(args))
+    elif args.server_counters:
+        from spec2scl import server
+        if not server.print_counters(args.socket):
+            sys.exit(1)
+    else:
+        run(args, options, from_stdin)
+
+
+def create_cache(args):
+    if not args.cache:
+        return None
+    return cache.ConversionCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+
+def run(args, options, from_stdin):
+    """Does what the arguments say in this process."""
+    conversion_cache = None
+    if args.cache:
+        conversion_cache = create_cache(args)
+        options['template_cache'] = os.path.join(args.cache_dir, 'templates')
+
+    if args.manifest:
+        if not convert_manifest(args, options):
+            sys.exit(1)
+    elif args.check:
+        if not check_specfiles(args, options, from_stdin):
+            sys.exit(1)
+    elif args.meta_specfile:
+        print(Convertor(spec=args.specfiles, options=options).convert())
+    elif args.git:
+        if args.stats or args.stats_json:
+            from spec2scl.stats import ConversionStats
+            options['stats'] = ConversionStats()
+        ok = convert_git(args, options, conversion_cache)
+        if options.get('stats') is not None:
+            report_stats(args, options['stats'])
+        if not ok:
+            sys.exit(1)
+    else:
+        if args.stats or args.stats_json:
+            from spec2scl.stats import ConversionStats
+            options['stats'] = ConversionStats()
+        ok = convert_specfiles(args, options, conversion_cache, from_stdin)
+        if options.get('stats') is not None:
+            report_stats(args, options['stats'])
+        if not ok:
+            sys.exit(1)
+
+
+def convert_specfiles(args, options, conversion_cache, from_stdin):
+    """Converts the specfiles given by args.
+    Returns: True if all of them were converted
+    """
+    if args.i:
+        return convert_in_place(args, options, conversion_cache)
+    elif from_stdin:
+        convertor = Convertor(spec=sys.stdin.read(), options=options, cache=conversion_cache)
+        print_converted(convertor.convert())
+        if args.verbose:
+            report_skipped('<stdin>', convertor.skipped_transformers)
+    else:
+        result = batch.convert_path(args.specfiles[0], options, conversion_cache,
+                                    args.cache_dir if args.incremental else None)
+        if result['stats'] is not None:
+            options['stats'].merge(result['stats'])
+        if result['error']:
+            print(result['error'])
+            return False
+        print(result['converted'])
+        if args.verbose:
+            report_skipped(result['path'], result['skipped'])
+    return True
+
+
+def print_converted(converted):
+    """Prints converted specfile (text or Specfile) to stdout; a Specfile is
+    written section by section, without joining it into one string.
+    """
+    if isinstance(converted, str):
+        print(converted)
+    else:
+        converted.write(sys.stdout)
+        sys.stdout.write('\n')
+
+
+def report_stats(args, stats):
+    if args.stats:
+        sys.stderr.write(stats.format_table() + '\n')
+    if args.stats_json:
+        try:
+            with open(args.stats_json, 'w') as f:
+                f.write(stats.to_json() + '\n')
+        except IOError as e:
+            print('Could not write file: {0}'.format(e))
+
 
-    specs = []
-    converted = []
-    if args.meta_specfile:
-        specs.append(args.specfiles)
+def transformer_names():
+    import spec2scl.transformers
+    from spec2scl import detect
+    from spec2scl.transformer import Transformer
+
+    return [detect.transformer_name(t) for t in Transformer.subtransformers]
+
+
+def report_skipped(path, skipped):
+    if skipped is None:
+        message = 'not transformed (cached)'
+    elif skipped:
+        message = 'skipped transformers: {0}'.format(', '.join(skipped))
     else:
-        for specfile in args.specfiles:
-            try:
-                with open(specfile) as f:
-                    specs.append(f.readlines())
-            except IOError as e:
-                print('Could not open file: {0}'.format(e))
-                sys.exit(1)
-
-    if not sys.stdin.isatty():
-        specs.append(sys.stdin.readlines())
-
-    for spec in specs:
-        options = {'scl_deps': scl_deps,
-                   'meta_runtime_dep': args.meta_runtime_dep,
-                   'skip_functions': args.skip_functions.split(','),
-                   'variables': args.variables,
-                   'meta_spec': args.meta_specfile}
-
-        convertor = Convertor(spec=spec, options=options)
-        converted.append(convertor.convert())
-
-    for i, conv in enumerate(converted):
-        if not args.i:
-            print(conv)
+        message = 'no transformers skipped'
+    sys.stderr.write('{0}: {1}\n'.format(path, message))
+
+
+def iter_specfiles(args):
+    for path in args.specfiles:
+        yield path
+    if args.files_from == '-':
+        for path in batch.iter_paths(sys.stdin, '\0'):
+            yield path
+    elif args.files_from:
+        with open(args.files_from) as f:
+            for path in batch.iter_paths(f):
+                yield path
+
+
+def count_result(args, counts, result):
+    """Counts a batch result in counts as failed (printing its error), changed
+    or unchanged, and reports its progress if args ask for it.
+    """
+    if result['error']:
+        print(result['error'])
+        counts['failed'] += 1
+    elif result['changed']:
+        counts['changed'] += 1
+    else:
+        counts['unchanged'] += 1
+    if args.progress:
+        sys.stderr.write(batch.progress_record(result) + '\n')
+
+
+def convert_manifest(args, options):
+    """Generates all metapackages listed in the manifest.
+    Returns: True if all of them were generated and written
+    """
+    counts = {'changed': 0, 'unchanged': 0, 'failed': 0}
+    try:
+        if args.manifest == '-':
+            entries = list(batch.read_manifest(sys.stdin))
         else:
-            try:
-                f = open(args.specfiles[i], 'w')
-                f.write(str(conv))
-            except IOError as e:
-                print('Could not open file: {0}'.format(e))
-            else:
-                f.close()
+            with open(args.manifest) as f:
+                entries = list(batch.read_manifest(f))
+    except IOError as e:
+        print('Could not open file: {0}'.format(e))
+        return False
+
+    for result in batch.convert_manifest(entries, options, args.output_dir):
+        count_result(args, counts, result)
+
+    print('{changed} metapackage(s) written, {unchanged} unchanged, {failed} failed.'.format(**counts))
+    return counts['failed'] == 0
+
+
+def check_specfiles(args, options, from_stdin):
+    """Prints the specfiles that are not SCL ready, see Convertor.check.
+    Returns: True if all of them are SCL ready
+    """
+    if from_stdin:
+        result = batch.new_result('<stdin>')
+        result['change'] = Convertor(spec=sys.stdin.read(), options=options).check()
+        result['changed'] = result['change'] is not None
+        results = [result]
+    elif args.jobs > 1:
+        results = batch.convert_parallel(iter_specfiles(args), options, args.jobs, func=batch.check_path)
+    else:
+        results = batch.convert_serial(iter_specfiles(args), options, func=batch.check_path)
+
+    counts = {'changed': 0, 'unchanged': 0, 'failed': 0}
+    try:
+        for result in results:
+            if result['changed'] and not result['error']:
+                print('{0}: {2} ({1}) would change {3}'.format(result['path'], *result['change']))
+            count_result(args, counts, result)
+    except IOError as e:
+        print('Could not open file: {0}'.format(e))
+        counts['failed'] += 1
+
+    sys.stderr.write('{changed} specfile(s) not SCL ready, {unchanged} ready, {failed} failed.\n'.format(**counts))
+    return counts['changed'] == 0 and counts['failed'] == 0
+
+
+def convert_git(args, options, conversion_cache=None):
+    """Converts specfiles committed in the git repositories given as args.specfiles,
+    reading each repository in one pass through git cat-file --batch.
+    Returns: True if all specfiles were converted and written
+    """
+    from spec2scl import gitsource
+
+    counts = {'changed': 0, 'unchanged': 0, 'failed': 0}
+    for repo_path in args.specfiles:
+        repo = gitsource.GitRepository(repo_path)
+        name = os.path.basename(os.path.abspath(repo_path))
+        if name.endswith('.git'):
+            name = name[:-len('.git')]
+        tree_files = {}
+        try:
+            for result in gitsource.convert_repository(repo, options, args.git_rev, args.git_since,
+                                                       conversion_cache):
+                if result['error'] is None:
+                    if args.write_tree:
+                        if result['changed']:
+                            tree_files[result['path']] = result['converted']
+                    else:
+                        try:
+                            gitsource.write_output(os.path.join(args.output_dir, name), result)
+                        except (IOError, OSError, UnicodeError) as e:
+                            result['error'] = 'Could not write file: {0}'.format(e)
+                result['path'] = '{0}:{1}'.format(repo_path, result['path'])
+                if args.verbose and not result['error']:
+                    report_skipped(result['path'], result['skipped'])
+                count_result(args, counts, result)
+            if args.write_tree:
+                print('{0} {1}'.format(repo_path, repo.write_tree(args.git_rev, tree_files)))
+        except gitsource.GitError as e:
+            print(e)
+            counts['failed'] += 1
+        finally:
+            repo.close()
+
+    print('{changed} specfile(s) changed, {unchanged} unchanged, {failed} failed.'.format(**counts))
+    return counts['failed'] == 0
+
+
+def convert_in_place(args, options, conversion_cache=None, results=None):
+    """Converts specfiles one at a time (or a bounded number of them in parallel)
+    and writes each of them back as soon as it is converted, unless the
+    conversion didn't change it.
+    Args:
+        results: convert_path results of the specfiles converted elsewhere,
+            e.g. by the daemon (see client.py), instead of converting them here
+    Returns: True if all specfiles were converted and written
+    """
+    if results is None:
+        paths = iter_specfiles(args)
+        state_dir = args.cache_dir if args.incremental else None
+        if args.jobs > 1:
+            results = batch.convert_parallel(paths, options, args.jobs, cache=conversion_cache,
+                                             state_dir=state_dir)
+        else:
+            results = batch.convert_serial(paths, options, conversion_cache, state_dir)
+
+    counts = {'changed': 0, 'unchanged': 0, 'failed': 0, 'hit': 0, 'miss': 0}
+    try:
+        for result in results:
+            if result['changed']:
+                try:
+                    batch.write_spec(result['path'], result['converted'])
+                except (IOError, OSError, UnicodeError) as e:
+                    result['error'] = 'Could not write file: {0}'.format(e)
+            if result['cache']:
+                counts[result['cache']] += 1
+            if result.get('stats') is not None:
+                options['stats'].merge(result['stats'])
+            if args.verbose and not result['error']:
+                report_skipped(result['path'], result['skipped'])
+            count_result(args, counts, result)
+    except IOError as e:
+        print('Could not open file: {0}'.format(e))
+        counts['failed'] += 1
+
+    print('{changed} specfile(s) changed, {unchanged} unchanged, {failed} failed.'.format(**counts))
+    if conversion_cache is not None or counts['hit'] or counts['miss']:
+        print('Cache: {hit} hit(s), {miss} miss(es).'.format(**counts))
+    return counts['failed'] == 0
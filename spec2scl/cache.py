@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+
+from spec2scl.contents import SclContents
+from spec2scl.version import version
+
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+
+# options that affect the result of converting a (non-meta) specfile
+KEY_OPTIONS = ('scl_deps', 'skip_functions', 'meta_runtime_dep', 'transformers',
+               'pass_through_sections', 'fused')
+
+_code_signature = None
+
+
+def default_directory():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(cache_home, 'spec2scl')
+
+
+def code_signature():
+    """Returns hash of spec2scl version and sources of all its modules (including
+    transformers), so that results of a different spec2scl are never reused.
+    """
+    global _code_signature
+    if _code_signature is None:
+        digest = hashlib.sha256(version.encode('utf-8'))
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        for dirpath, dirnames, filenames in sorted(os.walk(package_dir)):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith('.py'):
+                    path = os.path.join(dirpath, filename)
+                    digest.update(os.path.relpath(path, package_dir).encode('utf-8'))
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+        _code_signature = digest.hexdigest()
+
+    return _code_signature
+
+
+def options_signature(options):
+    """Returns JSON string of the options that affect the conversion."""
+    key = {}
+    for name in KEY_OPTIONS:
+        value = options.get(name)
+        if name == 'skip_functions':
+            value = sorted(set(value or []) - set(['']))
+        elif isinstance(value, SclContents):
+            value = value.entries()
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            value = sorted(value)
+        key[name] = value
+    return json.dumps(key, sort_keys=True)
+
+
+class ConversionCache(object):
+    """On-disk cache of converted specfiles.
+
+    Entries are keyed by hash of the specfile text, the conversion options and
+    the spec2scl code. When the cache grows over max_size bytes, the least
+    recently used entries are removed. The size of the cache is kept in a file
+    updated by every put, so that the entries are only walked when evicting
+    (or if the file is missing).
+    """
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory or default_directory()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, spec, options):
+        digest = hashlib.sha256()
+        for part in (code_signature(), options_signature(options), spec):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, 'v1', key[:2], key)
+
+    def get(self, key):
+        """Returns the cached converted text or None, counting hits and misses."""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                text = f.read().decode('utf-8')
+            os.utime(path, None)  # mark as recently used
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return text
+
+    def put(self, key, text):
+        """Stores converted text. Failing to do so is not an error, the entry is
+        just not cached.
+        """
+        from spec2scl.batch import write_spec
+
+        path = self.path(key)
+        data = text.encode('utf-8')
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            write_spec(path, data)
+        except (IOError, OSError):
+            return
+
+        size = self.read_size()
+        if size is None:
+            size = sum(size for mtime, size, path in self.entries())
+        else:
+            size += len(data)
+        if size > self.max_size:
+            self.evict()
+        else:
+            self.write_size(size)
+
+    def size_path(self):
+        return os.path.join(self.directory, 'v1', 'size')
+
+    def read_size(self):
+        """Returns the approximate size of the entries (concurrent puts may
+        overwrite each other's updates), or None if it isn't known.
+        """
+        try:
+            with open(self.size_path()) as f:
+                return int(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+
+    def write_size(self, size):
+        from spec2scl.batch import write_spec
+
+        try:
+            write_spec(self.size_path(), str(size).encode('utf-8'))
+        except (IOError, OSError):
+            pass
+
+    def entries(self):
+        """Yields (mtime, size, path) of all entries in the cache."""
+        for dirpath, dirnames, filenames in os.walk(os.path.join(self.directory, 'v1')):
+            for filename in filenames:
+                if len(filename) != 64:
+                    continue  # the size file, or a temporary file of put
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def evict(self):
+        """Removes least recently used entries until the cache takes up at most
+        90 % of max_size.
+        """
+        entries = sorted(self.entries())
+        size = sum(e[1] for e in entries)
+        for mtime, entry_size, path in entries:
+            if size <= self.max_size * 0.9:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self.write_size(size)
@@ -0,0 +1,121 @@
+import json
+import socket
+import sys
+
+from spec2scl import batch
+from spec2scl import bin
+from spec2scl.contents import SclContents
+
+# options a request may set, the same as bin.parse_args builds for Convertor
+REQUEST_OPTIONS = ('scl_deps', 'meta_runtime_dep', 'skip_functions', 'transformers',
+                   'pass_through_sections', 'fused', 'variables', 'meta_spec')
+
+
+class Client(object):
+    """Connection to the daemon started by spec2scl --serve, see server.py."""
+
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.socket.connect(path)
+        except socket.error:
+            self.socket.close()
+            raise
+        self.rfile = self.socket.makefile('rb')
+
+    def request(self, request):
+        self.socket.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        line = self.rfile.readline()
+        if not line:
+            raise socket.error('Connection closed by the daemon')
+        return json.loads(line.decode('utf-8'))
+
+    def convert(self, spec, options):
+        request_options = dict((name, options[name]) for name in REQUEST_OPTIONS if name in options)
+        if isinstance(request_options.get('scl_deps'), SclContents):
+            request_options['scl_deps'] = request_options['scl_deps'].entries()
+        return self.request({'spec': spec, 'options': request_options})
+
+    def close(self):
+        self.rfile.close()
+        self.socket.close()
+
+
+def uses_daemon(args):
+    """Returns False if what the arguments ask for can only be done locally."""
+    return not (args.serve or args.server_counters or args.manifest or args.incremental or
+                args.stats or args.stats_json or args.git or args.check)
+
+
+def convert_path(client, path, options):
+    """Same as batch.convert_path, but converts the specfile in the daemon."""
+    result = batch.new_result(path)
+    try:
+        spec = batch.read_spec(path)
+    except IOError as e:
+        result['error'] = 'Could not open file: {0}'.format(e)
+        return result
+
+    try:
+        response = client.convert(spec, options)
+    except socket.error as e:
+        response = {'error': 'Connection to the daemon failed: {0}'.format(e)}
+    if response['error']:
+        result['error'] = 'Could not convert {0}: {1}'.format(path, response['error'])
+    else:
+        result['converted'] = response['converted']
+        result['changed'] = result['converted'] != spec
+        result['cache'] = response['cache']
+        result['skipped'] = response['skipped']
+    return result
+
+
+def execute(client, args, options, from_stdin):
+    if args.meta_specfile:
+        response = client.convert(''.join(args.specfiles), options)
+    elif args.i:
+        results = (convert_path(client, path, options) for path in bin.iter_specfiles(args))
+        return bin.convert_in_place(args, options, results=results)
+    elif from_stdin:
+        response = client.convert(sys.stdin.read(), options)
+        if args.verbose and not response['error']:
+            bin.report_skipped('<stdin>', response['skipped'])
+    else:
+        response = convert_path(client, args.specfiles[0], options)
+        if args.verbose and not response['error']:
+            bin.report_skipped(response['path'], response['skipped'])
+
+    if response['error']:
+        print(response['error'])
+        return False
+    print(response['converted'])
+    return True
+
+
+def main():
+    """Drop-in replacement of spec2scl, which leaves the conversion to the daemon
+    listening on --socket. Without a daemon, or for options the daemon doesn't
+    support, the specfiles are converted by this process.
+    """
+    parser = bin.build_parser()
+    args, from_stdin, options = bin.parse_args(parser)
+    client = None
+    if uses_daemon(args):
+        try:
+            client = Client(args.socket)
+        except socket.error:
+            pass
+
+    if client is None:
+        bin.execute(args, options, from_stdin)
+        return
+
+    try:
+        ok = execute(client, args, options, from_stdin)
+    except socket.error as e:
+        print('Connection to the daemon failed: {0}'.format(e))
+        ok = False
+    finally:
+        client.close()
+    if not ok:
+        sys.exit(1)
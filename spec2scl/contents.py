@@ -0,0 +1,86 @@
+import re
+
+REGEX_PREFIX = 're:'
+_WILDCARDS_RE = re.compile(r'[*?]')
+
+
+def glob_to_regex(glob):
+    """Translates shell-style wildcards (* and ?) of glob to a regex source."""
+    parts = []
+    last = 0
+    for match in _WILDCARDS_RE.finditer(glob):
+        parts.append(re.escape(glob[last:match.start()]))
+        parts.append('.*' if match.group() == '*' else '.')
+        last = match.end()
+    parts.append(re.escape(glob[last:]))
+    return ''.join(parts)
+
+
+def _fullmatch(pattern, string):
+    if hasattr(pattern, 'fullmatch'):
+        return pattern.fullmatch(string) is not None
+    match = pattern.match(string)  # Python 2, may miss a longer alternative
+    return match is not None and match.end() == len(string)
+
+
+class SclContents(object):
+    """Packages and provides that are in the SCL, as given by --list-file.
+
+    Entries are either exact names (looked up in a set), globs with * and ?
+    (e.g. 'perl(*)', 'rubygem-*'), or regexes prefixed with 're:', which
+    must match the whole dependency. All globs and regexes are compiled into
+    one matcher, so checking a dependency doesn't depend on the number of
+    entries.
+    """
+
+    def __init__(self, entries=()):
+        self.exact = set()
+        self.patterns = []
+        for entry in entries:
+            if not entry:
+                continue
+            if entry.startswith(REGEX_PREFIX):
+                source = entry[len(REGEX_PREFIX):]
+                try:
+                    re.compile(source)
+                except re.error as e:
+                    raise ValueError('Invalid regex {0}: {1}'.format(entry, e))
+                self.patterns.append((entry, source))
+            elif _WILDCARDS_RE.search(entry):
+                self.patterns.append((entry, glob_to_regex(entry)))
+            else:
+                self.exact.add(entry)
+
+        self._matchers = []
+        if self.patterns:
+            try:
+                self._matchers = [re.compile('|'.join('(?:{0})\\Z'.format(source)
+                                                      for entry, source in self.patterns))]
+            except re.error:
+                # e.g. global flags, which can only be at the start of a regex
+                self._matchers = [re.compile(source) for entry, source in self.patterns]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(line.strip() for line in f)
+
+    def __contains__(self, dep):
+        if dep in self.exact:
+            return True
+        for matcher in self._matchers:
+            if _fullmatch(matcher, dep):
+                return True
+        return False
+
+    def __len__(self):
+        return len(self.exact) + len(self.patterns)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    __nonzero__ = __bool__
+
+    def entries(self):
+        """Returns sorted list of the entries, suitable for JSON (e.g. for cache keys)."""
+        return sorted(self.exact | set(entry for entry, source in self.patterns))
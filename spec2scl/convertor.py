@@ -1,14 +1,23 @@
-import jinja2
+import os
+import re
 
-from spec2scl import transformer
+# initialization of the SCL inserted by GenericTransformer.insert_scl_init
+_SCL_INIT_RE = re.compile(r'^%\{\?scl:\s*%scl_package\s', re.M)
+
+# template environment shared by all metapackages, see metapackage_template
+_jinja_env = None
 
 
 class Convertor(object):
 
-    def __init__(self, spec, options=None):
+    def __init__(self, spec, options=None, cache=None, state=None):
         spec = self.list_to_str(spec)
         self.original_spec = spec
         self.options = options or {}
+        self.cache = cache
+        self.state = state  # incremental.IncrementalState of the specfile
+        self.cache_hit = None  # True/False after convert() if cache was used
+        self.skipped_transformers = None  # names of transformers skipped by transform()
 
     def list_to_str(self, arg):
         if not isinstance(arg, str):
@@ -18,13 +27,74 @@ class Convertor(object):
     def convert(self):
         if self.options['meta_spec']:
             return self.meta_convert()
-        else:
-            return transformer.Transformer(self.options).transform(self.original_spec)
+        elif self.cache is None:
+            return self.transform()
+
+        key = self.cache.key(self.original_spec, self.options)
+        converted = self.cache.get(key)
+        self.cache_hit = converted is not None
+        if self.cache_hit and self.options.get('stats') is not None:
+            self.options['stats'].add_cached_spec()
+        if converted is None:
+            converted = str(self.transform())
+            self.cache.put(key, converted)
+
+        return converted
+
+    def check(self):
+        """Checks whether the specfile is already SCL ready: either it
+        initializes the SCL the way a converted specfile does, or converting
+        it wouldn't rewrite anything.
+        Returns: None if it is ready, else (transformer name, function name,
+            section name) of the first rule that would rewrite it
+        """
+        if _SCL_INIT_RE.search(self.original_spec):
+            return None
+        from spec2scl import transformer
+
+        return transformer.Transformer(self.options).first_change(self.original_spec)
+
+    def transform(self):
+        from spec2scl import transformer
+
+        trans = transformer.Transformer(self.options)
+        spec = trans.transform(self.original_spec, section_cache=self.state)
+        self.skipped_transformers = trans.skipped_transformers
+        if self.state is not None:
+            self.state.save()
+        return spec
 
     def meta_convert(self):
+        from spec2scl import transformer
+
         data = transformer.MetaTransformer(self.original_spec, self.options['variables'])
-        jinja_env = jinja2.Environment(loader=jinja2.ChoiceLoader([
-            jinja2.FileSystemLoader(['/']),
-            jinja2.PackageLoader('spec2scl', 'templates'), ]))
-        jinja_template = jinja_env.get_template('metapackage.spec')
-        return jinja_template.render(data=data)
+        template = metapackage_template(self.options.get('template_cache'))
+        return template.render(data=data)
+
+
+def metapackage_template(bytecode_cache_dir=None):
+    """Returns the compiled metapackage template.
+    The template environment is created on first use and then shared, so the
+    template is only loaded and compiled once per process.
+    Args:
+        bytecode_cache_dir: directory to keep the compiled template in between
+            runs, used only when the environment is created
+    """
+    global _jinja_env
+    if _jinja_env is None:
+        import jinja2  # only needed for metapackages, slow to import
+
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            try:
+                if not os.path.isdir(bytecode_cache_dir):
+                    os.makedirs(bytecode_cache_dir)
+                bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache_dir)
+            except OSError:
+                pass  # just compile the template every time
+        _jinja_env = jinja2.Environment(
+            loader=jinja2.PackageLoader('spec2scl', 'templates'),
+            bytecode_cache=bytecode_cache,
+            auto_reload=False)
+
+    return _jinja_env.get_template('metapackage.spec')
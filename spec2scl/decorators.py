@@ -18,3 +18,12 @@ def matches(pattern, one_line=True, sections=settings.RUNTIME_SECTIONS, flags=0)
         return func
 
     return inner
+
+
+def wraps_commands(func):
+    """Marks a transformer function which only wraps the commands its patterns
+    match in scl enable (see Transformer.sclize_all_commands), so that the fused
+    engine can find the commands of all such functions at once.
+    """
+    func.wraps_commands = True
+    return func
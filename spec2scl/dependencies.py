@@ -0,0 +1,92 @@
+import re
+
+# operators of rich (boolean) dependencies, e.g. (foo >= 1 with foo < 2)
+RICH_KEYWORDS = frozenset(['and', 'or', 'if', 'else', 'with', 'without', 'unless'])
+
+# name or version, e.g. perl(Foo::Bar), %{name}%{?_isa}, %{epoch}:%{version}-%{release};
+# parentheses without whitespace inside are part of it, the others are handled by tokenize
+_WORD = r'(?:[^\s,()<>=]|\([^\s()]*\))+'
+
+# version with its operator and whitespace around it, e.g. ' >= 1.0' or ' != 2'
+_VERSION = r'\s*[<>=!]+\s*' + _WORD
+
+# every alternative starts with a different kind of character, so
+# the tokens are found in one pass without backtracking
+_TOKEN_RE = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<word>(?P<name>{word})(?P<version>{version})?)
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<other>.)
+'''.format(word=_WORD, version=_VERSION), re.VERBOSE | re.DOTALL)
+_WORD_RE = re.compile(_WORD)
+_VERSION_RE = re.compile(_VERSION)
+_PARENS_RE = re.compile(r'[()]')
+
+
+def _matching_parens(deps):
+    """Returns dict mapping positions of opening parentheses in deps to
+    positions of the matching closing ones.
+    """
+    matching = {}
+    opened = []
+    for match in _PARENS_RE.finditer(deps):
+        if match.group() == '(':
+            opened.append(match.start())
+        elif opened:
+            matching[opened.pop()] = match.start()
+    return matching
+
+
+def tokenize(deps):
+    """Splits value of a dependency tag (Requires, Provides, ...) to tokens.
+    Returns: list of (kind, text) tuples, where kind is one of 'space', 'name',
+    'version' (including the operator and whitespace around it), 'keyword'
+    (of a rich dependency), 'open', 'close' or 'other' (e.g. comma)
+    """
+    tokens = []
+    depth = 0
+    matching = None
+    pos = 0
+    while pos < len(deps):
+        match = _TOKEN_RE.match(deps, pos)
+        kind = match.lastgroup
+        end = match.end()
+        if kind == 'word':
+            name, version = match.group('name', 'version')
+            if depth and name in RICH_KEYWORDS:
+                tokens.append(('keyword', name))
+                pos = match.end('name')
+                continue
+            end = match.end('name')
+            if end < len(deps) and deps[end] == '(':
+                # parentheses right after a name are its part, even if there is whitespace
+                # inside, e.g. perl(:MODULE_COMPAT_%(eval "`perl -V:version`"; echo $version))
+                if matching is None:
+                    matching = _matching_parens(deps)
+                while end < len(deps) and deps[end] == '(' and end in matching:
+                    end = matching[end] + 1
+                    word = _WORD_RE.match(deps, end)
+                    if word:
+                        end = word.end()
+                version = _VERSION_RE.match(deps, end)
+                version = version and version.group()
+            tokens.append(('name', deps[pos:end]))
+            if version:
+                tokens.append(('version', version))
+                end += len(version)
+        else:
+            if kind == 'open':
+                depth += 1
+            elif kind == 'close' and depth:
+                depth -= 1
+            tokens.append((kind, match.group()))
+        pos = end
+    return tokens
+
+
+def rewrite_names(deps, rewrite):
+    """Returns deps with every dependency name replaced by rewrite(name),
+    including names inside rich dependencies; everything else is kept as is.
+    """
+    return ''.join(rewrite(text) if kind == 'name' else text for kind, text in tokenize(deps))
@@ -0,0 +1,108 @@
+import re
+
+from spec2scl.dispatch import _LINE_BREAKS_RE, combinable_source
+
+# (transformer classes, section name, skipped functions) -> (pattern, {group name: class})
+_section_patterns = {}
+# (transformer class, skipped functions) -> True if its rules can't be combined
+_unscannable = {}
+
+
+def transformer_name(cls):
+    """Returns short name of a transformer class used on the command line, e.g. 'perl'."""
+    name = cls.__name__.lower()
+    if name.endswith('transformer'):
+        name = name[:-len('transformer')]
+    return name
+
+
+def _is_unscannable(cls, skip_functions):
+    key = (cls, skip_functions)
+    if key not in _unscannable:
+        rules = cls.get_rule_table(skip_functions).rules
+        _unscannable[key] = any(combinable_source(r.pattern) is None for r in rules)
+    return _unscannable[key]
+
+
+def _section_pattern(classes, section_name, skip_functions):
+    """Returns pattern matching wherever a rule of any of the classes matches in
+    given section, with each class's rules in a group of their own, and a dict
+    mapping names of these groups to the classes. Pattern is None if none of the
+    classes has any rules for the section.
+    """
+    key = (classes, section_name, skip_functions)
+    if key not in _section_patterns:
+        branches = []
+        groups = {}
+        for i, cls in enumerate(classes):
+            section_rules = cls.get_rule_table(skip_functions)[section_name]
+            sources = [combinable_source(r.pattern)
+                       for r in section_rules.one_liners + section_rules.more_liners]
+            if sources:
+                group = '_t{0}'.format(i)
+                groups[group] = cls
+                branches.append((group, '|'.join('(?:{0})'.format(s) for s in sources)))
+        pattern = None
+        if branches:
+            try:
+                pattern = re.compile('|'.join('(?P<{0}>{1})'.format(group, branch)
+                                              for group, branch in branches), re.MULTILINE)
+            except re.error:
+                # e.g. two rules use the same group name, look for each class on its own
+                pattern = [(re.compile(branch, re.MULTILINE), groups[group])
+                           for group, branch in branches]
+        _section_patterns[key] = (pattern, groups)
+
+    return _section_patterns[key]
+
+
+def _find_in_section(section, classes, skip_functions):
+    text, start, end = section.span()
+    found = set()
+    remaining = tuple(classes)
+    while remaining:
+        pattern, groups = _section_pattern(remaining, section.name, skip_functions)
+        if pattern is None:
+            break
+        if isinstance(pattern, list):
+            found.update(cls for p, cls in pattern if p.search(text, start, end))
+            break
+        match = pattern.search(text, start, end)
+        if not match:
+            break
+        # the group of the class is the outermost one, so it's the last one closed
+        cls = groups[match.lastgroup]
+        found.add(cls)
+        remaining = tuple(c for c in remaining if c is not cls)
+        # rules of other classes may match earlier, at the same position
+        start = match.start()
+
+    return found
+
+
+def find_active_transformers(spec, classes, skip_functions=()):
+    """Returns set of the transformer classes which may change the specfile.
+
+    For each section, rules of all the classes that apply to it are searched for
+    at once and once some rule of a class matched, the class is left out of the
+    following searches. Classes that are not returned would only strip the
+    trailing newline of each section (see Transformer._transform).
+
+    Args:
+        spec: Specfile which wasn't transformed yet
+        classes: transformer classes to check
+        skip_functions: names of transformer functions that won't be used
+    Returns: set of classes
+    """
+    skip_functions = frozenset(skip_functions)
+    if _LINE_BREAKS_RE.search(spec.specfile):
+        return set(classes)  # rules are applied to lines as split by str.splitlines()
+
+    active = set(cls for cls in classes if _is_unscannable(cls, skip_functions))
+    for section in spec.sections:
+        remaining = [cls for cls in classes if cls not in active]
+        if not remaining:
+            break
+        active.update(_find_in_section(section, remaining, skip_functions))
+
+    return active
@@ -0,0 +1,369 @@
+import re
+
+try:
+    from time import perf_counter as clock
+except ImportError:
+    from time import time as clock
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+# characters other than '\n' that str.splitlines() treats as line boundaries
+_LINE_BREAKS_RE = re.compile(u'[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+_NEWLINE = ord('\n')
+_NEWLINE_CATEGORIES = set([sre_constants.CATEGORY_SPACE,
+                           sre_constants.CATEGORY_NOT_DIGIT,
+                           sre_constants.CATEGORY_NOT_WORD])
+_REPEATS = set([sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                getattr(sre_constants, 'POSSESSIVE_REPEAT', None)])
+_ASSERTS = set([sre_constants.ASSERT, sre_constants.ASSERT_NOT])
+_STRING_ANCHORS = set([sre_constants.AT_BEGINNING_STRING, sre_constants.AT_END_STRING])
+
+# inline flags group turning on DOTALL, e.g. (?s) or (?is:...)
+_DOTALL_FLAG_RE = re.compile(r'\(\?[aiLmsux-]*s')
+
+# (pattern, flags) -> result, the same rules are analysed for many sections
+_line_local = {}
+_combinable = {}
+_tag_names = {}
+
+# characters a preamble tag name can end with, see tag_name
+_TAG_NAME_RE = re.compile(r'[A-Za-z0-9]+$')
+
+
+def _children(op, av):
+    if op == sre_constants.BRANCH:
+        return av[1]
+    if op == sre_constants.SUBPATTERN:
+        return [av[-1]]
+    if op in _REPEATS:
+        return [av[2]]
+    if op in _ASSERTS:
+        return [av[1]]
+    if op == getattr(sre_constants, 'ATOMIC_GROUP', None):
+        return [av]
+    if op == sre_constants.GROUPREF_EXISTS:
+        return [p for p in av[1:] if p is not None]
+    return []
+
+
+def _class_has_newline(items):
+    found = False
+    negate = False
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            found = found or av == _NEWLINE
+        elif op == sre_constants.RANGE:
+            found = found or av[0] <= _NEWLINE <= av[1]
+        elif op == sre_constants.CATEGORY:
+            found = found or av in _NEWLINE_CATEGORIES
+        else:
+            return True
+    return found != negate
+
+
+def _can_match_newline(items, dotall):
+    for op, av in items:
+        if op == sre_constants.LITERAL:
+            if av == _NEWLINE:
+                return True
+        elif op == sre_constants.NOT_LITERAL:
+            if av != _NEWLINE:
+                return True
+        elif op == sre_constants.ANY:
+            if dotall:
+                return True
+        elif op == sre_constants.IN:
+            if _class_has_newline(av):
+                return True
+        elif op == sre_constants.CATEGORY:
+            if av in _NEWLINE_CATEGORIES:
+                return True
+        elif op in (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+            return True
+        elif any(_can_match_newline(child, dotall) for child in _children(op, av)):
+            return True
+    return False
+
+
+def _is_line_local(items, dotall):
+    for op, av in items:
+        if op == sre_constants.AT and av in _STRING_ANCHORS:
+            return False
+        if op in _ASSERTS and _can_match_newline(av[1], dotall):
+            return False
+        if not all(_is_line_local(child, dotall) for child in _children(op, av)):
+            return False
+    return True
+
+
+def is_line_local(pattern):
+    """Returns True if the pattern can't tell a line (or section) apart from
+    the same text surrounded by other lines, i.e. it doesn't anchor to the
+    start/end of the string and none of its lookarounds can see a newline.
+    """
+    key = (pattern.pattern, pattern.flags)
+    if key not in _line_local:
+        dotall = bool(pattern.flags & re.DOTALL) or bool(_DOTALL_FLAG_RE.search(pattern.pattern))
+        try:
+            parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+        except Exception:
+            _line_local[key] = False
+        else:
+            _line_local[key] = _is_line_local(parsed, dotall)
+    return _line_local[key]
+
+
+def section_scanner(pattern):
+    """Returns a multiline variant of a one-line pattern, suitable for searching
+    a whole section at once, or None if that wouldn't find every line the
+    pattern matches on its own.
+    """
+    if not is_line_local(pattern):
+        return None
+    return re.compile(pattern.pattern, pattern.flags | re.MULTILINE)
+
+
+def _has_groupref(items):
+    for op, av in items:
+        if op in (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+            return True
+        if any(_has_groupref(child) for child in _children(op, av)):
+            return True
+    return False
+
+
+def combinable_source(pattern):
+    """Returns source of a line-local pattern that can be used as a branch of
+    a bigger multiline pattern without changing what it matches, or None if
+    it can't (it uses flags other than MULTILINE or refers to its own groups).
+    """
+    key = (pattern.pattern, pattern.flags)
+    if key not in _combinable:
+        _combinable[key] = pattern.pattern
+        if pattern.flags & ~(re.MULTILINE | re.UNICODE) or not is_line_local(pattern):
+            _combinable[key] = None
+        elif _has_groupref(sre_parse.parse(pattern.pattern, pattern.flags)):
+            _combinable[key] = None
+    return _combinable[key]
+
+
+def _literal_prefix(items):
+    """Returns (literal text every match of parsed pattern items starts with,
+    True if the items are only that literal and zero-width assertions).
+    """
+    prefix = []
+    for op, av in items:
+        if op == sre_constants.LITERAL and av < 128:
+            prefix.append(chr(av))
+        elif op == sre_constants.SUBPATTERN:
+            literal, whole = _literal_prefix(av[-1])
+            prefix.append(literal)
+            if not whole:
+                return ''.join(prefix), False
+        elif op not in _ASSERTS and op != sre_constants.AT:
+            return ''.join(prefix), False
+    return ''.join(prefix), True
+
+
+def tag_name(pattern):
+    """Returns name of the preamble tag (or its end, e.g. 'Requires' for the
+    BuildRequires tag too) followed by a colon that every match of a one-line
+    pattern starts with, e.g. 'Provides' for '(Provides:)(.*)', or None,
+    so that the lines it can match can be taken from spectree.SpecTree.tag_lines.
+    """
+    key = (pattern.pattern, pattern.flags)
+    if key not in _tag_names:
+        _tag_names[key] = None
+        if not pattern.flags & re.IGNORECASE:
+            try:
+                prefix = _literal_prefix(sre_parse.parse(pattern.pattern, pattern.flags))[0]
+            except Exception:
+                prefix = ''
+            name = prefix.split(':', 1)[0]
+            if ':' in prefix and _TAG_NAME_RE.match(name):
+                _tag_names[key] = name
+    return _tag_names[key]
+
+
+class OneLinerDispatcher(object):
+    """Applies one-line transformer rules to a section.
+
+    Instead of searching every line for every rule, each rule is searched for
+    once across the whole section and only the lines where some rule can match
+    are handed to the transformer functions. The result is identical to
+    applying the rules in order to every line of section.splitlines().
+
+    Lines of rules matching after a tag name (see tag_name) can also be given
+    by a tag_lines function, e.g. spectree.SpecTree.tag_lines of the section,
+    returning indexes of the lines with tags whose name ends with the given
+    one, or None if the section has to be searched for the rule after all.
+    """
+
+    def __init__(self, rules):
+        # rules are spec2scl.rules.Rule tuples in the order they apply
+        self.rules = rules
+        self.scanners = [section_scanner(rule.pattern) for rule in rules]
+        self.scannable = all(s is not None for s in self.scanners)
+        self.tag_names = [tag_name(rule.pattern) for rule in rules]
+
+    def _tag_lines(self, index, tag_lines):
+        """Returns lines of the index-th rule given by tag_lines, or None."""
+        if tag_lines is None or self.tag_names[index] is None:
+            return None
+        return tag_lines(self.tag_names[index])
+
+    def find_candidates(self, text, tag_lines=None):
+        """Returns dict mapping line index -> set of rule indexes that may match
+        on that line, or None if the section has to be checked line by line.
+        """
+        if not self.scannable or _LINE_BREAKS_RE.search(text):
+            return None
+
+        candidates = {}
+        for i, scanner in enumerate(self.scanners):
+            lines = self._tag_lines(i, tag_lines)
+            for line in (self._scan(scanner, text) if lines is None else lines):
+                candidates.setdefault(line, set()).add(i)
+
+        return candidates
+
+    def _scan(self, scanner, text):
+        """Yields indexes of the lines of text where scanner matches."""
+        pos = last = line = 0
+        while True:
+            match = scanner.search(text, pos)
+            if not match:
+                break
+            start = match.start()
+            line += text.count('\n', last, start)
+            last = start
+            yield line
+            # only the first match on a line is interesting
+            next_line = text.find('\n', start)
+            if next_line == -1:
+                break
+            pos = next_line + 1
+
+    def may_match(self, text, start=0, end=None, tag_lines=None):
+        """Returns False if apply() on text[start:end] would only strip its
+        trailing newline, without looking at the lines one by one.
+        """
+        end = len(text) if end is None else end
+        if _LINE_BREAKS_RE.search(text, start, end):
+            return True  # splitting lines would change these
+        if not self.scannable:
+            return True
+        for i, scanner in enumerate(self.scanners):
+            lines = self._tag_lines(i, tag_lines)
+            if lines or (lines is None and scanner.search(text, start, end)):
+                return True
+        return False
+
+    def apply(self, transformer, original_spec, text, counters=None, tag_lines=None):
+        """Applies the rules to text.
+        Args:
+            counters: list of stats counters of each rule (see stats.ConversionStats.rule)
+                to update, None if stats aren't collected
+            tag_lines: function giving lines of tags in text (see the class docstring)
+        """
+        if counters is not None:
+            return self._apply_with_stats(transformer, original_spec, text, counters, tag_lines)
+        candidates = self.find_candidates(text, tag_lines)
+        if candidates is None:
+            return self.apply_each_line(transformer, original_spec, text)
+        if not candidates:
+            # same as '\n'.join(text.splitlines()) for text with only '\n' breaks
+            return text[:-1] if text.endswith('\n') else text
+
+        lines = text.splitlines()
+        for index in sorted(candidates):
+            if index < len(lines):
+                lines[index] = self.apply_line(
+                    transformer, original_spec, lines[index], candidates[index])
+
+        return '\n'.join(lines)
+
+    def _apply_with_stats(self, transformer, original_spec, text, counters, tag_lines):
+        # same as apply(), but timing the rules; the section counts as scanned by
+        # every rule, although with the scanners only some lines are searched
+        lines = text.splitlines()
+        for rule_counters in counters:
+            rule_counters[0] += 1
+            rule_counters[1] += len(lines)
+
+        candidates = None
+        if self.scannable and not _LINE_BREAKS_RE.search(text):
+            candidates = {}
+            for i, scanner in enumerate(self.scanners):
+                start = clock()
+                found = self._tag_lines(i, tag_lines)
+                for line in (self._scan(scanner, text) if found is None else found):
+                    candidates.setdefault(line, set()).add(i)
+                counters[i][4] += clock() - start
+
+        for index in (range(len(lines)) if candidates is None else sorted(candidates)):
+            if index < len(lines):
+                flagged = None if candidates is None else candidates[index]
+                changed = False
+                line = lines[index]
+                for i, rule in enumerate(self.rules):
+                    if changed or flagged is None or i in flagged:
+                        start = clock()
+                        if rule.pattern.search(line):
+                            new_line = getattr(transformer, rule.name)(original_spec, rule.pattern, line)
+                            counters[i][2] += 1
+                            if new_line != line:
+                                counters[i][3] += 1
+                                changed = True
+                            line = new_line
+                        counters[i][4] += clock() - start
+                lines[index] = line
+
+        return '\n'.join(lines)
+
+    def first_change(self, transformer, original_spec, text, tag_lines=None):
+        """Returns the first rule that would rewrite a line of text (the same
+        one that would rewrite it first in apply()), or None. The rules are
+        only applied up to that one.
+        """
+        candidates = self.find_candidates(text, tag_lines)
+        if candidates == {}:
+            return None
+        lines = text.splitlines()
+        for index in (range(len(lines)) if candidates is None else sorted(candidates)):
+            if index < len(lines):
+                line = lines[index]
+                for i, rule in enumerate(self.rules):
+                    if (candidates is None or i in candidates[index]) and rule.pattern.search(line):
+                        if getattr(transformer, rule.name)(original_spec, rule.pattern, line) != line:
+                            return rule
+
+        return None
+
+    def apply_line(self, transformer, original_spec, line, flagged=None):
+        changed = False
+        for i, rule in enumerate(self.rules):
+            # once a rule rewrote the line, any of the following ones may match
+            if (changed or flagged is None or i in flagged) and rule.pattern.search(line):
+                # let all the patterns modify the line
+                new_line = getattr(transformer, rule.name)(original_spec, rule.pattern, line)
+                changed = changed or new_line != line
+                line = new_line
+
+        return line
+
+    def apply_each_line(self, transformer, original_spec, text):
+        lines = text.splitlines()
+        for index, line in enumerate(lines):
+            lines[index] = self.apply_line(transformer, original_spec, line)
+
+        return '\n'.join(lines)
+
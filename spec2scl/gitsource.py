@@ -0,0 +1,160 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+from spec2scl import batch
+from spec2scl.convertor import Convertor
+
+
+class GitError(Exception):
+    pass
+
+
+def _decode(data):
+    if str is bytes:
+        return data
+    return data.decode('utf-8', 'surrogateescape')
+
+
+def _encode(text):
+    if str is bytes:
+        return text
+    return text.encode('utf-8', 'surrogateescape')
+
+
+class GitRepository(object):
+    """Reads specfiles committed in a git repository (bare or not) without
+    checking them out. All blobs are read through one git cat-file --batch
+    process, which is started on first use; close() stops it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._cat_file = None
+
+    def git(self, args, input=None, env=None):
+        """Runs git command in the repository.
+        Returns: its standard output (bytes)
+        Raises: GitError if it fails
+        """
+        process = subprocess.Popen(['git', '-C', self.path] + list(args), stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        out, err = process.communicate(input)
+        if process.returncode != 0:
+            raise GitError('git {0} failed in {1}: {2}'.format(
+                args[0], self.path, _decode(err).strip()))
+        return out
+
+    def list_specs(self, rev='HEAD', since=None):
+        """Returns sorted list of paths of specfiles in rev or, if since is given,
+        of those that were added or changed between since and rev.
+        """
+        if since is None:
+            out = self.git(['ls-tree', '-r', '-z', '--name-only', rev])
+        else:
+            out = self.git(['diff-tree', '-r', '-z', '--name-only', '--no-renames',
+                            '--diff-filter=AM', since, rev])
+        return sorted(path for path in _decode(out).split('\0') if path.endswith('.spec'))
+
+    def read_blob(self, rev, path):
+        """Returns text of the file at path in rev."""
+        if self._cat_file is None:
+            self._cat_file = subprocess.Popen(['git', '-C', self.path, 'cat-file', '--batch'],
+                                              stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        request = '{0}:{1}'.format(rev, path)
+        if '\n' in request:
+            raise GitError('Can\'t read {0} from {1}: newline in name'.format(path, self.path))
+        self._cat_file.stdin.write(_encode(request) + b'\n')
+        self._cat_file.stdin.flush()
+        header = self._cat_file.stdout.readline().split()
+        if len(header) != 3 or header[1] != b'blob':
+            raise GitError('Can\'t read {0} from {1}: {2}'.format(
+                path, self.path, _decode(b' '.join(header[1:])) or 'git cat-file exited'))
+        data = self._cat_file.stdout.read(int(header[2]))
+        self._cat_file.stdout.read(1)  # newline after the content
+        return _decode(data)
+
+    def write_tree(self, rev, files):
+        """Stores files (dict mapping paths to new texts) and creates a tree object
+        of rev with the files replaced, ready to be committed (git commit-tree).
+        All files are written by one git hash-object process.
+        Returns: hash of the tree
+        """
+        if not files:
+            return _decode(self.git(['rev-parse', '--verify', rev + '^{tree}'])).strip()
+        tmpdir = tempfile.mkdtemp(prefix='spec2scl-')
+        try:
+            paths = sorted(files)
+            tmp_paths = []
+            for i, path in enumerate(paths):
+                tmp_paths.append(os.path.join(tmpdir, str(i)))
+                with open(tmp_paths[-1], 'wb') as f:
+                    f.write(_encode(files[path]))
+            blobs = self.git(['hash-object', '-w', '--no-filters', '--stdin-paths'],
+                             input=_encode('\n'.join(tmp_paths) + '\n')).split()
+
+            modes = {}
+            for entry in _decode(self.git(['ls-tree', '-r', '-z', rev])).split('\0'):
+                if entry:
+                    info, path = entry.split('\t', 1)
+                    modes[path] = info.split()[0]
+
+            env = dict(os.environ, GIT_INDEX_FILE=os.path.join(tmpdir, 'index'))
+            self.git(['read-tree', rev], env=env)
+            index_info = ''.join('{0} {1}\t{2}\0'.format(modes.get(path, '100644'), _decode(blob), path)
+                                 for path, blob in zip(paths, blobs))
+            self.git(['update-index', '-z', '--index-info'], input=_encode(index_info), env=env)
+            return _decode(self.git(['write-tree'], env=env)).strip()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def close(self):
+        if self._cat_file is not None:
+            self._cat_file.stdin.close()
+            self._cat_file.wait()
+            self._cat_file.stdout.close()
+            self._cat_file = None
+
+
+def convert_repository(repo, options, rev='HEAD', since=None, cache=None):
+    """Converts specfiles committed in repo (a GitRepository) in rev, or only
+    those changed since given revision.
+    Yields: convert_path-like results, with 'path' relative to the repository
+    """
+    for path in repo.list_specs(rev, since):
+        result = batch.new_result(path)
+        try:
+            spec = repo.read_blob(rev, path)
+        except GitError as e:
+            result['error'] = str(e)
+            yield result
+            continue
+        try:
+            convertor = Convertor(spec=spec, options=options, cache=cache)
+            result['converted'] = str(convertor.convert())
+            result['changed'] = result['converted'] != spec
+            if convertor.cache_hit is not None:
+                result['cache'] = 'hit' if convertor.cache_hit else 'miss'
+            result['skipped'] = convertor.skipped_transformers
+        except Exception as e:
+            result['error'] = 'Could not convert {0}: {1}'.format(path, e)
+        yield result
+
+
+def write_output(output_dir, result):
+    """Writes converted specfile of a convert_repository result under output_dir,
+    unless the file there is already the same. It is written with the bytes
+    of the blob that weren't valid UTF-8 as they were.
+    """
+    path = os.path.join(output_dir, result['path'])
+    data = _encode(result['converted'])
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return
+    except IOError:
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+    batch.write_spec(path, data)
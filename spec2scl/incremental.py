@@ -0,0 +1,55 @@
+import hashlib
+import json
+import os
+
+from spec2scl import cache
+
+
+class IncrementalState(object):
+    """Sections of a specfile converted by the previous run, so that only the
+    sections that changed since then need to be transformed again.
+
+    The state of each specfile path is kept in a JSON file in directory and
+    is only valid for the same options and spec2scl code. Pass the state as
+    section_cache to Transformer.transform and then save() it.
+    """
+
+    def __init__(self, directory, path, options):
+        path_hash = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()
+        self.filename = os.path.join(directory, 'incremental', path_hash + '.json')
+        self.signature = cache.code_signature() + cache.options_signature(options)
+        self.previous = self.load()
+        self.sections = {}
+        self.reused = 0
+
+    def load(self):
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('signature') != self.signature:
+            return {}
+        return data.get('sections', {})
+
+    def get(self, key):
+        text = self.previous.get(key)
+        if text is not None:
+            self.sections[key] = text
+            self.reused += 1
+        return text
+
+    def put(self, key, text):
+        self.sections[key] = text
+
+    def save(self):
+        """Saves the sections used by this run; failing to do so is not an error."""
+        from spec2scl.batch import write_spec
+
+        directory = os.path.dirname(self.filename)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            write_spec(self.filename, json.dumps({'signature': self.signature, 'sections': self.sections}))
+        except (IOError, OSError):
+            pass
@@ -0,0 +1,280 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+from spec2scl.dependencies import tokenize
+from spec2scl.spectree import SpecTree
+
+INDEX_FORMAT = 1
+
+_PACKAGE_RE = re.compile(r'%package[ \t]+(-n[ \t]+)?(\S+)')
+_DEFINE_RE = re.compile(r'^%(?:global|define)\s+(\w+)\s+(\S+)\s*$', re.M)
+_MACRO_RE = re.compile(r'%\{(\??)(\w+)\}|%(\w+)')
+# names that can't be entries of SclContents (unexpanded macros, wildcards)
+_UNUSABLE_RE = re.compile(r'[%*?]|^re:')
+
+
+def expand_macros(text, macros, depth=5):
+    """Expands %foo, %{foo} and %{?foo} macros defined in macros, %{?foo}
+    of undefined ones expands to nothing, the others are kept.
+    """
+    def expand(match):
+        conditional, name = match.group(1), match.group(2) or match.group(3)
+        if name in macros:
+            return macros[name]
+        return '' if conditional else match.group()
+
+    for i in range(depth):
+        expanded = _MACRO_RE.sub(expand, text)
+        if expanded == text:
+            break
+        text = expanded
+    return text
+
+
+def extract_names(spec):
+    """Returns sorted list of names of the packages built from spec, and of
+    what they provide. Names with macros that can't be expanded from the
+    specfile itself (e.g. %{?_isa} is dropped, %{_bindir} can't be) are left out.
+    """
+    tree = SpecTree(spec)
+    header = tree.sections[0]
+    name = tree.tags('Name', header)
+    if not name or not name[0].value.split():
+        return []
+
+    macros = dict(_DEFINE_RE.findall(header.text))
+    macros['name'] = expand_macros(name[0].value.split()[0], macros)
+    raw_names = [macros['name']]
+    for section in tree.sections:
+        if section.name not in ('%header', '%package'):
+            continue
+        if section.name == '%package':
+            package = _PACKAGE_RE.match(tree.text, section.start, section.end)
+            if package is None:
+                continue
+            if package.group(1):
+                raw_names.append(package.group(2))
+            else:
+                raw_names.append('{0}-{1}'.format(macros['name'], package.group(2)))
+        for provides in tree.tags('Provides', section):
+            raw_names.extend(token for kind, token in tokenize(provides.value) if kind == 'name')
+
+    names = set()
+    for raw_name in raw_names:
+        expanded = expand_macros(raw_name, macros)
+        if expanded and not _UNUSABLE_RE.search(expanded):
+            names.add(expanded)
+    return sorted(names)
+
+
+def find_specfiles(directories):
+    """Yields paths of all specfiles in the directory trees, in a stable order."""
+    for directory in directories:
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith('.spec'):
+                    yield os.path.abspath(os.path.join(dirpath, filename))
+
+
+def _valid_record(record):
+    return (isinstance(record, dict) and isinstance(record.get('names'), list) and
+            isinstance(record.get('mtime'), (int, float)) and isinstance(record.get('size'), int) and
+            isinstance(record.get('sha256'), type(u'')))
+
+
+def read_index(path):
+    """Returns the index stored at path, or None if the file isn't an index
+    (e.g. it's a plain SCL contents list).
+    Raises: ValueError if the file claims to be an index, but isn't a valid one
+    """
+    with open(path) as f:
+        text = f.read()
+    if not text.lstrip().startswith('{'):
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or data.get('format') != INDEX_FORMAT:
+        return None
+    files = data.get('files')
+    if not isinstance(files, dict) or not all(_valid_record(record) for record in files.values()):
+        raise ValueError('Invalid index, the records of the files are missing or malformed')
+    return data
+
+
+def read_names(path):
+    """Returns sorted list of all names in the index at path, or None if
+    the file isn't an index.
+    Raises: ValueError if it's not a valid index, see read_index
+    """
+    data = read_index(path)
+    if data is None:
+        return None
+    names = set()
+    for record in data['files'].values():
+        names.update(record['names'])
+    return sorted(names)
+
+
+def _unchanged(record, st):
+    return record is not None and record['mtime'] == st.st_mtime and record['size'] == st.st_size
+
+
+def index_file(path, previous=None):
+    """Returns index record of the specfile at path. previous record of the
+    same path is reused if the file has the same size and mtime, or the same
+    content.
+    Returns: (record, whether previous was reused)
+    """
+    st = os.stat(path)
+    if _unchanged(previous, st):
+        return previous, True
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    record = {'mtime': st.st_mtime, 'size': st.st_size, 'sha256': digest}
+    if previous and previous['sha256'] == digest:
+        record['names'] = previous['names']
+        return record, True
+    record['names'] = extract_names(content.decode('utf-8', 'replace'))
+    return record, False
+
+
+def _index_file_safely(args):
+    path, previous = args
+    try:
+        return path, index_file(path, previous), None
+    except (IOError, OSError) as e:
+        return path, None, 'Could not open file: {0}'.format(e)
+
+
+def build_index(directories, previous=None, jobs=1):
+    """Indexes all specfiles in the directory trees, reusing records of
+    previous index data of the files that didn't change.
+    Returns: (index data, dict with numbers of 'indexed', 'reused',
+        'removed' and 'failed' specfiles, list of error messages)
+    """
+    previous_files = (previous or {}).get('files', {})
+    paths = list(find_specfiles(directories))
+    results = []
+    work = []
+    for path in paths:
+        # most files don't change between runs, only stat them here
+        record = previous_files.get(path)
+        try:
+            if _unchanged(record, os.stat(path)):
+                results.append((path, (record, True), None))
+                continue
+        except OSError:
+            pass
+        work.append((path, record))
+
+    if jobs > 1 and len(work) > 1:
+        import multiprocessing
+
+        pool = multiprocessing.Pool(jobs)
+        try:
+            results.extend(pool.imap_unordered(_index_file_safely, work, chunksize=16))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results.extend(_index_file_safely(item) for item in work)
+
+    files = {}
+    counts = {'indexed': 0, 'reused': 0, 'removed': 0, 'failed': 0}
+    errors = []
+    for path, indexed, error in results:
+        if error:
+            errors.append(error)
+            counts['failed'] += 1
+            continue
+        record, reused = indexed
+        files[path] = record
+        counts['reused' if reused else 'indexed'] += 1
+    counts['removed'] = len(set(previous_files) - set(paths))
+    return {'format': INDEX_FORMAT, 'files': files}, counts, errors
+
+
+def write_index(path, data):
+    from spec2scl.batch import write_spec
+
+    write_spec(path, json.dumps(data, indent=1, sort_keys=True) + '\n')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='spec2scl-index',
+        description='Index packages and provides of all specfiles in directory trees, '
+                    'the index can be used as SCL contents list (-l).')
+    parser.add_argument('directories',
+                        help='Directories to search for specfiles.',
+                        metavar='DIR',
+                        nargs='+',
+                        )
+    parser.add_argument('-o', '--output',
+                        required=False,
+                        default='scl-contents.json',
+                        help='Index file to create or update (default: %(default)s).',
+                        )
+    parser.add_argument('-j', '--jobs',
+                        required=False,
+                        type=int,
+                        default=None,
+                        help='Number of specfiles to index in parallel (default: number of CPUs).',
+                        )
+    parser.add_argument('--full',
+                        required=False,
+                        action='store_true',
+                        help='Index all specfiles again, even if they didn\'t change.',
+                        )
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs is None:
+        import multiprocessing
+
+        args.jobs = multiprocessing.cpu_count()
+    if args.jobs < 1:
+        parser.error('Number of jobs must be at least 1.')
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            parser.error('{0} is not a directory.'.format(directory))
+
+    previous = None
+    if not args.full and os.path.exists(args.output):
+        try:
+            previous = read_index(args.output)
+        except IOError as e:
+            print('Could not open file: {0}'.format(e))
+            sys.exit(1)
+        except ValueError as e:
+            parser.error('{0}: {1}'.format(args.output, e))
+        if previous is None:
+            parser.error('{0} exists and is not an index.'.format(args.output))
+
+    data, counts, errors = build_index(args.directories, previous, args.jobs)
+    for error in errors:
+        print(error)
+    try:
+        write_index(args.output, data)
+    except (IOError, OSError) as e:
+        print('Could not write file: {0}'.format(e))
+        sys.exit(1)
+
+    names = len(set(name for record in data['files'].values() for name in record['names']))
+    print('{indexed} specfile(s) indexed, {reused} unchanged, {removed} removed, '
+          '{failed} failed.'.format(**counts))
+    print('{0} name(s) written to {1}.'.format(names, args.output))
+    if errors:
+        sys.exit(1)
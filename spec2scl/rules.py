@@ -0,0 +1,64 @@
+import collections
+
+from spec2scl import settings
+from spec2scl.dispatch import OneLinerDispatcher, is_line_local
+
+Rule = collections.namedtuple('Rule', ['name', 'pattern', 'one_line', 'sections'])
+
+
+def collect_rules(cls):
+    """Returns list of Rules defined by @matches decorated methods of given class,
+    in the order in which they are applied.
+    """
+    rules = []
+    for v in vars(cls).values():
+        if hasattr(v, 'matches'):
+            for i in range(len(v.matches)):
+                rules.append(Rule(v.__name__, v.matches[i], v.one_line[i], v.sections[i]))
+
+    return rules
+
+
+class SectionRules(object):
+    """Rules applying to one section, split to one-liners and more-liners."""
+    __slots__ = ('one_liners', 'more_liners', 'dispatcher', '_more_liners_local')
+
+    def __init__(self, rules):
+        self.one_liners = tuple(r for r in rules if r.one_line)
+        self.more_liners = tuple(r for r in rules if not r.one_line)
+        self.dispatcher = OneLinerDispatcher(self.one_liners)
+        self._more_liners_local = all(is_line_local(r.pattern) for r in self.more_liners)
+
+    def may_change(self, text, start=0, end=None, tag_lines=None):
+        """Returns False if transforming text[start:end] with these rules would
+        only strip its trailing newline (which splitting and joining the lines
+        of a section does), so the caller doesn't need to copy it.
+        tag_lines is passed to dispatch.OneLinerDispatcher.may_match.
+        """
+        if self.dispatcher.may_match(text, start, end, tag_lines):
+            return True
+        if not self._more_liners_local:
+            return bool(self.more_liners)
+        end = len(text) if end is None else end
+        return any(r.pattern.search(text, start, end) for r in self.more_liners)
+
+
+class RuleTable(object):
+    """Rules of a transformer class indexed by section name, with skipped
+    functions already left out. Tables are built once per class and list of
+    skipped functions and shared by all instances, see Transformer.get_rule_table.
+    """
+
+    def __init__(self, rules, skip_functions=()):
+        self.rules = tuple(r for r in rules if r.name not in skip_functions)
+        # SectionRules are only built for sections that some specfile has
+        self._sections = {}
+
+    def __getitem__(self, section_name):
+        section_rules = self._sections.get(section_name)
+        if section_rules is None:
+            rules = []
+            if section_name in settings.SPECFILE_SECTIONS:
+                rules = [r for r in self.rules if section_name in r.sections]
+            section_rules = self._sections[section_name] = SectionRules(rules)
+        return section_rules
@@ -0,0 +1,192 @@
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+try:
+    from time import perf_counter as clock
+except ImportError:
+    from time import time as clock
+
+from spec2scl import batch
+from spec2scl.client import REQUEST_OPTIONS, Client
+from spec2scl.contents import SclContents
+from spec2scl.convertor import Convertor
+
+
+class Counters(object):
+    """Request latency and throughput counters of the daemon, shared by its threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = clock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.busy = 0.0  # sum of latencies of all requests
+        self.max_latency = 0.0
+
+    def record(self, latency, bytes_in, bytes_out, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.busy += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def to_dict(self):
+        with self._lock:
+            uptime = clock() - self.started
+            return {'requests': self.requests,
+                    'errors': self.errors,
+                    'bytes_in': self.bytes_in,
+                    'bytes_out': self.bytes_out,
+                    'uptime': uptime,
+                    'mean_latency': self.busy / self.requests if self.requests else 0.0,
+                    'max_latency': self.max_latency,
+                    'requests_per_second': self.requests / uptime if uptime else 0.0}
+
+
+class ConversionHandler(socketserver.StreamRequestHandler):
+    """Reads requests from a client connection, one JSON object per line, and
+    answers each of them with a JSON object on one line.
+    """
+
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            start = clock()
+            try:
+                response = self.server.process(json.loads(line.decode('utf-8')))
+            except ValueError as e:
+                response = {'error': 'Invalid request: {0}'.format(e)}
+            data = (json.dumps(response) + '\n').encode('utf-8')
+            # recorded before answering, so that the client sees its request in counters
+            self.server.counters.record(clock() - start, len(line), len(data),
+                                        error=bool(response.get('error')))
+            self.wfile.write(data)
+            self.wfile.flush()
+
+
+class ConversionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Converts specfiles sent over a Unix socket, each client in its own thread.
+
+    Requests are objects with 'spec' (text of the specfile, or name of the
+    metapackage) and optionally 'options' (see REQUEST_OPTIONS), which
+    override the options the daemon was started with. The response has
+    'converted', 'skipped' (see Convertor.skipped_transformers), 'cache'
+    ('hit', 'miss' or None) and 'error' (message or None).
+    The {'command': 'counters'} request returns {'counters': Counters.to_dict()}.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, options, cache=None):
+        socketserver.UnixStreamServer.__init__(self, path, ConversionHandler)
+        self.options = options
+        self.cache = cache
+        self.counters = Counters()
+        self._scl_contents = (None, None)  # last (entries, SclContents) sent by a client
+
+    def process(self, request):
+        if not isinstance(request, dict):
+            return {'error': 'Invalid request: not an object'}
+        if request.get('command') == 'counters':
+            return {'counters': self.counters.to_dict()}
+        if 'spec' not in request:
+            return {'error': 'Invalid request: no spec'}
+
+        options = dict(self.options)
+        for name, value in (request.get('options') or {}).items():
+            if name == 'scl_deps' and isinstance(value, list):
+                value = self.scl_contents(value)
+            if name in REQUEST_OPTIONS:
+                options[name] = value
+        response = {'converted': None, 'skipped': None, 'cache': None, 'error': None}
+        try:
+            convertor = Convertor(spec=request['spec'], options=options, cache=self.cache)
+            response['converted'] = str(convertor.convert())
+            response['skipped'] = convertor.skipped_transformers
+            if convertor.cache_hit is not None:
+                response['cache'] = 'hit' if convertor.cache_hit else 'miss'
+        except Exception as e:
+            response['error'] = 'Could not convert: {0}'.format(e)
+        return response
+
+    def scl_contents(self, entries):
+        """Returns SclContents of entries, reusing the last one, as clients
+        usually send the same --list-file with every request.
+        """
+        last_entries, contents = self._scl_contents
+        if entries != last_entries:
+            contents = SclContents(entries)
+            self._scl_contents = (entries, contents)
+        return contents
+
+
+def remove_stale_socket(path):
+    """Removes socket left by a daemon that isn't running anymore.
+    Returns: False if a daemon is listening on path
+    """
+    if not os.path.exists(path):
+        return True
+    try:
+        Client(path).close()
+        return False
+    except socket.error:
+        os.unlink(path)
+        return True
+
+
+def serve(args, options, cache=None):
+    """Runs the daemon on args.socket until it's interrupted or terminated."""
+    if not remove_stale_socket(args.socket):
+        sys.exit('A daemon is already listening on {0}.'.format(args.socket))
+    directory = os.path.dirname(args.socket)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    batch.preload_transformers(options)
+    old_umask = os.umask(0o077)  # only the user running the daemon may connect
+    try:
+        server = ConversionServer(args.socket, options, cache)
+    finally:
+        os.umask(old_umask)
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminate)
+    sys.stderr.write('Listening on {0}.\n'.format(args.socket))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+        sys.stderr.write(json.dumps(server.counters.to_dict(), sort_keys=True) + '\n')
+
+
+def print_counters(path):
+    """Prints counters of the daemon listening on path.
+    Returns: False if there is no daemon to ask
+    """
+    try:
+        client = Client(path)
+        try:
+            counters = client.request({'command': 'counters'})['counters']
+        finally:
+            client.close()
+    except socket.error as e:
+        print('Could not connect to {0}: {1}'.format(path, e))
+        return False
+    print(json.dumps(counters, indent=2, sort_keys=True))
+    return True
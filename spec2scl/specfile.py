@@ -1,48 +1,135 @@
-try:
-    from functools import reduce
-except ImportError:
-    pass  # we're on Python 2 => ok
 import re
 
 from spec2scl import settings
 
 
+# matches the beginning of any section, name of the section is the first group
+_SECTION_HEADER_RE = re.compile(
+    '^({0})'.format('|'.join(re.escape(x) for x in settings.SPECFILE_SECTIONS)), re.M)
+
+
+def find_sections(specfile):
+    """Finds boundaries of all sections of specfile in one pass.
+    Returns: list of (section name, start, end) tuples, the first one is always
+    the %header section (which may be empty)
+    """
+    starts = [(m.group(1), m.start()) for m in _SECTION_HEADER_RE.finditer(specfile)]
+    # this is mainly for tests - if the header is the only section
+    header_end = starts[0][1] if starts else len(specfile)
+    sections = [('%header', 0, header_end)]
+    for i, (name, start) in enumerate(starts):
+        end = starts[i + 1][1] if i + 1 < len(starts) else len(specfile)
+        sections.append((name, start, end))
+
+    return sections
+
+
+class Section(object):
+    """One section of a specfile.
+
+    Until a transformer changes it, the section only refers to its part of the
+    original specfile by offsets, the text is not copied. For compatibility,
+    sections also behave like (name, text) tuples.
+    """
+    __slots__ = ('name', 'buffer', 'start', 'end', 'modified')
+
+    def __init__(self, name, buffer, start, end):
+        self.name = name
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.modified = None
+
+    @property
+    def text(self):
+        if self.modified is None:
+            return self.buffer[self.start:self.end]
+        return self.modified
+
+    @text.setter
+    def text(self, value):
+        self.modified = value
+
+    def span(self):
+        """Returns (string, start, end) where the current text of the section can
+        be found, without copying it.
+        """
+        if self.modified is None:
+            return self.buffer, self.start, self.end
+        return self.modified, 0, len(self.modified)
+
+    def strip_newline(self):
+        """Removes one trailing newline, if there is any."""
+        text, start, end = self.span()
+        if end > start and text[end - 1] == '\n':
+            if self.modified is None:
+                self.end -= 1
+            else:
+                self.modified = self.modified[:-1]
+
+    def __len__(self):
+        text, start, end = self.span()
+        return end - start
+
+    def __contains__(self, what):
+        text, start, end = self.span()
+        return text.find(what, start, end) != -1
+
+    def __iter__(self):
+        return iter((self.name, self.text))
+
+    def __getitem__(self, index):
+        return (self.name, self.text)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (Section, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Section({0!r}, {1!r})'.format(self.name, self.text)
+
+
 class Specfile(object):
 
-    def __init__(self, specfile):
+    def __init__(self, specfile, section_spans=None):
         if not isinstance(specfile, str):
             self.specfile = ''.join(specfile)
         else:
             self.specfile = specfile
 
-        self.sections = self.split_sections()
-
-    def split_sections(self):
-        headers_re = [re.compile('^' + x, re.M) for x in settings.SPECFILE_SECTIONS]
-        section_starts = []
-        for header in headers_re:
-            for match in header.finditer(self.specfile):
-                section_starts.append(match.start())
-
-        section_starts.sort()
-        # this is mainly for tests - if the header is the only section
-        header_end = section_starts[0] if section_starts else len(self.specfile)
-        sections = [('%header', self.specfile[:header_end])]
-        for i in range(len(section_starts)):
-            if len(section_starts) > i + 1:
-                curr_section = self.specfile[section_starts[i]: section_starts[i + 1]]
-            else:
-                curr_section = self.specfile[section_starts[i]:]
-            for header in headers_re:
-                if header.match(curr_section):
-                    sections.append((header.pattern[1:], curr_section))
+        self.sections = self.split_sections(section_spans)
 
-        return sections
+    def split_sections(self, section_spans=None):
+        if section_spans is None:
+            section_spans = find_sections(self.specfile)
+        return [Section(name, self.specfile, start, end) for name, start, end in section_spans]
 
     def __contains__(self, what):
-        return reduce(lambda x, y: x or (what in y[1]), self.sections, False)
+        return any(what in section for section in self.sections)
 
     def __str__(self):
         # in tests (maybe in reality, too), we may have an empty header, which will result in
         # putting unnecessary newlines on top => leave out empty sections from joining
-        return '\n\n'.join([section for section in list(zip(*self.sections))[1] if section])
+        return '\n\n'.join([section.text for section in self.sections if len(section)])
+
+    def write(self, f, chunk_size=65536):
+        """Writes the same text as str() returns to file object f, without joining
+        it first; sections that weren't changed are written in chunks of
+        chunk_size characters straight from the original specfile.
+        """
+        separator = ''
+        for section in self.sections:
+            text, start, end = section.span()
+            if end == start:
+                continue
+            f.write(separator)
+            separator = '\n\n'
+            for pos in range(start, end, chunk_size):
+                f.write(text[pos:min(pos + chunk_size, end)])
@@ -0,0 +1,296 @@
+import bisect
+import collections
+import re
+
+from spec2scl import settings
+from spec2scl.specfile import Section, Specfile, find_sections
+
+# all offsets are into the text of the whole specfile; end offsets of tags,
+# commands and conditional lines don't include the newline
+Tag = collections.namedtuple('Tag', ['name', 'value', 'section', 'start', 'value_start', 'end'])
+Command = collections.namedtuple('Command', ['section', 'text', 'start', 'end'])
+Conditional = collections.namedtuple('Conditional', ['keyword', 'condition', 'start', 'branches', 'end'])
+
+_TAG_RE = re.compile(r'^([A-Za-z][A-Za-z0-9]*(?:\([^()\s]*\))?):[ \t]*(.*)$', re.M)
+_CONDITIONAL_RE = re.compile(
+    r'^[ \t]*%(if|ifarch|ifnarch|ifos|ifnos|elif|elifarch|elifos|else|endif)\b[ \t]*(.*)$', re.M)
+_NAME_RE = re.compile(r'Name:\s*([^\s]+)')
+
+
+class SpecTree(object):
+    """Parsed specfile: its sections, preamble tags, %if blocks and shell commands,
+    all with offsets into the original text, so that they can be found without
+    scanning the text again. Each of them is parsed on first use.
+
+    Edits are recorded by replace() and applied by serialize(), which copies
+    everything that wasn't replaced from the original text as it is.
+    """
+
+    def __init__(self, text):
+        if not isinstance(text, str):
+            text = ''.join(text)
+        self.text = text
+        self.section_spans = find_sections(text)
+        self.sections = [Section(name, text, start, end) for name, start, end in self.section_spans]
+        self._tags = None
+        self._tag_starts = None
+        self._tag_lines = {}
+        self._conditionals = None
+        self._commands = {}
+        self._lines = {}
+        self._original_name = None
+        self._edits = []
+
+    def specfile(self):
+        """Returns a new Specfile of the text, its sections aren't searched for again."""
+        return Specfile(self.text, self.section_spans)
+
+    def _select_sections(self, section):
+        """Returns spans of sections given by name, as one of self.sections, or
+        all of them if section is None.
+        """
+        if section is None:
+            return self.section_spans
+        if isinstance(section, Section):
+            return [(section.name, section.start, section.end)]
+        return [span for span in self.section_spans if span[0] == section]
+
+    def original_name(self):
+        """Returns what follows the first 'Name:' in the specfile, or 'TODO'
+        if there is none (see Transformer.get_original_name).
+        """
+        if self._original_name is None:
+            self._original_name = original_name(self.text)
+        return self._original_name
+
+    def tags(self, name=None, section=None):
+        """Returns list of Tags of the preamble (%header and %package sections).
+        Args:
+            name: name of the tags to return (case insensitive), all tags if None
+            section: section name or one of self.sections to return tags of
+        """
+        if self._tags is None:
+            self._tags = []
+            for section_name, start, end in self.section_spans:
+                if section_name not in settings.METAINFO_SECTIONS:
+                    continue
+                for match in _TAG_RE.finditer(self.text, start, end):
+                    self._tags.append(Tag(match.group(1), match.group(2), section_name,
+                                          match.start(), match.start(2), match.end()))
+            self._tag_starts = [tag.start for tag in self._tags]
+
+        if section is None:
+            tags = self._tags
+        else:
+            tags = []
+            for n, start, end in self._select_sections(section):
+                tags.extend(self._tags[bisect.bisect_left(self._tag_starts, start):
+                                       bisect.bisect_left(self._tag_starts, end)])
+        if name is not None:
+            name = name.lower()
+            tags = [tag for tag in tags if tag.name.lower() == name]
+        return tags
+
+    def tag_lines(self, name, section):
+        """Returns indexes of the lines of a section (counting only '\\n' as line
+        breaks) with tags whose name ends with name, e.g. both Requires and
+        BuildRequires tags for 'Requires', so that rules matching 'Requires:'
+        only need to look at these lines.
+        Args:
+            name: (end of) the tag name, case sensitive
+            section: Section referring to the text, e.g. of a Specfile made by specfile()
+        Returns: list of line indexes, or None if name followed by a colon also
+            occurs elsewhere in the section (in a comment, inside a macro, in
+            a value of another tag...), so the lines can't be told by the tags
+        """
+        if section.name not in settings.METAINFO_SECTIONS:
+            return None
+        key = (name, section.start, section.end)
+        if key not in self._tag_lines:
+            count = self.text.count(name + ':', section.start, section.end)
+            # every such tag has name followed by a colon in it
+            tags = [tag for tag in self.tags(section=section) if tag.name.endswith(name)] if count else []
+            lines = None
+            if count == len(tags):
+                lines = []
+                line = 0
+                pos = section.start
+                for tag in tags:
+                    line += self.text.count('\n', pos, tag.start)
+                    pos = tag.start
+                    lines.append(line)
+            self._tag_lines[key] = lines
+        return self._tag_lines[key]
+
+    def conditionals(self):
+        """Returns list of Conditionals (%if ... %endif blocks), in the order of
+        their %if lines. branches are offsets of their %elif and %else lines;
+        end is where the %endif line ends (end of the text if it's missing).
+        """
+        if self._conditionals is None:
+            self._conditionals = []
+            opened = []
+            for match in _CONDITIONAL_RE.finditer(self.text):
+                keyword = match.group(1)
+                if keyword.startswith('if'):
+                    opened.append([keyword, match.group(2), match.start(), [], None])
+                    self._conditionals.append(opened[-1])
+                elif not opened:
+                    continue  # stray %else or %endif
+                elif keyword == 'endif':
+                    opened.pop()[4] = match.end()
+                else:
+                    opened[-1][3].append(match.start())
+            for conditional in opened:
+                conditional[4] = len(self.text)
+            self._conditionals = [Conditional(*c) for c in self._conditionals]
+        return self._conditionals
+
+    def _line_starts(self, start):
+        """Returns offsets where the lines of the section starting at start begin
+        (as split by str.splitlines()), followed by the end of the section.
+        """
+        if start not in self._lines:
+            end = [e for n, s, e in self.section_spans if s == start][-1]
+            self._lines[start] = line_starts(self.text, start, end)
+        return self._lines[start]
+
+    def commands(self, section=None):
+        """Returns list of shell Commands, with lines ending with a backslash
+        joined to the next ones. Blank lines, comments, %if lines and the
+        section headers are left out.
+        Args:
+            section: section name or one of self.sections, all runtime sections
+                (see settings.RUNTIME_SECTIONS) if None
+        """
+        if section is None:
+            spans = [span for span in self.section_spans if span[0] in settings.RUNTIME_SECTIONS]
+        else:
+            spans = self._select_sections(section)
+
+        commands = []
+        for span in spans:
+            if span not in self._commands:
+                self._commands[span] = self._find_commands(*span)
+            commands.extend(self._commands[span])
+        return commands
+
+    def _find_commands(self, section_name, start, end):
+        text = self.text
+        starts = self._line_starts(start)
+        index = 0 if section_name == '%header' else 1
+        commands = []
+        while starts[index] < end:
+            line_start = starts[index]
+            line = text[line_start:min(starts[index + 1], end)].strip()
+            if not line or line.startswith('#') or _CONDITIONAL_RE.match(text, line_start, starts[index + 1]):
+                index += 1
+                continue
+            last = _last_line(text, starts, index, end)
+            last_line = text[starts[last]:min(starts[last + 1], end)].splitlines()[0]
+            command_end = starts[last] + len(last_line)
+            commands.append(Command(section_name, text[line_start:command_end], line_start, command_end))
+            index = last + 1
+        return commands
+
+    def command_matches(self, pattern, section):
+        """Finds commands matched by pattern the same way as
+        Transformer.find_command_spans does in the text of a section, only
+        the lines of the section are split once for all the patterns.
+        Args:
+            pattern: re compiled pattern matching first line of the command
+            section: Section referring to the text, e.g. of a Specfile made by specfile()
+        Returns: list of (start, end, match) of the commands, end includes the newline
+        """
+        return find_command_matches(pattern, self.text, self._line_starts(section.start),
+                                    section.start, section.end)
+
+    def replace(self, start, end, text):
+        """Records replacing text between start and end offsets (e.g. of a Tag
+        or Command) by text; replaced regions must not overlap.
+        """
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError('Invalid region {0}-{1}'.format(start, end))
+        self._edits.append((start, end, text))
+
+    def serialize(self, start=0, end=None):
+        """Returns the text between start and end offsets (the whole text by
+        default) with the recorded edits in that region applied.
+        Raises: ValueError if some edits overlap or cross start or end
+        """
+        end = len(self.text) if end is None else end
+        parts = []
+        pos = start
+        for edit_start, edit_end, text in sorted(self._edits, key=lambda edit: edit[:2]):
+            if edit_start < start or edit_end > end:
+                if edit_end <= start or edit_start >= end:
+                    continue
+                raise ValueError('Edit at {0} crosses the serialized region'.format(edit_start))
+            if edit_start < pos:
+                raise ValueError('Overlapping edits at {0}'.format(edit_start))
+            parts.append(self.text[pos:edit_start])
+            parts.append(text)
+            pos = edit_end
+        parts.append(self.text[pos:end])
+        return ''.join(parts)
+
+    def __str__(self):
+        return self.serialize()
+
+
+def original_name(text):
+    """Returns what follows the first 'Name:' in text, or 'TODO' if there is none."""
+    if not isinstance(text, str):
+        text = ''.join(text)
+    match = _NAME_RE.search(text)
+    return match.group(1) if match else 'TODO'
+
+
+def line_starts(text, start=0, end=None):
+    """Returns offsets where the lines of text[start:end] begin (as split by
+    str.splitlines()), followed by end.
+    """
+    offsets = [start]
+    for line in text[start:end].splitlines(True):
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def _last_line(text, starts, index, end):
+    """Returns index of the last line of a command starting at the index-th line,
+    i.e. the first one (before end) which doesn't end with a backslash.
+    """
+    last = index
+    while starts[last + 1] < end and text[starts[last]:starts[last + 1]].rstrip().endswith('\\'):
+        last += 1
+    return last
+
+
+def find_command_matches(pattern, text, starts, start=0, end=None):
+    """Finds all commands matched by pattern in text[start:end] in one pass.
+    A command starts at the beginning of the line where pattern matches and
+    continues while its lines end with a backslash. Commands where the match
+    is preceded by a '#' are considered commented out and left out.
+    Args:
+        pattern: re compiled pattern matching first line of the command
+        starts: offsets of the lines of text[start:end] (see line_starts)
+    Returns: list of (start, end, match) of the commands, in order
+    """
+    end = len(text) if end is None else end
+    matches = []
+    pos = start
+    while True:
+        match = pattern.search(text, pos, end)
+        if not match or match.start() >= end:
+            break  # no match or an empty one at the very end
+
+        first = bisect.bisect_right(starts, match.start()) - 1
+        last = _last_line(text, starts, first, end)
+        command_start, command_end = starts[first], min(starts[last + 1], end)
+        comment_index = text.find('#', command_start, command_end)
+        # only append if not commented out
+        if comment_index == -1 or match.start() < comment_index:
+            matches.append((command_start, command_end, match))
+        pos = command_end
+
+    return matches
@@ -0,0 +1,104 @@
+import json
+
+try:
+    from time import perf_counter as clock
+except ImportError:
+    from time import time as clock
+
+RULE_FIELDS = ('sections', 'lines', 'matches', 'rewrites', 'time')
+SECTION_FIELDS = ('count', 'lines', 'time')
+TOTAL_FIELDS = ('specs', 'cached', 'sections', 'lines', 'time')
+
+
+class ConversionStats(object):
+    """Counters of what the transformers did, collected when given as
+    options['stats'] to Transformer (see the --stats option).
+
+    For each rule, i.e. (transformer class, function, pattern), it counts the
+    sections and lines it was searched in, the matches (lines for one-line
+    rules, sections for the others), the rewrites (matches where the function
+    changed the text) and the time spent searching and rewriting. For each
+    section name, it counts the sections and their lines and the time spent
+    transforming them. Totals are kept for all the converted specfiles.
+    """
+    clock = staticmethod(clock)
+
+    def __init__(self):
+        self.rules = {}  # (class name, function name, pattern) -> list of RULE_FIELDS
+        self.sections = {}  # section name -> list of SECTION_FIELDS
+        self.totals = dict((field, 0) for field in TOTAL_FIELDS)
+
+    def rule(self, transformer, rule):
+        """Returns list of counters of rule as used by transformer, in the order of RULE_FIELDS."""
+        key = (type(transformer).__name__, rule.name, rule.pattern.pattern)
+        counters = self.rules.get(key)
+        if counters is None:
+            counters = self.rules[key] = [0, 0, 0, 0, 0.0]
+        return counters
+
+    def section(self, name):
+        """Returns list of counters of sections with given name, in the order of SECTION_FIELDS."""
+        counters = self.sections.get(name)
+        if counters is None:
+            counters = self.sections[name] = [0, 0, 0.0]
+        return counters
+
+    def add_spec(self, sections, lines, seconds):
+        self.totals['specs'] += 1
+        self.totals['sections'] += sections
+        self.totals['lines'] += lines
+        self.totals['time'] += seconds
+
+    def add_cached_spec(self):
+        self.totals['specs'] += 1
+        self.totals['cached'] += 1
+
+    def merge(self, other):
+        """Adds counters of other ConversionStats (e.g. from a worker process) to these."""
+        for key, counters in other.rules.items():
+            mine = self.rules.setdefault(key, [0, 0, 0, 0, 0.0])
+            for i, value in enumerate(counters):
+                mine[i] += value
+        for name, counters in other.sections.items():
+            mine = self.sections.setdefault(name, [0, 0, 0.0])
+            for i, value in enumerate(counters):
+                mine[i] += value
+        for field, value in other.totals.items():
+            self.totals[field] += value
+
+    def to_dict(self):
+        rules = []
+        for (cls, function, pattern), counters in sorted(self.rules.items()):
+            rule = {'transformer': cls, 'function': function, 'pattern': pattern}
+            rule.update(zip(RULE_FIELDS, counters))
+            rules.append(rule)
+        sections = dict((name, dict(zip(SECTION_FIELDS, counters)))
+                        for name, counters in self.sections.items())
+        return {'rules': rules, 'sections': sections, 'totals': dict(self.totals)}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, sort_keys=True)
+
+    def format_table(self):
+        """Returns the counters as a text table, the slowest rules and sections first."""
+        lines = ['{0:<20} {1:<40} {2:<28} {3:>8} {4:>9} {5:>8} {6:>8} {7:>10}'.format(
+            'transformer', 'function', 'pattern', 'sections', 'lines', 'matches', 'rewrites', 'time [ms]')]
+        for (cls, function, pattern), counters in sorted(
+                self.rules.items(), key=lambda item: (-item[1][4], item[0])):
+            if len(pattern) > 28:
+                pattern = pattern[:25] + '...'
+            lines.append('{0:<20} {1:<40} {2:<28} {3:>8} {4:>9} {5:>8} {6:>8} {7:>10.2f}'.format(
+                cls, function, pattern.replace('\n', '\\n'), counters[0], counters[1],
+                counters[2], counters[3], counters[4] * 1000))
+
+        lines.append('')
+        lines.append('{0:<20} {1:>8} {2:>9} {3:>10}'.format('section', 'count', 'lines', 'time [ms]'))
+        for name, counters in sorted(self.sections.items(), key=lambda item: (-item[1][2], item[0])):
+            lines.append('{0:<20} {1:>8} {2:>9} {3:>10.2f}'.format(
+                name, counters[0], counters[1], counters[2] * 1000))
+
+        lines.append('')
+        lines.append('{specs} specfile(s) ({cached} from cache), {sections} section(s), '
+                     '{lines} line(s) transformed in {ms:.2f} ms.'.format(
+                         ms=self.totals['time'] * 1000, **self.totals))
+        return '\n'.join(lines)
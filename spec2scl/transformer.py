@@ -1,9 +1,10 @@
-import locale
+import hashlib
 import re
-import subprocess
-import time
 
-from spec2scl import specfile
+from spec2scl import detect
+from spec2scl import rules
+from spec2scl.dispatch import combinable_source
+from spec2scl import spectree
 
 
 class Transformer(object):
@@ -14,82 +15,416 @@ class Transformer(object):
         self.options.setdefault('skip_functions', [])
         self.options.setdefault('meta_runtime_dep', False)
         self.options.setdefault('scl_deps', True)
-        self.transformer_methods = self.collect_transformer_methods()
+        self.options.setdefault('transformers', None)
+        self.options.setdefault('pass_through_sections', None)
+        self.options.setdefault('fused', False)
+        self.skipped_transformers = []
+        self.tree = None
 
     @classmethod
     def register_transformer(cls, t):
         cls.subtransformers.append(t)
         return t
 
+    @classmethod
+    def get_rule_table(cls, skip_functions=()):
+        """Returns RuleTable of this class with given functions skipped.
+        Tables are compiled on first use and then shared by all instances.
+        """
+        tables = cls.__dict__.get('_rule_tables')
+        if tables is None:
+            tables = {}
+            setattr(cls, '_rule_tables', tables)
+        skip_functions = frozenset(skip_functions)
+        table = tables.get(skip_functions)
+        if table is None:
+            table = tables[skip_functions] = rules.RuleTable(rules.collect_rules(cls), skip_functions)
+
+        return table
+
+    def get_rules(self, section_name):
+        return self.get_rule_table(self.options['skip_functions'])[section_name]
+
+    @property
+    def transformer_methods(self):
+        return self.collect_transformer_methods()
+
     def collect_transformer_methods(self):
-        transformers = []
-
-        for v in vars(type(self)).values():
-            if hasattr(v, 'matches'):
-                for i in range(len(v.matches)):
-                    transformers.append(
-                        (getattr(self, v.__name__), v.matches[i], v.one_line[i], v.sections[i]))
-
-        return transformers
-
-    def transform_one_liners(self, original_spec, section_name, section_text):
-        one_liners = list(filter(lambda x: x[2], self.transformer_methods))
-        split_section = section_text.splitlines()
-        skip_func = self.options['skip_functions']
-        for index, line in enumerate(split_section):
-            for func, pattern, _, sections in one_liners:
-                if (func.__name__ not in skip_func
-                    and section_name in sections
-                        and pattern.search(line)):
-                    # let all the patterns modify the line
-                    line = func(original_spec, pattern, line)
-                split_section[index] = line
-
-        return '\n'.join(split_section)
-
-    def transform_more_liners(self, original_spec, section_name, section_text):
-        more_liners = filter(lambda x: not x[2], self.transformer_methods)
-        skip_func = self.options['skip_functions']
-        for func, pattern, _, sections in more_liners:
-            if func.__name__ in skip_func:
+        return [(getattr(self, r.name), r.pattern, r.one_line, r.sections)
+                for r in self.get_rule_table().rules]
+
+    def transform_one_liners(self, original_spec, section_name, section_text, tag_lines=None):
+        dispatcher = self.get_rules(section_name).dispatcher
+        counters = None
+        stats = self.options.get('stats')
+        if stats is not None:
+            counters = [stats.rule(self, rule) for rule in dispatcher.rules]
+        return dispatcher.apply(self, original_spec, section_text, counters, tag_lines)
+
+    def wraps_commands(self, rule):
+        """Returns True if the rule's function only wraps commands in scl enable."""
+        return getattr(getattr(type(self), rule.name), 'wraps_commands', False)
+
+    def transform_more_liners(self, original_spec, section_name, section_text, section=None):
+        """Applies the more-line rules to section_text.
+        Args:
+            section: Section of self.tree that section_text is the text of (see
+                _tree_section), commands to wrap are then found in the tree
+        """
+        stats = self.options.get('stats')
+        fused = self.options['fused']
+        for rule in self.get_rules(section_name).more_liners:
+            if fused and self.wraps_commands(rule):
+                continue  # see wrap_all_commands
+            if stats is not None:
+                new_text = self._apply_more_liner_with_stats(
+                    stats, rule, original_spec, section_text, section)
+            elif rule.pattern.search(section_text):
+                new_text = self._apply_more_liner(rule, original_spec, section_text, section)
+            else:
                 continue
-            if section_name in sections and pattern.search(section_text):
-                section_text = func(original_spec, pattern, section_text)
+            if section is not None and new_text != section_text:
+                section = None  # the tree doesn't have the new text
+            section_text = new_text
 
         return section_text
 
-    def transform(self, original_spec, transformers=[]):
-        spec = specfile.Specfile(original_spec)
+    def _apply_more_liner(self, rule, original_spec, section_text, section):
+        if section is not None and self.wraps_commands(rule):
+            return self._wrap_commands_in_tree(
+                [(start, end) for start, end, match in self.tree.command_matches(rule.pattern, section)],
+                section)
+        return getattr(self, rule.name)(original_spec, rule.pattern, section_text)
+
+    def _apply_more_liner_with_stats(self, stats, rule, original_spec, section_text, section=None):
+        counters = stats.rule(self, rule)
+        counters[0] += 1
+        counters[1] += section_text.count('\n') + 1
+        start = stats.clock()
+        if rule.pattern.search(section_text):
+            counters[2] += 1
+            new_text = self._apply_more_liner(rule, original_spec, section_text, section)
+            if new_text != section_text:
+                counters[3] += 1
+            section_text = new_text
+        counters[4] += stats.clock() - start
+        return section_text
+
+    def transform(self, original_spec, transformers=[], section_cache=None):
+        """Transforms the specfile with all the subtransformers.
+        Args:
+            original_spec: text of the specfile
+            transformers: subtransformer instances to use instead of all the registered ones
+            section_cache: object with get(key) and put(key, text) methods; sections whose
+                key (see section_key) is found in it are not transformed again, others
+                are put in it once transformed
+        Returns: Specfile with the transformed sections
+
+        Sections named in options['pass_through_sections'] are not looked at by
+        any rule (nor the detection) and keep referring to original_spec.
+
+        Subtransformers none of whose rules match anywhere in the specfile are
+        skipped, unless options['transformers'] lists names of the ones to use
+        (see detect.transformer_name). Names of the skipped ones are kept in
+        self.skipped_transformers.
+
+        If options['fused'] is set, commands are not wrapped in scl enable by each
+        subtransformer in turn, but by wrap_all_commands after all of them.
+        """
+        stats = self.options.get('stats')
+        start = stats.clock() if stats is not None else None
+        tree = spectree.SpecTree(original_spec)
+        spec = tree.specfile()
         import spec2scl.transformers
-        self.subtransformers = transformers or map(
-            lambda c: c(options=self.options), type(self).subtransformers)
-        for subtrans in self.subtransformers:
+        self.subtransformers = list(transformers or map(
+            lambda c: c(options=self.options), type(self).subtransformers))
+        self._share_tree(tree, [self] + self.subtransformers)
+        try:
+            return self._transform_spec(original_spec, spec, section_cache, stats, start)
+        finally:
+            self._share_tree(None, [self] + self.subtransformers)
+
+    @staticmethod
+    def _share_tree(tree, transformers):
+        """Lets transformers use tree (SpecTree of the specfile being transformed)
+        instead of parsing the specfile again; None when done with it.
+        """
+        for transformer in transformers:
+            transformer.tree = tree
+
+    def _leave_out_pass_through(self, spec):
+        """Leaves sections named in options['pass_through_sections'] out of spec.sections.
+        Returns: list of all the sections
+        """
+        all_sections = spec.sections
+        pass_through = self.options['pass_through_sections']
+        if pass_through:
+            spec.sections = [section for section in all_sections if section.name not in pass_through]
+        return all_sections
+
+    def _passes(self, spec, subtransformers, skipped):
+        """Yields the subtransformers that need to transform spec, in order; each
+        one is checked only after the caller has let the previous one transform it.
+        Sections are stripped of the newline the pass of a skipped subtransformer
+        would strip and its name is appended to skipped.
+        """
+        classes = [type(subtrans) for subtrans in subtransformers]
+        forced = self.options['transformers']
+        if forced is None:
+            active = detect.find_active_transformers(spec, classes, self.options['skip_functions'])
+        else:
+            active = set(c for c in classes if detect.transformer_name(c) in forced)
+
+        for subtrans in subtransformers:
+            # sections changed by the previous subtransformers weren't checked by the detection
+            if type(subtrans) in active or (forced is None and subtrans._may_change_modified(spec)):
+                yield subtrans
+            else:
+                for section in spec.sections:
+                    section.strip_newline()
+                skipped.append(detect.transformer_name(type(subtrans)))
+
+    def _transform_spec(self, original_spec, spec, section_cache, stats, start):
+        all_sections = self._leave_out_pass_through(spec)
+        pass_through = self.options['pass_through_sections']
+        if section_cache is not None:
+            keys = []
+            sections = spec.sections
+            spec.sections = []
+            for section in sections:
+                key = self.section_key(original_spec, section)
+                converted = section_cache.get(key)
+                if converted is None:
+                    keys.append(key)
+                    spec.sections.append(section)
+                else:
+                    section.text = converted
+
+        if stats is not None:
+            lines = self._count_section_lines(stats, spec.sections)
+
+        self.skipped_transformers = []
+        used = []
+        for subtrans in self._passes(spec, self.subtransformers, self.skipped_transformers):
             spec = subtrans._transform(original_spec, spec)
+            used.append(subtrans)
+        if self.options['fused']:
+            self.wrap_all_commands(spec, used)
+
+        if section_cache is not None:
+            for key, section in zip(keys, spec.sections):
+                section_cache.put(key, section.text)
+        if pass_through:
+            # left as they are, apart from the newline each pass strips
+            for section in all_sections:
+                if section.name in pass_through:
+                    for subtrans in self.subtransformers:
+                        section.strip_newline()
+        spec.sections = all_sections
+
+        if stats is not None:
+            stats.add_spec(len(spec.sections), lines, stats.clock() - start)
 
         return spec
 
+    def first_change(self, original_spec):
+        """Finds the first rule that transform() would use to rewrite the specfile,
+        without transforming the rest of it.
+        Returns: (transformer name, function name, section name) or None if no rule
+            would change anything (apart from the whitespace around sections)
+        """
+        tree = spectree.SpecTree(original_spec)
+        spec = tree.specfile()
+        self._leave_out_pass_through(spec)
+        import spec2scl.transformers
+        subtransformers = [c(options=self.options) for c in type(self).subtransformers]
+        # these are thrown away afterwards, together with the tree
+        self._share_tree(tree, subtransformers)
+
+        # until some rule rewrites something, the sections only change
+        # the way they would by the previous subtransformers in transform()
+        for subtrans in self._passes(spec, subtransformers, []):
+            for section in spec.sections:
+                rule = subtrans._first_change_in_section(original_spec, section)
+                if rule is not None:
+                    return (detect.transformer_name(type(subtrans)), rule.name, section.name)
+
+        return None
+
+    def _first_change_in_section(self, original_spec, section):
+        """Returns the first rule that would rewrite the section, or None, in
+        which case the section is changed the way _transform would change it.
+        """
+        section_rules = self.get_rules(section.name)
+        if not section_rules.may_change(*section.span()):
+            section.strip_newline()
+            return None
+        text = section.text
+        rule = section_rules.dispatcher.first_change(self, original_spec, text)
+        if rule is not None:
+            return rule
+        text = '\n'.join(text.splitlines())
+        for rule in section_rules.more_liners:
+            if rule.pattern.search(text) and getattr(self, rule.name)(original_spec, rule.pattern, text) != text:
+                return rule
+        section.text = text
+        return None
+
+    def wrap_all_commands(self, spec, used):
+        """Wraps commands matched by the command wrapping rules (see
+        decorators.wraps_commands) of all the used subtransformers in scl enable,
+        finding them in one scan of each section. A command matched by rules of
+        more subtransformers is wrapped only once.
+        """
+        section_rules = {}
+        for section in spec.sections:
+            wrapping_rules = section_rules.get(section.name)
+            if wrapping_rules is None:
+                wrapping_rules = section_rules[section.name] = tuple(
+                    (index, rule)
+                    for index, subtrans in enumerate(self.subtransformers) if subtrans in used
+                    for rule in subtrans.get_rules(section.name).more_liners
+                    if subtrans.wraps_commands(rule))
+            if not wrapping_rules:
+                continue
+            in_tree = self._tree_section(section)
+            if in_tree:
+                text, text_start, text_end = section.span()
+                find_matches = lambda pattern: self.tree.command_matches(pattern, section)
+            else:
+                text = section.text
+                text_start, text_end = 0, len(text)
+                find_matches = lambda pattern: self._find_command_matches(pattern, text)
+            spans = self._find_wrapped_spans(wrapping_rules, find_matches)
+            if not spans:
+                continue
+            if in_tree:
+                new_text = self._wrap_commands_in_tree([(start, end) for start, end, index in spans], section)
+            else:
+                new_text = self.sclize_spans([(start, end) for start, end, index in spans], text)
+            # wrapping adds a newline after the last command, which the passes of
+            # the subtransformers following the one that wraps it would strip
+            start, end, index = spans[-1]
+            if (end == text_end and not text.endswith('\n', text_start, text_end) and
+                    index < len(self.subtransformers) - 1):
+                new_text = new_text[:-1]
+            section.text = new_text
+
+    def _find_wrapped_spans(self, wrapping_rules, find_matches):
+        """Returns ordered, non-overlapping (start, end, index) of commands to wrap,
+        where index is the position of the first subtransformer that wraps it.
+        Args:
+            find_matches: function returning (start, end, match) of the commands
+                a pattern matches, see _find_command_matches
+        """
+        pattern, groups = _wrapping_pattern(tuple((index, rule.pattern) for index, rule in wrapping_rules))
+        if pattern is not None:
+            spans = []
+            for start, end, match in find_matches(pattern):
+                index = min(groups[name] for name in groups if match.group(name) is not None)
+                spans.append((start, end, index))
+            return spans
+
+        # rules that can't be combined are searched for one by one
+        candidates = sorted((start, -end, index)
+                            for index, rule in wrapping_rules
+                            for start, end, match in find_matches(rule.pattern))
+        spans = []
+        for start, negative_end, index in candidates:
+            if not spans or start >= spans[-1][1]:
+                spans.append((start, -negative_end, index))
+        return spans
+
+    def _count_section_lines(self, stats, sections):
+        """Counts sections that will be transformed in stats.
+        Returns: number of their lines
+        """
+        total = 0
+        for section in sections:
+            text, start, end = section.span()
+            lines = text.count('\n', start, end) + (0 if text.endswith('\n', start, end) else 1)
+            counters = stats.section(section.name)
+            counters[0] += 1
+            counters[1] += lines
+            total += lines
+        return total
+
+    def section_key(self, original_spec, section):
+        """Returns a key identifying the result of transforming the section.
+        Sections are transformed independently of each other, except for %header,
+        which also depends on the Name of the package (see GenericTransformer.insert_scl_init).
+        """
+        digest = hashlib.sha1(section.name.encode('utf-8') + b'\0' + section.text.encode('utf-8'))
+        if section.name == '%header':
+            digest.update(b'\0' + self.get_original_name(original_spec).encode('utf-8'))
+        return digest.hexdigest()
+
     def _transform(self, original_spec, spec):
-        for i, section in enumerate(spec.sections):
-            spec.sections[i] = (
-                section[0], self._transform_section(original_spec, section[0], section[1]))
+        stats = self.options.get('stats')
+        for section in spec.sections:
+            if stats is not None:
+                start = stats.clock()
+            tag_lines = self._tag_lines(section)
+            if self.get_rules(section.name).may_change(*section.span(), tag_lines=tag_lines):
+                self._transform_section(original_spec, section, tag_lines)
+            else:
+                section.strip_newline()
+            if stats is not None:
+                stats.section(section.name)[2] += stats.clock() - start
 
         return spec
 
-    def _transform_section(self, original_spec, section_name, section_text):
+    def _may_change_modified(self, spec):
+        return any(section.modified is not None and
+                   self.get_rules(section.name).may_change(*section.span())
+                   for section in spec.sections)
+
+    def _transform_section(self, original_spec, section, tag_lines=None):
+        """Transforms the section with the rules of this transformer. A section
+        of self.tree that no rule changes keeps referring to the tree, so that
+        the following subtransformers can still use it.
+        """
         section_text = self.transform_one_liners(
-            original_spec, section_name, section_text)
-        section_text = self.transform_more_liners(
-            original_spec, section_name, section_text)
+            original_spec, section.name, section.text, tag_lines)
+        in_tree = self._tree_section(section)
+        # splitting and joining the lines strips the trailing newline
+        section.strip_newline()
+        if in_tree and not (len(section_text) == len(section) and
+                            self.tree.text.startswith(section_text, section.start)):
+            in_tree = False
+        new_text = self.transform_more_liners(
+            original_spec, section.name, section_text, section if in_tree else None)
+        if not in_tree or new_text != section_text:
+            section.text = new_text
+
+    def _tree_section(self, section):
+        """Returns True if section is an unchanged section of self.tree."""
+        return self.tree is not None and section.modified is None and section.buffer is self.tree.text
+
+    def _tag_lines(self, section):
+        """Returns function giving lines of the section with given tags from
+        self.tree (see OneLinerDispatcher), or None if the section isn't in it.
+        """
+        if not self._tree_section(section):
+            return None
+        return lambda name: self.tree.tag_lines(name, section)
 
-        return section_text
+    def _wrap_commands_in_tree(self, spans, section):
+        """Wraps commands at given offsets of self.tree in scl enable.
+        Args:
+            spans: ordered, non-overlapping (start, end) offsets of the commands in the section
+            section: Section of self.tree, see _tree_section
+        Returns: the new text of the section
+        """
+        for start, end in spans:
+            self.tree.replace(start, end, self.sclize_one_command(self.tree.text[start:end]))
+        return self.tree.serialize(section.start, section.end)
 
     # these methods are helpers for the actual transformations
     def get_original_name(self, original_spec):
-        name_match = re.compile(r'Name:\s*([^\s]+)').search(original_spec)
-        if name_match:
-            return name_match.group(1)
-        else:
-            return 'TODO'
+        if self.tree is not None and self.tree.text is original_spec:
+            return self.tree.original_name()
+        return spectree.original_name(original_spec)
 
     def find_whole_commands(self, pattern, text):
         """Finds all matching commands, even if they are spread accross multiple lines.
@@ -98,43 +433,25 @@ class Transformer(object):
             text: string to match in
         Returns: list of strings, each of which is a whole command, in the exact form as it occurs in the specfile
         """
-        # TODO: this is getting ugly, refactor
-        commands = []
-        while(True):
-            # find the matched string (usually beginning of command) inside text
-            match = pattern.search(''.join(text))
-            if not match:
-                break
-            matched = match.group(0)
-            if matched.endswith('\n'):
-                # if matched ends with newline, then we might have got e.g.
-                # 'make\n\n', but that will not work because we are splitting
-                # lines below, so we can only match one newline at the end
-                matched = matched.rstrip('\n') + '\n'
-
-            append = False
-            whole_command = []
-            # now use it to get the whole command
-            index = match.start(0)
-            previous_newline = text.rfind('\n', 0, index)
-            # don't start from the matched pattern, but from the beginning of its line
-            text = text[previous_newline if previous_newline != -1 else 0:]
-            for line in text.splitlines(True):
-                if line.find(matched) != -1:
-                    append = True
-                if append:
-                    whole_command.append(line)
-                if append and not line.rstrip().endswith('\\'):
-                    break  # sorry :)
-
-            command = ''.join(whole_command)
-            text = text[len(command):]  # so that we don't find it again
-            comment_index = command.find('#')
-            # only append if not matched
-            if comment_index == -1 or command.find(matched) < comment_index:
-                commands.append(command)
-
-        return commands
+        return [text[start:end] for start, end in self.find_command_spans(pattern, text)]
+
+    def find_command_spans(self, pattern, text):
+        """Finds all matching commands in one pass over the text.
+        A command starts at the beginning of the line where pattern matches and
+        continues while its lines end with a backslash. Commands where the match
+        is preceded by a '#' are considered commented out and left out.
+        Args:
+            pattern: re compiled pattern matching first line of the command
+            text: string to match in
+        Returns: list of (start, end) offsets of the commands in text, in order
+        """
+        return [(start, end) for start, end, match in self._find_command_matches(pattern, text)]
+
+    def _find_command_matches(self, pattern, text):
+        """The same as find_command_spans, but returns (start, end, match) tuples,
+        where match is where the pattern matched the command.
+        """
+        return spectree.find_command_matches(pattern, text, spectree.line_starts(text))
 
     def sclize_one_command(self, command):
         new_command = [None] * 3
@@ -146,15 +463,81 @@ class Transformer(object):
         return ''.join(new_command)
 
     def sclize_all_commands(self, pattern, text):
-        commands = self.find_whole_commands(pattern, text)
-        # if there are multiple same commands, we only want to replace each once
-        # => take only unique values by list(set())
-        commands = list(set(commands))
+        return self.sclize_spans(self.find_command_spans(pattern, text), text)
+
+    def sclize_spans(self, spans, text):
+        """Wraps the commands at given offsets in scl enable, in one pass over text.
+        Args:
+            spans: ordered, non-overlapping (start, end) offsets of the commands
+            text: string containing the commands
+        Returns: the new text
+        """
+        if not spans:
+            return text
+
+        parts = []
+        pos = 0
+        for start, end in spans:
+            parts.append(text[pos:start])
+            parts.append(self.sclize_one_command(text[start:end]))
+            pos = end
+        parts.append(text[pos:])
 
-        for command in commands:
-            text = text.replace(command, self.sclize_one_command(command))
+        return ''.join(parts)
 
-        return text
+
+# (index, pattern) tuples of command wrapping rules -> (pattern, {group name: index})
+_wrapping_patterns = {}
+
+
+def _wrapping_pattern(wrapping_rules):
+    """Returns pattern matching wherever any of the (index of subtransformer,
+    pattern) wrapping_rules matches, with patterns of each subtransformer in
+    a group of their own, and a dict mapping names of the groups to the indexes.
+    Pattern is None if the patterns can't be combined.
+    """
+    if wrapping_rules not in _wrapping_patterns:
+        branches = {}
+        for index, rule_pattern in wrapping_rules:
+            branches.setdefault(index, []).append(combinable_source(rule_pattern))
+        pattern = None
+        groups = dict(('_t{0}'.format(index), index) for index in branches)
+        if all(source is not None for sources in branches.values() for source in sources):
+            try:
+                pattern = re.compile('|'.join(
+                    '(?P<_t{0}>{1})'.format(index, '|'.join('(?:{0})'.format(s) for s in branches[index]))
+                    for index in sorted(branches)), re.MULTILINE)
+            except re.error:
+                pass  # e.g. two rules use the same group name
+        _wrapping_patterns[wrapping_rules] = (pattern, groups)
+
+    return _wrapping_patterns[wrapping_rules]
+
+
+# packager identity is the same for all metapackages, see packager_identity
+_packager = None
+
+
+def packager_identity():
+    """Returns "Name <email>" of the packager as given by rpmdev-packager,
+    which is only run once per process.
+    """
+    global _packager
+    if _packager is None:
+        import locale
+        import subprocess
+
+        try:
+            packager_name = subprocess.Popen(
+                'rpmdev-packager', stdout=subprocess.PIPE).communicate()[0].strip()
+            if not isinstance(packager_name, str):
+                packager_name = packager_name.decode(locale.getpreferredencoding())
+        except OSError:
+            # Hi John Doe, you should install rpmdevtools
+            packager_name = "John Doe <john@doe.com>"
+        _packager = packager_name
+
+    return _packager
 
 
 class MetaTransformer(object):
@@ -166,6 +549,8 @@ class MetaTransformer(object):
     def __init__(self, meta_name, variables=None):
         self._meta_name = meta_name
         self._variables = variables
+        self._formatted_name = None
+        self._formatted_variables = None
 
     def format_variables(self):
         """This function is used to separate given variables into dictionary
@@ -189,32 +574,32 @@ class MetaTransformer(object):
         m = r.match(self._meta_name)
         return (m.group(1).lower(), m.group(2))
 
+    def _get_formatted_name(self):
+        if self._formatted_name is None:
+            try:
+                self._formatted_name = self.format_meta_name()
+            except(AttributeError):
+                # If user enters meta package name in wrong format without version number at the end
+                self._formatted_name = (self._meta_name, '2014')
+        return self._formatted_name
+
     @property
     def meta_name(self):
-        try:
-            return self.format_meta_name()[0]
-        except(AttributeError):
-            return self._meta_name  # If user enters meta package name in wrong format without version number at the end
+        return self._get_formatted_name()[0]
 
     @property
     def meta_version(self):
-        try:
-            return self.format_meta_name()[1]
-        except(AttributeError):
-            return '2014'  # If user enters meta package name in wrong format without version number at the end
+        return self._get_formatted_name()[1]
 
     @property
     def variables(self):
-        return self.format_variables()
+        if self._formatted_variables is None:
+            self._formatted_variables = self.format_variables()
+        return self._formatted_variables
 
     @property
     def packager_data(self):
-        try:
-            packager_name = subprocess.Popen(
-                'rpmdev-packager', stdout=subprocess.PIPE).communicate()[0].strip()
-        except OSError:
-            # Hi John Doe, you should install rpmdevtools
-            packager_name = "John Doe <john@doe.com>"
+        import time
+
         date_str = time.strftime('%a %b %d %Y', time.gmtime())
-        encoding = locale.getpreferredencoding()
-        return '{0} {1}'.format(date_str, packager_name.decode(encoding))
+        return '{0} {1}'.format(date_str, packager_identity())
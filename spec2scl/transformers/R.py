@@ -1,6 +1,6 @@
 from spec2scl import settings
 from spec2scl import transformer
-from spec2scl.decorators import matches
+from spec2scl.decorators import matches, wraps_commands
 
 @transformer.Transformer.register_transformer
 class RTransformer(transformer.Transformer):
@@ -8,5 +8,6 @@ class RTransformer(transformer.Transformer):
         super(RTransformer, self).__init__(options)
 
     @matches(r'R\s+CMD', one_line=False, sections=settings.RUNTIME_SECTIONS)
+    @wraps_commands
     def handle_R_specific_commands(self, original_spec, pattern, text):
         return self.sclize_all_commands(pattern, text)
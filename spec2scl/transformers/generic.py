@@ -1,6 +1,7 @@
 import re
 
-from spec2scl.decorators import matches
+from spec2scl.decorators import matches, wraps_commands
+from spec2scl import dependencies
 from spec2scl import settings
 from spec2scl import transformer
 
@@ -22,25 +23,17 @@ class GenericTransformer(transformer.Transformer):
     def handle_dependency_tag(self, original_spec, pattern, text, scl_deps_effect=False):
         tag = text[0:text.find(':') + 1]
         deps = text[text.find(':') + 1:]
-        # handle more Requires on one line
+        scl_deps = self.options['scl_deps']
 
-        def handle_one_dep(matchobj):
-            groupdict = matchobj.groupdict('')
+        # handle more Requires on one line and names in rich dependencies
+        def handle_one_dep(dep):
+            if scl_deps == True or (scl_deps_effect and scl_deps and dep in scl_deps):
+                if dep.startswith('/'):
+                    return '%{{?_scl_root}}{0}'.format(dep)
+                return '%{{?scl_prefix}}{0}'.format(dep)
+            return dep
 
-            scl_deps = self.options['scl_deps']
-
-            if scl_deps == True or (scl_deps_effect and scl_deps and groupdict['dep'] in scl_deps):
-                if groupdict['dep'].startswith('/'):
-                    dep = '%{{?_scl_root}}{0}'.format(groupdict['dep'])
-                else:
-                    dep = '%{{?scl_prefix}}{0}'.format(groupdict['dep'])
-            else:
-                dep = groupdict['dep']
-
-            return '{0}{1}{2}{3}'.format(groupdict['prespace'], dep, groupdict['ver'], groupdict['postspace'])
-
-        dep_re = re.compile(r'(?P<prespace>\s*)(?P<dep>([^\s]+(.+\))?))(?P<ver>\s*[<>=!]+\s*[^\s]+)?(?P<postspace>\s*)')
-        return tag + dep_re.sub(handle_one_dep, deps)
+        return tag + dependencies.rewrite_names(deps, handle_one_dep)
 
     @matches(r'(?<!d)(Requires:\s*)(?!\w*/\w*)([^[\s]+)', sections=settings.METAINFO_SECTIONS)  # avoid BuildRequires
     @matches(r'(BuildRequires:\s*)(?!\w*/\w*)([^\s]+)', sections=settings.METAINFO_SECTIONS)
@@ -81,7 +74,10 @@ class GenericTransformer(transformer.Transformer):
                 index = match.start(0)
                 return '{0}%{{?scl:Requires: %{{scl}}-runtime}}\n{1}'.format(text[:index], text[index:])
 
+        return text
+
     @matches(r'^%?configure\s+', one_line=False, sections=settings.RUNTIME_SECTIONS)
     @matches(r'^make\s+', one_line=False, sections=settings.RUNTIME_SECTIONS)
+    @wraps_commands
     def handle_configure_make(self, original_spec, pattern, text):
         return self.sclize_all_commands(pattern, text)
@@ -1,5 +1,5 @@
 from spec2scl import transformer
-from spec2scl.decorators import matches
+from spec2scl.decorators import matches, wraps_commands
 
 @transformer.Transformer.register_transformer
 class PHPTransformer(transformer.Transformer):
@@ -9,5 +9,6 @@ class PHPTransformer(transformer.Transformer):
     @matches(r'%{__(zts)?php}\s+', one_line = False)
     @matches(r'%{__pear}', one_line = False)
     @matches(r'%{__pecl}', one_line = False)
+    @wraps_commands
     def handle_php_specific_commands(self, original_spec, pattern, text):
         return self.sclize_all_commands(pattern, text)
@@ -1,5 +1,5 @@
 from spec2scl import transformer
-from spec2scl.decorators import matches
+from spec2scl.decorators import matches, wraps_commands
 
 @transformer.Transformer.register_transformer
 class PythonTransformer(transformer.Transformer):
@@ -10,5 +10,6 @@ class PythonTransformer(transformer.Transformer):
     @matches(r'nosetests', one_line = False)
     @matches(r'py\.test', one_line = False)
     @matches(r'sphinx-', one_line = False)
+    @wraps_commands
     def handle_python_specific_commands(self, original_spec, pattern, text):
         return self.sclize_all_commands(pattern, text)
@@ -1,6 +1,6 @@
 from spec2scl import settings
 from spec2scl import transformer
-from spec2scl.decorators import matches
+from spec2scl.decorators import matches, wraps_commands
 
 
 @transformer.Transformer.register_transformer
@@ -16,5 +16,6 @@ class RubyTransformer(transformer.Transformer):
     @matches(r'testrb\s+', one_line=False, sections=settings.RUNTIME_SECTIONS)
     @matches(r'testrb2\s+', one_line=False, sections=settings.RUNTIME_SECTIONS)
     @matches(r'(?<![-.])rspec\s+', one_line=False, sections=settings.RUNTIME_SECTIONS)
+    @wraps_commands
     def handle_ruby_specific_commands(self, original_spec, pattern, text):
         return self.sclize_all_commands(pattern, text)
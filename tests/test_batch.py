@@ -0,0 +1,144 @@
+import io
+import json
+import os
+import signal
+
+import pytest
+
+from spec2scl import batch
+from spec2scl.bin import default_options
+
+specs = {
+    'perl-spam.spec': 'Name: perl-spam\nBuildRequires: perl(Eggs)\n%description\n%{name}\n%build\n'
+                      '%{__perl} Makefile.PL\nmake %{?_smp_mflags}\n%changelog\n* spam\n',
+    'python-spam.spec': 'Name: python-spam\n%prep\n%setup -q\n%build\n%{__python} setup.py build\n',
+    'rubygem-spam.spec': 'Name: rubygem-spam\n%check\nrspec spec\n' + 'testrb foo\n' * 200,
+}
+
+
+def convert_or_die(path, *args):
+    if path.endswith('kill.spec'):
+        os.kill(os.getpid(), signal.SIGKILL)
+    return batch.convert_path(path, *args)
+
+
+class TestBatch(object):
+    def make_specs(self, tmpdir):
+        paths = []
+        for name, text in sorted(specs.items()):
+            path = tmpdir.join(name)
+            path.write(text)
+            paths.append(str(path))
+        return paths
+
+    def options(self):
+        return default_options()
+
+    def test_results_have_the_same_keys(self, tmpdir):
+        paths = self.make_specs(tmpdir)
+        keys = set(batch.new_result('spam.spec'))
+        assert set(batch.convert_path(paths[0], self.options())) == keys
+        assert set(batch.check_path(paths[0], self.options())) == keys | set(['change'])
+
+    def test_convert_path_reports_errors(self, tmpdir):
+        result = batch.convert_path(str(tmpdir.join('nonexistent')), self.options())
+        assert result['converted'] is None
+        assert result['error'].startswith('Could not open file')
+        assert json.loads(batch.progress_record(result))['status'] == 'error'
+
+    @pytest.mark.parametrize(('text', 'skip_functions', 'changed'), [
+        ('Summary: spam', [''], True),
+        ('Summary: spam', ['insert_scl_init'], False),
+        ('Summary: spam\n', ['insert_scl_init'], True),
+    ])
+    def test_convert_path_detects_unchanged(self, tmpdir, text, skip_functions, changed):
+        path = tmpdir.join('spam.spec')
+        path.write(text)
+        result = batch.convert_path(str(path), dict(self.options(), skip_functions=skip_functions))
+        assert result['changed'] == changed
+        assert json.loads(batch.progress_record(result))['status'] == ('changed' if changed else 'unchanged')
+
+    @pytest.mark.parametrize(('text', 'skip_functions', 'change'), [
+        ('Summary: spam\n', [''], ('generic', 'insert_scl_init', '%header')),
+        ('%{?scl:%scl_package spam}\nName: spam\n', [''], None),
+        ('Summary: spam', ['insert_scl_init'], None),
+    ])
+    def test_check_path(self, tmpdir, text, skip_functions, change):
+        path = tmpdir.join('spam.spec')
+        path.write(text)
+        result = batch.check_path(str(path), dict(self.options(), skip_functions=skip_functions))
+        assert result['change'] == change
+        assert result['changed'] == (change is not None)
+        assert result['converted'] is None
+        assert path.read() == text
+
+    def test_check_parallel_is_same_as_serial(self, tmpdir):
+        paths = self.make_specs(tmpdir) + [str(tmpdir.join('nonexistent'))]
+        serial = dict((r['path'], r) for r in batch.convert_serial(paths, self.options(), func=batch.check_path))
+        parallel = list(batch.convert_parallel(iter(paths), self.options(), 2, func=batch.check_path))
+        assert len(parallel) == len(paths)
+        for result in parallel:
+            assert result == serial[result['path']]
+        assert [serial[path]['changed'] for path in paths[:-1]] == [True] * (len(paths) - 1)
+
+    def test_write_spec_is_atomic_and_keeps_mode(self, tmpdir):
+        path = tmpdir.join('spam.spec')
+        path.write('spam')
+        path.chmod(0o640)
+        link = tmpdir.join('link.spec')
+        link.mksymlinkto(path)
+        batch.write_spec(str(link), 'eggs')
+        assert path.read() == 'eggs'
+        assert link.islink()
+        assert path.stat().mode & 0o777 == 0o640
+        assert sorted(p.basename for p in tmpdir.listdir()) == ['link.spec', 'spam.spec']
+
+    @pytest.mark.parametrize(('text', 'delimiter', 'chunk_size', 'expected'), [
+        ('a.spec\nb c.spec\n\nd.spec', '\n', 3, ['a.spec', 'b c.spec', 'd.spec']),
+        ('a.spec\0b\nc.spec\0', '\0', 4, ['a.spec', 'b\nc.spec']),
+        ('', '\0', 4, []),
+    ])
+    def test_iter_paths(self, text, delimiter, chunk_size, expected):
+        assert list(batch.iter_paths(io.StringIO(text), delimiter, chunk_size)) == expected
+
+    @pytest.mark.parametrize(('jobs', 'window'), [(1, None), (3, None), (2, 1)])
+    def test_convert_parallel_is_same_as_serial(self, tmpdir, jobs, window):
+        paths = self.make_specs(tmpdir) + [str(tmpdir.join('nonexistent'))]
+        serial = dict((r['path'], r) for r in batch.convert_serial(paths, self.options()))
+        parallel = list(batch.convert_parallel(iter(paths), self.options(), jobs, window))
+        assert len(parallel) == len(paths)
+        for result in parallel:
+            assert result == serial[result['path']]
+
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_convert_parallel_survives_killed_worker(self, tmpdir, jobs):
+        paths = self.make_specs(tmpdir) + [str(tmpdir.join('kill.spec'))]
+        tmpdir.join('kill.spec').write('Name: kill\n')
+        results = list(batch.convert_parallel(iter(paths), self.options(), jobs, func=convert_or_die))
+        assert sorted(r['path'] for r in results) == sorted(paths)
+        killed = [r for r in results if r['path'].endswith('kill.spec')][0]
+        assert 'worker process exited unexpectedly' in killed['error']
+        assert [r['path'] for r in results if r['error'] is not None] == [killed['path']]
+
+    def test_read_manifest(self):
+        manifest = io.StringIO(u'# collections\nrh-spam12\n\n  rh-eggs3 A=1,B=2\n')
+        assert list(batch.read_manifest(manifest)) == [('rh-spam12', None), ('rh-eggs3', 'A=1,B=2')]
+
+    def test_convert_manifest(self, tmpdir):
+        options = dict(self.options(), variables='C=3')
+        entries = [('rh-spam12', None), ('rh-eggs3', 'A=1,B=2')]
+        results = list(batch.convert_manifest(entries, options, str(tmpdir)))
+        assert [r['changed'] for r in results] == [True, True]
+        assert 'export C=3' in tmpdir.join('rh-spam12.spec').read()
+        eggs = tmpdir.join('rh-eggs3.spec').read()
+        assert '%global scl_name_base rh-eggs' in eggs
+        assert 'export A=1' in eggs and 'export C=3' not in eggs
+
+        results = list(batch.convert_manifest(entries, options, str(tmpdir)))
+        assert [r['changed'] for r in results] == [False, False]
+
+    def test_convert_manifest_creates_output_dir(self, tmpdir):
+        output_dir = tmpdir.join('meta', 'specs')
+        results = list(batch.convert_manifest([('rh-spam12', None)], self.options(), str(output_dir)))
+        assert [r['error'] for r in results] == [None]
+        assert output_dir.join('rh-spam12.spec').check(file=1)
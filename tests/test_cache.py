@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from spec2scl.bin import default_options
+from spec2scl.cache import ConversionCache
+from spec2scl.convertor import Convertor
+
+
+class TestConversionCache(object):
+    def setup_method(self, method):
+        self.options = default_options()
+
+    @pytest.mark.parametrize(('spec', 'options', 'same'), [
+        ('Name: spam', {}, True),
+        ('Name: spam', {'variables': 'foo=bar'}, True),
+        ('Name: spam', {'skip_functions': ['']}, True),
+        ('Name: eggs', {}, False),
+        ('Name: spam', {'meta_runtime_dep': True}, False),
+        ('Name: spam', {'scl_deps': False}, False),
+        ('Name: spam', {'skip_functions': ['handle_name_tag']}, False),
+        ('Name: spam', {'fused': True}, False),
+    ])
+    def test_key(self, tmpdir, spec, options, same):
+        c = ConversionCache(str(tmpdir))
+        key = c.key('Name: spam', self.options)
+        assert (c.key(spec, dict(self.options, **options)) == key) == same
+
+    def test_key_ignores_order_of_lists(self, tmpdir):
+        c = ConversionCache(str(tmpdir))
+        assert c.key('spam', dict(self.options, skip_functions=['a', 'b'], scl_deps=['x', 'y'])) == \
+            c.key('spam', dict(self.options, skip_functions=['b', 'a'], scl_deps=['y', 'x']))
+
+    def test_get_put(self, tmpdir):
+        c = ConversionCache(str(tmpdir))
+        assert c.get('a' * 64) is None
+        c.put('a' * 64, u'converted spam ☃')
+        assert c.get('a' * 64) == u'converted spam ☃'
+        assert (c.hits, c.misses) == (1, 1)
+
+    def test_evicts_least_recently_used(self, tmpdir):
+        c = ConversionCache(str(tmpdir), max_size=2500)
+        for i, key in enumerate(['a' * 64, 'b' * 64]):
+            c.put(key, 'x' * 1000)
+            os.utime(c.path(key), (i, i))
+        c.get('a' * 64)  # now 'b' is the least recently used
+        c.put('c' * 64, 'x' * 1000)
+        assert [os.path.exists(c.path(k * 64)) for k in 'abc'] == [True, False, True]
+
+    def test_size_is_kept_in_a_file(self, tmpdir, monkeypatch):
+        c = ConversionCache(str(tmpdir), max_size=2500)
+        c.put('a' * 64, 'x' * 1000)
+        assert c.read_size() == 1000
+        # another process doesn't walk the entries to learn the size
+        c = ConversionCache(str(tmpdir), max_size=2500)
+        monkeypatch.setattr(c, 'entries', lambda: pytest.fail('entries were walked'))
+        c.put('b' * 64, 'x' * 1000)
+        assert c.read_size() == 2000
+
+    def test_put_removes_temporary_file_on_failure(self, tmpdir, monkeypatch):
+        c = ConversionCache(str(tmpdir))
+
+        def fail(src, dst):
+            raise OSError('spam')
+
+        monkeypatch.setattr(os, 'rename', fail)
+        c.put('a' * 64, 'converted spam')
+        assert os.listdir(os.path.dirname(c.path('a' * 64))) == []
+
+    def test_convertor_uses_cache(self, tmpdir):
+        c = ConversionCache(str(tmpdir))
+        first = Convertor('Name: spam\n%build\nmake\n', dict(self.options), cache=c)
+        converted = str(first.convert())
+        assert first.cache_hit is False
+        second = Convertor('Name: spam\n%build\nmake\n', dict(self.options), cache=c)
+        assert second.convert() == converted
+        assert second.cache_hit is True
+        assert (c.hits, c.misses) == (1, 1)
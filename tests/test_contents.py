@@ -0,0 +1,41 @@
+import pytest
+
+from spec2scl.cache import options_signature
+from spec2scl.contents import SclContents
+
+
+class TestSclContents(object):
+    @pytest.mark.parametrize(('entries', 'dep', 'expected'), [
+        (['spam', 'eggs'], 'spam', True),
+        (['spam', 'eggs'], 'spam-devel', False),
+        (['perl(*)'], 'perl(Foo::Bar)', True),
+        (['perl(*)'], 'perl-Foo', False),
+        (['rubygem-*'], 'rubygem-rake', True),
+        (['rubygem-?'], 'rubygem-rake', False),
+        (['python-s?am'], 'python-spam', True),
+        (['re:python3?-.*'], 'python3-spam', True),
+        (['re:python3?-.*'], 'foo-python3-spam', False),
+        (['re:spam|eggs'], 'spamx', False),
+        (['re:(?i)spam'], 'SPAM', True),
+        (['re:(?i)spam', 'eggs*'], 'eggsy', True),
+        (['re:(?i)spam|spamx', 'eggs*'], 'spamx', True),
+        (['', 'spam'], '', False),
+    ])
+    def test_contains(self, entries, dep, expected):
+        assert (dep in SclContents(entries)) == expected
+
+    def test_invalid_regex(self):
+        with pytest.raises(ValueError):
+            SclContents(['re:perl(('])
+
+    def test_from_file_and_entries(self, tmpdir):
+        path = tmpdir.join('list')
+        path.write('spam\n\nperl(*)\nre:egg.*\n')
+        contents = SclContents.from_file(str(path))
+        assert len(contents) == 3
+        assert contents.entries() == ['perl(*)', 're:egg.*', 'spam']
+        assert not SclContents([])
+
+    def test_options_signature(self):
+        assert options_signature({'scl_deps': SclContents(['spam', 'eggs*'])}) == \
+            options_signature({'scl_deps': ['eggs*', 'spam']})
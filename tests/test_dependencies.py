@@ -0,0 +1,47 @@
+import pytest
+
+from spec2scl.dependencies import rewrite_names, tokenize
+
+
+def prefix(name):
+    return 'X' + name
+
+
+class TestDependencies(object):
+    @pytest.mark.parametrize(('deps', 'expected'), [
+        (' spam', [('space', ' '), ('name', 'spam')]),
+        ('spam >= 1.0, eggs', [('name', 'spam'), ('version', ' >= 1.0'), ('other', ','),
+                               ('space', ' '), ('name', 'eggs')]),
+        ('spam%{?_isa}=%{epoch}:%{version}', [('name', 'spam%{?_isa}'), ('version', '=%{epoch}:%{version}')]),
+        ('(spam or eggs >= 2)', [('open', '('), ('name', 'spam'), ('space', ' '), ('keyword', 'or'),
+                                 ('space', ' '), ('name', 'eggs'), ('version', ' >= 2'), ('close', ')')]),
+        ('or and', [('name', 'or'), ('space', ' '), ('name', 'and')]),
+        ('spam )', [('name', 'spam'), ('space', ' '), ('close', ')')]),
+        ('spam != 1', [('name', 'spam'), ('version', ' != 1')]),
+    ])
+    def test_tokenize(self, deps, expected):
+        assert tokenize(deps) == expected
+
+    @pytest.mark.parametrize(('deps', 'expected'), [
+        ('spam eggs', 'Xspam Xeggs'),
+        ('spam != 1.0 eggs', 'Xspam != 1.0 Xeggs'),
+        ('spam,eggs', 'Xspam,Xeggs'),
+        ('perl(Foo) perl(Bar) >= 1', 'Xperl(Foo) Xperl(Bar) >= 1'),
+        ('(spam if eggs else (ham with bacon))', '(Xspam if Xeggs else (Xham with Xbacon))'),
+        ('perl(:MODULE_COMPAT_%(eval "`perl -V:version`"; echo $version))',
+         'Xperl(:MODULE_COMPAT_%(eval "`perl -V:version`"; echo $version))'),
+        ('python3dist(spam[eggs]) < 2', 'Xpython3dist(spam[eggs]) < 2'),
+        ('spam( eggs', 'Xspam( Xeggs'),
+        ('(spam or perl(:MODULE_COMPAT_%(eval "`perl -V:version`"; echo $version)))',
+         '(Xspam or Xperl(:MODULE_COMPAT_%(eval "`perl -V:version`"; echo $version)))'),
+        ('(a or b)(c d) e', '(Xa or Xb)(Xc Xd) Xe'),
+        ('', ''),
+    ])
+    def test_rewrite_names(self, deps, expected):
+        assert rewrite_names(deps, prefix) == expected
+
+    def test_long_line(self):
+        deps = ', '.join('perl(Spam::Eggs{0}) >= 1.{0}'.format(i) for i in range(20000))
+        rewritten = rewrite_names(deps, prefix)
+        assert rewritten.count('Xperl(') == 20000
+        assert rewritten.replace('Xperl(', 'perl(') == deps
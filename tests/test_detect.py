@@ -0,0 +1,73 @@
+import pytest
+
+from spec2scl import settings
+from spec2scl.decorators import matches
+from spec2scl.detect import find_active_transformers, transformer_name
+from spec2scl.specfile import Specfile
+from spec2scl.transformer import Transformer
+from spec2scl.transformers.generic import GenericTransformer
+from spec2scl.transformers.perl import PerlTransformer
+from spec2scl.transformers.php import PHPTransformer
+from spec2scl.transformers.python import PythonTransformer
+from spec2scl.transformers.R import RTransformer
+from spec2scl.transformers.ruby import RubyTransformer
+
+ALL = [RubyTransformer, PHPTransformer, PythonTransformer, GenericTransformer,
+       PerlTransformer, RTransformer]
+
+
+class SpamToHamTransformer(Transformer):
+    @matches(r'spam', sections=settings.RUNTIME_SECTIONS)
+    def handle_spam(self, original_spec, pattern, text):
+        return text.replace('spam', 'ham')
+
+
+class HamTransformer(Transformer):
+    @matches(r'ham', sections=settings.RUNTIME_SECTIONS)
+    def handle_ham(self, original_spec, pattern, text):
+        return text.replace('ham', 'HAM')
+
+
+class TestDetect(object):
+    @pytest.mark.parametrize(('spec', 'skip', 'expected'), [
+        ('Name: perl-Foo\n%build\nperl Makefile.PL\n', [],
+         set([GenericTransformer, PerlTransformer])),
+        ('Requires: python-spam\n%build\n%{__python} setup.py build\n', [],
+         set([GenericTransformer, PythonTransformer])),
+        ('%install\n%{__pear} install foo\n\nR CMD INSTALL foo\n', [],
+         set([GenericTransformer, PHPTransformer, RTransformer])),
+        ('%build\n%{__perl} Build.PL\n', ['handle_perl_specific_commands'], set([GenericTransformer])),
+        # perl rules don't apply to %description
+        ('%description\nperl Makefile.PL\n', [], set([GenericTransformer])),
+    ])
+    def test_find_active_transformers(self, spec, skip, expected):
+        assert find_active_transformers(Specfile(spec), ALL, skip) == expected
+
+    @pytest.mark.parametrize('spec', [
+        'Name: perl-Foo\nBuildRequires: perl(Foo)\n%build\nperl Makefile.PL\nmake\n',
+        'Name: spam\n%prep\n%setup -q\n%build\n%{__python} setup.py build\n\n\n',
+        '%install\n%{__pear} install foo\nR CMD INSTALL foo\n%files\n%{gem_dir}/foo\n',
+        'Name: spam\rRequires: ham\r%build\rperl Makefile.PL',
+    ])
+    def test_skipping_transformers_doesnt_change_result(self, spec):
+        all_names = [transformer_name(c) for c in ALL]
+        expected = str(Transformer({'transformers': all_names}).transform(spec))
+        assert str(Transformer({}).transform(spec)) == expected
+
+    def test_skipped_transformers_are_reported(self):
+        t = Transformer({})
+        t.transform('Name: perl-Foo\n%build\nperl Makefile.PL\n')
+        assert sorted(t.skipped_transformers) == ['php', 'python', 'r', 'ruby']
+
+    def test_forced_transformers(self):
+        t = Transformer({'transformers': ['generic']})
+        spec = 'Name: perl-Foo\n%build\nperl Makefile.PL\n'
+        assert str(t.transform(spec)) == str(GenericTransformer({})._transform(spec, Specfile(spec)))
+        assert 'perl' in t.skipped_transformers
+
+    def test_rules_matching_after_previous_transformer_are_applied(self):
+        t = Transformer({})
+        spec = '%build\nspam\n'
+        converted = t.transform(spec, transformers=[SpamToHamTransformer({}), HamTransformer({})])
+        assert str(converted) == '%build\nHAM'
+        assert t.skipped_transformers == []
@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+from spec2scl.dispatch import OneLinerDispatcher, combinable_source, section_scanner
+from spec2scl.rules import Rule
+
+from tests.test_transformer import SpamTransformer
+
+
+class TestDispatch(object):
+    def setup_method(self, method):
+        self.st = SpamTransformer()
+
+    def make_rule(self, name, pattern):
+        return Rule(name, re.compile(pattern), True, ['%prep'])
+
+    @pytest.mark.parametrize(('pattern', 'scannable'), [
+        (r'spam', True),
+        (r'(?<!d)(Conflicts:\s*)([^\s]+)', True),
+        (r'(BuildRequires:\s*)(?!\w*/\w*)([^\s]+)', True),
+        (r'^%setup$', True),
+        (r'\Aspam', False),
+        (r'spam\Z', False),
+        (r'(?<!\s)spam', False),
+        (r'spam(?![^x])', False),
+    ])
+    def test_section_scanner(self, pattern, scannable):
+        assert (section_scanner(re.compile(pattern)) is not None) == scannable
+
+    @pytest.mark.parametrize(('pattern', 'flags', 'combinable'), [
+        (r'spam', 0, True),
+        (r'^%{__perl}\s+', re.MULTILINE, True),
+        (r'spam', re.IGNORECASE, False),
+        (r'(s)pam\1', 0, False),
+        (r'\Aspam', 0, False),
+    ])
+    def test_combinable_source(self, pattern, flags, combinable):
+        source = combinable_source(re.compile(pattern, flags))
+        assert (source is not None) == combinable
+
+    @pytest.mark.parametrize(('rules', 'spec'), [
+        ([('handle_foo', r'foo'), ('handle_spam', r'spam')], 'foo spam\nnothing\n\nspam\n'),
+        ([('handle_spam', r'foo'), ('handle_foo', r'handled')], 'foo\nfoo spam'),
+        ([('handle_foo', r'^foo$')], 'foo\nfoo \nfoo\n\n'),
+        ([('handle_foo', r'\Afoo')], 'foo\nfoo\n'),
+        ([('handle_foo', r'foo')], 'foo\rfoo\x0cfoo\n'),
+    ])
+    def test_dispatcher_matches_line_by_line(self, rules, spec):
+        dispatcher = OneLinerDispatcher([self.make_rule(n, p) for n, p in rules])
+        expected = dispatcher.apply_each_line(self.st, spec, spec)
+        assert dispatcher.apply(self.st, spec, spec) == expected
+
+    def test_dispatcher_applies_following_rules_to_rewritten_line(self):
+        # handle_spam rewrites 'foo' lines, which makes 'handled' match afterwards
+        dispatcher = OneLinerDispatcher([self.make_rule('handle_spam', r'spam'),
+                                         self.make_rule('handle_foo', r'handled')])
+        assert dispatcher.find_candidates('spam foo') == {0: set([0])}
+        assert dispatcher.apply(self.st, '', 'spam foo') == 'handled spam handled foo'
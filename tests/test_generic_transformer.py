@@ -1,5 +1,6 @@
 import pytest
 
+from spec2scl.contents import SclContents
 from spec2scl.transformers.generic import GenericTransformer
 
 from tests.transformer_test_case import TransformerTestCase, scl_enable, scl_disable
@@ -54,9 +55,15 @@ class TestGenericTransformer(TransformerTestCase):
         ('Requires: spam > 1, spam < 3', True, 'Requires: %{?scl_prefix}spam > 1, %{?scl_prefix}spam < 3'),
         ('BuildRequires: python-%{spam}', True, 'BuildRequires: %{?scl_prefix}python-%{spam}'),
         ('BuildRequires: python-%{spam}', False, 'BuildRequires: python-%{spam}'),
+        ('Requires: perl(Spam) perl(Eggs)', True, 'Requires: %{?scl_prefix}perl(Spam) %{?scl_prefix}perl(Eggs)'),
+        ('Requires: (spam or eggs)', True, 'Requires: (%{?scl_prefix}spam or %{?scl_prefix}eggs)'),
+        ('Requires: (spam or eggs)', ['eggs'], 'Requires: (spam or %{?scl_prefix}eggs)'),
         ('Requires: spam > 1, spam < 3', ['eggs'], 'Requires: spam > 1, spam < 3'),
         ('Requires: spam > 1, spam < 3', ['spam'], 'Requires: %{?scl_prefix}spam > 1, %{?scl_prefix}spam < 3'),
         ('BuildRequires: python(spam)', ['python(spam)', 'spam'], 'BuildRequires: %{?scl_prefix}python(spam)'),
+        ('Requires: spam > 1, eggs', SclContents(['spa*']), 'Requires: %{?scl_prefix}spam > 1, eggs'),
+        ('BuildRequires: perl(Spam::Eggs) perl-Spam', SclContents(['perl(*)']),
+         'BuildRequires: %{?scl_prefix}perl(Spam::Eggs) perl-Spam'),
     ])
     def test_handle_dependency_tag_modified_scl_deps(self, spec, scl_deps, expected):
         handler = self.t.handle_dependency_tag_modified_by_list
@@ -114,6 +121,7 @@ class TestGenericTransformer(TransformerTestCase):
     @pytest.mark.parametrize(('spec', 'meta_runtime_dep', 'expected'), [
         ('Requires:', False, 'Requires:'),
         ('Requires:', True, '%{?scl:Requires: %{scl}-runtime}\nRequires:'),
+        ('Summary: spam', True, 'Summary: spam'),
     ])
     def test_handle_meta_runtime_dep(self, spec, meta_runtime_dep, expected):
         self.t.options['meta_runtime_dep'] = meta_runtime_dep
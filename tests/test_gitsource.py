@@ -0,0 +1,89 @@
+import os
+import subprocess
+
+import pytest
+
+from spec2scl import gitsource
+from spec2scl.bin import default_options
+from spec2scl.convertor import Convertor
+
+OPTIONS = default_options()
+
+SPAM = 'Name: spam\n%build\nmake %{?_smp_mflags}\n'
+EGGS = 'Name: eggs\r\nRequires: ham\r\n'
+
+
+def git(repo, *args):
+    env = dict(os.environ, GIT_AUTHOR_NAME='spam', GIT_AUTHOR_EMAIL='spam@example.com',
+               GIT_COMMITTER_NAME='spam', GIT_COMMITTER_EMAIL='spam@example.com')
+    return subprocess.check_output(['git', '-C', repo] + list(args), env=env).decode('utf-8').strip()
+
+
+@pytest.fixture
+def repo(tmpdir):
+    try:
+        subprocess.check_output(['git', 'init', '-q', str(tmpdir)])
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip('git is not available')
+    path = str(tmpdir)
+    tmpdir.join('spam.spec').write(SPAM)
+    tmpdir.join('eggs', 'eggs.spec').write_binary(EGGS.encode('utf-8'), ensure=True)
+    tmpdir.join('README').write('spam')
+    git(path, 'add', '.')
+    git(path, 'commit', '-q', '-m', 'first')
+    tmpdir.join('spam.spec').write(SPAM + '%files\n')
+    git(path, 'commit', '-q', '-a', '-m', 'second')
+    repository = gitsource.GitRepository(path)
+    yield repository
+    repository.close()
+
+
+def convert(spec):
+    return str(Convertor(spec, dict(OPTIONS)).convert())
+
+
+class TestGitSource(object):
+    def test_list_specs(self, repo):
+        assert repo.list_specs() == ['eggs/eggs.spec', 'spam.spec']
+        assert repo.list_specs('HEAD', since='HEAD~1') == ['spam.spec']
+
+    def test_read_blob(self, repo):
+        assert repo.read_blob('HEAD', 'eggs/eggs.spec') == EGGS
+        assert repo.read_blob('HEAD~1', 'spam.spec') == SPAM
+        with pytest.raises(gitsource.GitError):
+            repo.read_blob('HEAD', 'bacon.spec')
+        assert repo.read_blob('HEAD', 'spam.spec') == SPAM + '%files\n'
+
+    def test_convert_repository(self, repo):
+        results = list(gitsource.convert_repository(repo, dict(OPTIONS)))
+        assert [r['path'] for r in results] == ['eggs/eggs.spec', 'spam.spec']
+        assert [r['error'] for r in results] == [None, None]
+        assert results[0]['converted'] == convert(EGGS)
+        assert results[1]['converted'] == convert(SPAM + '%files\n')
+
+    def test_write_tree(self, repo):
+        tree = repo.write_tree('HEAD', {'spam.spec': 'Name: converted\n'})
+        assert git(repo.path, 'cat-file', '-p', tree + ':spam.spec') == 'Name: converted'
+        assert git(repo.path, 'cat-file', '-p', tree + ':eggs/eggs.spec') == EGGS.strip()
+        assert git(repo.path, 'status', '--porcelain') == ''
+
+    def test_write_tree_without_files(self, repo):
+        objects = git(repo.path, 'count-objects')
+        assert repo.write_tree('HEAD~1', {}) == git(repo.path, 'rev-parse', 'HEAD~1^{tree}')
+        assert git(repo.path, 'count-objects') == objects
+        with pytest.raises(gitsource.GitError):
+            repo.write_tree('bacon', {})
+
+    def test_write_output(self, repo, tmpdir):
+        output = str(tmpdir.join('output'))
+        for result in gitsource.convert_repository(repo, dict(OPTIONS), since='HEAD~1'):
+            gitsource.write_output(output, result)
+        assert os.listdir(output) == ['spam.spec']
+        with open(os.path.join(output, 'spam.spec')) as f:
+            assert f.read() == convert(SPAM + '%files\n')
+
+    def test_write_output_keeps_invalid_utf8(self, tmpdir):
+        data = b'Name: sp\xe4m\n'
+        result = {'path': 'spam.spec', 'converted': gitsource._decode(data)}
+        gitsource.write_output(str(tmpdir), result)
+        assert tmpdir.join('spam.spec').read_binary() == data
@@ -0,0 +1,61 @@
+import pytest
+
+from spec2scl.incremental import IncrementalState
+from spec2scl.transformer import Transformer
+
+spec = '''Name: spam
+Version: 1
+%description
+%{name} is spam.
+%package eggs
+Summary: eggs
+%build
+make
+%changelog
+* Mon Jan 01 2014 Spam <spam@spam.spam> - 1-1
+- %{name}
+'''
+
+
+class TestIncrementalState(object):
+    def convert(self, tmpdir, text, options={}):
+        state = IncrementalState(str(tmpdir), 'spam.spec', options)
+        converted = str(Transformer(dict(options)).transform(text, section_cache=state))
+        state.save()
+        return converted, state
+
+    @pytest.mark.parametrize(('old', 'new', 'reused'), [
+        ('Version: 1', 'Version: 2', 4),
+        ('- %{name}', '- %{name}\n- more', 4),
+        ('make\n', 'make install\n', 4),
+        ('Name: spam', 'Name: eggs', 4),
+        ('', '', 5),
+    ])
+    def test_only_changed_sections_are_transformed(self, tmpdir, old, new, reused):
+        self.convert(tmpdir, spec)
+        edited = spec.replace(old, new)
+        converted, state = self.convert(tmpdir, edited)
+        assert converted == str(Transformer({}).transform(edited))
+        assert state.reused == reused
+
+    def test_header_is_transformed_when_name_changes_elsewhere(self, tmpdir):
+        text = 'Summary: spam\n%package spam\nName: spam\n'
+        self.convert(tmpdir, text)
+        converted, state = self.convert(tmpdir, text.replace('Name: spam', 'Name: eggs'))
+        assert state.reused == 0
+        assert '%scl_package eggs' in converted
+
+    def test_state_is_invalidated_by_options(self, tmpdir):
+        self.convert(tmpdir, spec)
+        converted, state = self.convert(tmpdir, spec, {'skip_functions': ['handle_name_macro']})
+        assert state.reused == 0
+        assert '- %{name}' in converted
+
+    def test_failed_save_leaves_no_temporary_file(self, tmpdir, monkeypatch):
+        def rename(src, dst):
+            raise OSError('spam')
+
+        self.convert(tmpdir, spec)
+        monkeypatch.setattr('os.rename', rename)
+        converted, state = self.convert(tmpdir, spec.replace('make', 'make install'))
+        assert len(tmpdir.join('incremental').listdir()) == 1
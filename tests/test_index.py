@@ -0,0 +1,107 @@
+import json
+import os
+
+import pytest
+
+from spec2scl import index
+from spec2scl.bin import handle_scl_deps
+
+SPEC = '''%global srcname spam
+Name: python-%{srcname}
+Provides: python-%{srcname}-eggs = %{version}, bundled(ham)
+Provides: spam%{?_isa} %{_bindir}/spam
+
+%package devel
+Summary: Devel
+Provides: %{name}-headers
+
+%package -n python3-%{srcname}
+Summary: Python 3
+
+%description
+Spam.
+'''
+
+
+class TestIndex(object):
+    @pytest.mark.parametrize(('spec', 'expected'), [
+        (SPEC, ['bundled(ham)', 'python-spam', 'python-spam-devel', 'python-spam-eggs',
+                'python-spam-headers', 'python3-spam', 'spam']),
+        ('Name: perl-Spam\nProvides: perl(Spam) perl(Spam::Eggs)\n',
+         ['perl(Spam)', 'perl(Spam::Eggs)', 'perl-Spam']),
+        ('Name: %{?scl_prefix}spam\n', ['spam']),
+        ('Summary: no name\n', []),
+    ])
+    def test_extract_names(self, spec, expected):
+        assert index.extract_names(spec) == expected
+
+    def test_build_index_incrementally(self, tmpdir):
+        tmpdir.join('spam', 'spam.spec').write('Name: spam\n', ensure=True)
+        tmpdir.join('eggs', 'eggs.spec').write('Name: eggs\n', ensure=True)
+        tmpdir.join('eggs', 'README').write('Name: readme\n')
+        directory = str(tmpdir)
+
+        data, counts, errors = index.build_index([directory])
+        assert counts == {'indexed': 2, 'reused': 0, 'removed': 0, 'failed': 0}
+        data = json.loads(json.dumps(data))
+
+        data, counts, errors = index.build_index([directory], data)
+        assert counts == {'indexed': 0, 'reused': 2, 'removed': 0, 'failed': 0}
+
+        eggs = tmpdir.join('eggs', 'eggs.spec')
+        os.utime(str(eggs), (1, 1))  # same content, different mtime
+        tmpdir.join('spam', 'spam.spec').write('Name: spam\nProvides: ham\n')
+        tmpdir.join('bacon.spec').write('Name: bacon\n')
+        data, counts, errors = index.build_index([directory], data, jobs=2)
+        assert counts == {'indexed': 2, 'reused': 1, 'removed': 0, 'failed': 0}
+        assert data['files'][str(eggs)]['mtime'] == 1
+
+        tmpdir.join('bacon.spec').remove()
+        data, counts, errors = index.build_index([directory], data)
+        assert counts['removed'] == 1
+        assert sorted(n for record in data['files'].values() for n in record['names']) == \
+            ['eggs', 'ham', 'spam']
+
+    def test_main_and_list_file(self, tmpdir, capsys):
+        tmpdir.join('specs', 'spam.spec').write('Name: spam\nProvides: perl(Spam)\n', ensure=True)
+        output = str(tmpdir.join('index.json'))
+        index.main([str(tmpdir.join('specs')), '-o', output, '-j', '1'])
+        assert '1 specfile(s) indexed' in capsys.readouterr()[0]
+        assert index.read_names(output) == ['perl(Spam)', 'spam']
+
+        scl_deps = handle_scl_deps(False, output)
+        assert 'perl(Spam)' in scl_deps and 'perl(Eggs)' not in scl_deps
+
+        index.main([str(tmpdir.join('specs')), '-o', output, '-j', '1'])
+        assert '1 unchanged' in capsys.readouterr()[0]
+
+    def test_read_index_of_list_file(self, tmpdir):
+        path = tmpdir.join('list')
+        path.write('spam\n')
+        assert index.read_names(str(path)) is None
+        path.write('{"spam": 1}\n')
+        assert index.read_names(str(path)) is None
+
+    @pytest.mark.parametrize('data', [
+        {'format': 1},
+        {'format': 1, 'files': []},
+        {'format': 1, 'files': {'spam.spec': {'names': ['spam']}}},
+        {'format': 1, 'files': {'spam.spec': {'mtime': 1.5, 'size': 10, 'sha256': 'ab', 'names': 'spam'}}},
+    ])
+    def test_read_invalid_index(self, tmpdir, data):
+        path = tmpdir.join('index.json')
+        path.write(json.dumps(data))
+        with pytest.raises(ValueError):
+            index.read_names(str(path))
+        with pytest.raises(ValueError):
+            handle_scl_deps(False, str(path))
+
+    def test_specfile_named_index_is_converted(self, tmpdir, monkeypatch, capsys):
+        from spec2scl import bin
+
+        tmpdir.join('index').write('Name: spam\n')
+        monkeypatch.chdir(tmpdir)
+        monkeypatch.setattr('sys.argv', ['spec2scl', 'index'])
+        monkeypatch.setattr('sys.stdin.isatty', lambda: True)
+        bin.main()
+        assert '%{?scl:%scl_package spam}' in capsys.readouterr()[0]
@@ -0,0 +1,112 @@
+import os
+import socket
+import threading
+
+import pytest
+
+from spec2scl.bin import default_options
+from spec2scl.client import Client
+from spec2scl.contents import SclContents
+from spec2scl.convertor import Convertor
+from spec2scl.server import ConversionServer, remove_stale_socket
+
+OPTIONS = default_options()
+
+specs = [
+    'Name: perl-spam\nRequires: perl(Eggs)\n%build\n%{__perl} Makefile.PL\nmake %{?_smp_mflags}\n',
+    'Name: python-spam\n%build\n%{__python} setup.py build\n',
+    'Name: spam\n%install\nmake install DESTDIR=%{buildroot}\n',
+]
+
+
+@pytest.fixture
+def server(tmpdir):
+    path = str(tmpdir.join('s.sock'))
+    server = ConversionServer(path, dict(OPTIONS))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+class TestServer(object):
+    def convert_locally(self, spec, **options):
+        return str(Convertor(spec, dict(OPTIONS, **options)).convert())
+
+    @pytest.mark.parametrize('spec', specs)
+    def test_converts_like_convertor(self, server, spec):
+        client = Client(server.server_address)
+        try:
+            response = client.convert(spec, OPTIONS)
+            assert response['error'] is None
+            assert response['converted'] == self.convert_locally(spec)
+            response = client.convert(spec, dict(OPTIONS, scl_deps=False))
+            assert response['converted'] == self.convert_locally(spec, scl_deps=False)
+        finally:
+            client.close()
+
+    def test_scl_contents_option(self, server):
+        spec = 'Name: spam\nRequires: perl(Eggs) ham\n'
+        scl_deps = SclContents(['perl(*)'])
+        client = Client(server.server_address)
+        try:
+            for i in range(2):
+                response = client.convert(spec, dict(OPTIONS, scl_deps=scl_deps))
+                assert response['converted'] == self.convert_locally(spec, scl_deps=scl_deps)
+        finally:
+            client.close()
+        assert '%{?scl_prefix}perl(Eggs) ham' in response['converted']
+
+    def test_concurrent_clients(self, server):
+        errors = []
+
+        def convert_all():
+            client = Client(server.server_address)
+            try:
+                for spec in specs * 5:
+                    if client.convert(spec, OPTIONS)['converted'] != self.convert_locally(spec):
+                        errors.append(spec)
+            finally:
+                client.close()
+
+        threads = [threading.Thread(target=convert_all) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+
+        client = Client(server.server_address)
+        try:
+            counters = client.request({'command': 'counters'})['counters']
+        finally:
+            client.close()
+        assert counters['requests'] == 4 * len(specs) * 5
+        assert counters['errors'] == 0
+        assert counters['max_latency'] >= counters['mean_latency'] > 0
+
+    @pytest.mark.parametrize(('request_line', 'error'), [
+        (b'spam\n', 'Invalid request'),
+        (b'[]\n', 'Invalid request: not an object'),
+        (b'{"options": {}}\n', 'Invalid request: no spec'),
+    ])
+    def test_invalid_requests(self, server, request_line, error):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.connect(server.server_address)
+        try:
+            s.sendall(request_line)
+            assert error in s.makefile('rb').readline().decode('utf-8')
+        finally:
+            s.close()
+
+    def test_remove_stale_socket(self, server, tmpdir):
+        assert not remove_stale_socket(server.server_address)
+        stale = str(tmpdir.join('stale.sock'))
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.bind(stale)
+        s.close()
+        assert remove_stale_socket(stale)
+        assert not os.path.exists(stale)
@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+from spec2scl.specfile import Section, Specfile, find_sections
+from spec2scl.transformer import Transformer
+
+
+class TestSpecfile(object):
+    @pytest.mark.parametrize(('spec', 'expected'), [
+        ('', [('%header', 0, 0)]),
+        ('Name: spam', [('%header', 0, 10)]),
+        ('%prep\nfoo', [('%header', 0, 0), ('%prep', 0, 9)]),
+        ('Name: spam\n%description\nspam\n%files\n%changelog\n* x',
+         [('%header', 0, 11), ('%description', 11, 29), ('%files', 29, 36), ('%changelog', 36, 50)]),
+        ('Name: spam\n %build\n%buildroot\n',
+         [('%header', 0, 19), ('%build', 19, 30)]),
+    ])
+    def test_find_sections(self, spec, expected):
+        assert find_sections(spec) == expected
+
+    def test_split_sections(self):
+        spec = Specfile(['Name: spam\n', '%prep\n', '%setup\n', '%check\n', 'make test\n'])
+        assert spec.sections == [('%header', 'Name: spam\n'), ('%prep', '%prep\n%setup\n'),
+                                 ('%check', '%check\nmake test\n')]
+
+    @pytest.mark.parametrize(('text', 'expected'), [
+        ('%prep\nspam\n\n', '%prep\nspam\n'),
+        ('%prep\nspam', '%prep\nspam'),
+        ('', ''),
+    ])
+    def test_section_strip_newline(self, text, expected):
+        section = Section('%prep', 'Name: spam\n' + text + '%build\n', 11, 11 + len(text))
+        section.strip_newline()
+        assert section.text == expected
+        assert section.modified is None
+        section.text = text
+        section.strip_newline()
+        assert section.modified == expected
+
+    def test_section_contains(self):
+        section = Section('%prep', 'spam\n%prep\neggs\n%build\nham', 5, 16)
+        assert 'eggs' in section
+        assert 'spam' not in section and 'ham' not in section
+        assert 'ham' in Specfile(section.buffer)
+
+    @pytest.mark.parametrize('chunk_size', [1, 4, 65536])
+    def test_write(self, chunk_size):
+        spec = Transformer().transform('\n%description\nspam\n\n%build\nmake\n\n%changelog\n* spam\n')
+        f = io.StringIO() if str is not bytes else io.BytesIO()
+        spec.write(f, chunk_size)
+        assert f.getvalue() == str(spec)
+
+    def test_transform_doesnt_copy_untouched_sections(self):
+        text = 'Name: spam\n%description\nspam\n\n%changelog\n* spam\n'
+        spec = Transformer().transform(text)
+        description, changelog = spec.sections[1:]
+        assert description.modified is None and changelog.modified is None
+        assert (description.start, description.end) == (11, 28)
+        assert spec.sections[0].modified is not None
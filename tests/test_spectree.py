@@ -0,0 +1,137 @@
+import re
+
+import pytest
+
+from spec2scl import spectree
+from spec2scl.spectree import SpecTree
+from spec2scl.transformer import Transformer
+
+SPEC = '''Name: spam
+Requires(post): eggs
+BuildRequires: ham >= 1
+%if 0%{?fedora}
+BuildRequires: python3-devel
+%else
+BuildRequires: python2-devel
+%endif
+
+%package devel
+Requires: %{name} = %{version}
+
+%build
+# comment
+%configure \\
+    --with-eggs
+make %{?_smp_mflags}
+
+%install
+%if %{with ham}
+make install DESTDIR=%{buildroot}
+%endif
+
+%changelog
+* Spam: not a tag
+'''
+
+
+class TestSpecTree(object):
+    def setup_method(self, method):
+        self.tree = SpecTree(SPEC)
+
+    def test_tags(self):
+        assert [tag.name for tag in self.tree.tags()] == [
+            'Name', 'Requires(post)', 'BuildRequires', 'BuildRequires', 'BuildRequires', 'Requires']
+        assert [tag.value for tag in self.tree.tags('buildrequires')] == [
+            'ham >= 1', 'python3-devel', 'python2-devel']
+        assert [tag.section for tag in self.tree.tags('Requires')] == ['%package']
+        tag = self.tree.tags('Requires', '%package')[0]
+        assert SPEC[tag.start:tag.end] == 'Requires: %{name} = %{version}'
+        assert SPEC[tag.value_start:tag.end] == tag.value
+        assert self.tree.tags('Requires', self.tree.sections[0]) == []
+
+    def test_tag_lines(self):
+        header, package = self.tree.sections[:2]
+        assert self.tree.tag_lines('BuildRequires', header) == [2, 4, 6]
+        # Requires(post) isn't a Requires tag and has no 'Requires:' in it
+        assert self.tree.tag_lines('Requires', header) == [2, 4, 6]
+        assert self.tree.tag_lines('Requires', package) == [1]
+        assert self.tree.tag_lines('Provides', header) == []
+
+    @pytest.mark.parametrize('spec', [
+        'Summary: see Requires: below\nRequires: eggs\n',
+        '# Requires: eggs\n',
+        '  Requires: eggs\n',
+    ])
+    def test_tag_lines_not_only_in_tags(self, spec):
+        tree = SpecTree(spec)
+        assert tree.tag_lines('Requires', tree.sections[0]) is None
+
+    def test_tag_lines_of_other_sections(self):
+        assert self.tree.tag_lines('Spam', self.tree.sections[-1]) is None
+
+    def test_commands(self):
+        assert [command.text for command in self.tree.commands('%build')] == [
+            '%configure \\\n    --with-eggs', 'make %{?_smp_mflags}']
+        commands = self.tree.commands()
+        assert [command.section for command in commands] == ['%build', '%build', '%install']
+        assert SPEC[commands[-1].start:commands[-1].end] == 'make install DESTDIR=%{buildroot}'
+
+    @pytest.mark.parametrize('section_index', [0, 1, 2, 3, 4])
+    def test_command_matches(self, section_index):
+        pattern = re.compile(r'make|--with|\w+:')
+        section = self.tree.specfile().sections[section_index]
+        section.strip_newline()
+        text = section.text
+        expected = [(start + section.start, end + section.start, match.group())
+                    for start, end, match in Transformer()._find_command_matches(pattern, text)]
+        assert [(start, end, match.group()) for start, end, match in
+                self.tree.command_matches(pattern, section)] == expected
+
+    def test_conditionals(self):
+        fedora, ham = self.tree.conditionals()
+        assert (fedora.keyword, fedora.condition) == ('if', '0%{?fedora}')
+        assert SPEC[fedora.branches[0]:].startswith('%else\n')
+        assert SPEC[fedora.start:fedora.end].endswith('python2-devel\n%endif')
+        assert ham.branches == [] and ham.condition == '%{with ham}'
+
+    def test_unclosed_conditional(self):
+        conditional, = SpecTree('%if 1\n%if 2\n%endif\n%else\n').conditionals()[:1]
+        assert conditional.end == len('%if 1\n%if 2\n%endif\n%else\n')
+
+    def test_serialize_keeps_untouched_text(self):
+        assert self.tree.serialize() == SPEC
+        for tag in self.tree.tags('BuildRequires'):
+            self.tree.replace(tag.value_start, tag.end, '%{?scl_prefix}' + tag.value)
+        serialized = self.tree.serialize()
+        assert serialized.count('%{?scl_prefix}') == 3
+        assert serialized.replace('%{?scl_prefix}', '') == SPEC
+
+    def test_serialize_region(self):
+        header, package = self.tree.sections[:2]
+        tag = self.tree.tags('Requires', '%package')[0]
+        self.tree.replace(tag.value_start, tag.end, 'eggs')
+        assert self.tree.serialize(header.start, header.end) == SPEC[header.start:header.end]
+        assert self.tree.serialize(package.start, package.end) == '%package devel\nRequires: eggs\n\n'
+        with pytest.raises(ValueError):
+            self.tree.serialize(package.start, tag.value_start + 1)
+
+    def test_overlapping_edits(self):
+        self.tree.replace(0, 4, 'Spam')
+        self.tree.replace(2, 6, 'Eggs')
+        with pytest.raises(ValueError):
+            self.tree.serialize()
+
+    @pytest.mark.parametrize(('spec', 'expected'), [
+        (SPEC, 'spam'),
+        ('Summary: Name:  eggs\n', 'eggs'),
+        ('Summary: spam\n', 'TODO'),
+    ])
+    def test_original_name(self, spec, expected):
+        assert SpecTree(spec).original_name() == expected
+        assert spectree.original_name(spec) == expected
+
+    def test_specfile(self):
+        spec = self.tree.specfile()
+        assert [section.name for section in spec.sections] == [
+            '%header', '%package', '%build', '%install', '%changelog']
+        assert ''.join(section.text for section in spec.sections) == SPEC
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+CONVERT_SPEC = '''
+import sys
+from spec2scl.bin import main
+from spec2scl.convertor import Convertor
+Convertor('Name: spam\\n%build\\nmake %{?_smp_mflags}\\n', {'meta_spec': False}).convert()
+print(' '.join(m for m in ('jinja2', 'subprocess', 'multiprocessing') if m in sys.modules))
+'''
+
+
+def run_python(*args):
+    process = subprocess.Popen([sys.executable] + list(args),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    stdout, stderr = process.communicate()
+    assert process.returncode == 0, stderr
+    return stdout, stderr
+
+
+class TestStartup(object):
+    def test_plain_conversion_doesnt_import_unneeded_modules(self):
+        stdout, stderr = run_python('-c', CONVERT_SPEC)
+        assert stdout.split() == []
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from spec2scl import batch
+from spec2scl.bin import default_options
+from spec2scl.stats import ConversionStats
+from spec2scl.transformer import Transformer
+
+from tests.test_transformer import SpamTransformer
+
+
+class TestStats(object):
+    @pytest.mark.parametrize('spec', [
+        'Name: spam\nRequires: eggs\n%build\nmake %{?_smp_mflags}\n%{__perl} Makefile.PL\n',
+        'Name: spam\r\n%install\r\nmake install\r\n',
+        '%description\n%{name}\n\n%changelog\n* spam\n',
+    ])
+    def test_stats_dont_change_result(self, spec):
+        stats = ConversionStats()
+        assert str(Transformer({'stats': stats}).transform(spec)) == str(Transformer({}).transform(spec))
+        assert stats.totals['specs'] == 1
+        assert stats.totals['sections'] == sum(c[0] for c in stats.sections.values())
+
+    def test_rule_counters(self):
+        stats = ConversionStats()
+        st = SpamTransformer({'stats': stats})
+        spec = '%build\nspam\nfoo spam\nham eggs\n'
+        st.transform(spec, transformers=[st])
+        counters = dict(((function, pattern), dict(zip(['sections', 'lines', 'matches', 'rewrites'], c)))
+                        for (cls, function, pattern), c in stats.rules.items())
+        assert counters[('handle_spam', 'spam')] == {'sections': 1, 'lines': 4, 'matches': 2, 'rewrites': 2}
+        assert counters[('handle_foo', 'foo')] == {'sections': 1, 'lines': 4, 'matches': 1, 'rewrites': 1}
+        assert counters[('handle_spam_and_space', r'ham\s+')]['matches'] == 1
+        assert stats.sections['%build'][:2] == [1, 4]
+
+    def test_merge_and_json(self):
+        stats, other = ConversionStats(), ConversionStats()
+        Transformer({'stats': stats}).transform('Name: spam\n%build\nmake\n')
+        Transformer({'stats': other}).transform('Name: eggs\n%build\nmake\n')
+        other.add_cached_spec()
+        stats.merge(other)
+        data = json.loads(stats.to_json())
+        assert data['totals']['specs'] == 3
+        assert data['totals']['cached'] == 1
+        assert data['sections']['%build']['count'] == 2
+        assert 'insert_scl_init' in stats.format_table()
+
+    def test_convert_path_collects_stats_separately(self, tmpdir):
+        path = tmpdir.join('spam.spec')
+        path.write('Name: spam\n%build\nmake\n')
+        options = default_options(stats=ConversionStats())
+        result = batch.convert_path(str(path), options)
+        assert result['stats'].totals['specs'] == 1
+        assert options['stats'].totals['specs'] == 0
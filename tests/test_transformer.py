@@ -6,11 +6,24 @@ import pytest
 
 from spec2scl import settings
 from spec2scl.decorators import matches
-from spec2scl.transformer import Transformer
+from spec2scl.dispatch import OneLinerDispatcher
+from spec2scl import transformer
+from spec2scl.transformer import MetaTransformer, Transformer
 from spec2scl.specfile import Specfile
 
 from tests.transformer_test_case import TransformerTestCase, scl_enable, scl_disable
 
+class CountingPattern(object):
+    """Compiled pattern which remembers where it was searched from."""
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.positions = []
+
+    def search(self, text, pos=0, endpos=None):
+        self.positions.append(pos)
+        return self.pattern.search(text, pos, len(text) if endpos is None else endpos)
+
+
 class SpamTransformer(Transformer):
     """This is a testing class to test various Transformer methods"""
     def __init__(self, options={}):
@@ -78,6 +91,27 @@ class TestTransformer(TransformerTestCase):
     def test_find_whole_commands(self, pattern, spec, expected):
         assert self.t.find_whole_commands(pattern, spec) == expected
 
+    @pytest.mark.parametrize(('pattern', 'spec', 'expected'), [
+        (re.compile(r'eat spam'), 'eat spam\neat eat spam', [(0, 9), (9, 21)]),
+        (re.compile(r'eat spam'), 'x\n# eat spam\neat spam \\\n and ham\n', [(13, 33)]),
+        (re.compile(r'ham\s+'), 'ham\n\nham \\', [(0, 4), (5, 10)]),
+    ])
+    def test_find_command_spans(self, pattern, spec, expected):
+        assert self.t.find_command_spans(pattern, spec) == expected
+
+    def make_install_section(self, lines):
+        cmds = ['make install DESTDIR=%{{buildroot}} N={0}', 'install -m 644 foo{0} %{{buildroot}}',
+                'perl -pi -e "s/a/b/" file{0} \\', '  more{0}', '# make nothing{0}']
+        return '%install\n' + '\n'.join(cmds[i % len(cmds)].format(i) for i in range(lines)) + '\n'
+
+    def test_find_command_spans_is_linear(self):
+        pattern = CountingPattern(re.compile(r'^(make|perl)\s+', re.MULTILINE))
+        spans = self.t.find_command_spans(pattern, self.make_install_section(50000))
+        assert len(spans) == 20000
+        # one search per command, each one starting where the previous command ended
+        assert len(pattern.positions) == len(spans) + 1
+        assert pattern.positions[1:] == [end for start, end in spans]
+
     # ========================= tests for methods that apply to Transformer subclasses
 
     def test_collect_transformer_methods(self):
@@ -89,6 +123,25 @@ class TestTransformer(TransformerTestCase):
         assert one_line.count(False) == self.st._transformer_more_liners
         # TODO: check sections
 
+    def test_rule_table_is_shared_by_instances(self):
+        other = SpamTransformer({'skip_functions': ['handle_foo']})
+        assert self.st.get_rules('%prep') is SpamTransformer().get_rules('%prep')
+        assert other.get_rules('%prep') is not self.st.get_rules('%prep')
+        assert other.get_rules('%prep') is SpamTransformer.get_rule_table(['handle_foo'])['%prep']
+
+    @pytest.mark.parametrize(('section', 'skip', 'one_liners', 'more_liners'), [
+        ('%prep', [], ['handle_spam', 'handle_foo'], ['handle_global_spam', 'handle_global_foo',
+                                                      'handle_simple_global_looney', 'handle_spam_and_space']),
+        ('%prep', ['handle_foo', 'handle_global_spam'], ['handle_spam'],
+         ['handle_global_foo', 'handle_simple_global_looney', 'handle_spam_and_space']),
+        ('%files', [], [], []),
+        ('%nonexistent', [], [], []),
+    ])
+    def test_rule_table_sections(self, section, skip, one_liners, more_liners):
+        rules = SpamTransformer.get_rule_table(skip)[section]
+        assert [r.name for r in rules.one_liners] == one_liners
+        assert [r.name for r in rules.more_liners] == more_liners
+
     @pytest.mark.parametrize(('spec', 'expected'), [
         ('nothing to do', 'nothing to do'),
         ('foo', 'handled foo'),
@@ -119,6 +172,30 @@ class TestTransformer(TransformerTestCase):
     def test_transformers_dont_apply_scl_enable_twice(self, spec, expected):
         assert self.st.transform_more_liners(spec, '%prep', spec) == expected
 
+    @pytest.mark.parametrize(('spec', 'expected'), [
+        ('looney\nlooney', scl_enable + 'looney\n' + scl_disable + scl_enable + 'looney\n' + scl_disable),
+        ('looney x\n# looney x\nlooney', scl_enable + 'looney x\n' + scl_disable + '# looney x\n' +
+         scl_enable + 'looney\n' + scl_disable),
+    ])
+    def test_sclize_all_commands_wraps_each_occurrence_once(self, spec, expected):
+        assert self.st.sclize_all_commands(re.compile(r'looney'), spec) == expected
+
+    def test_sclize_all_commands_is_linear(self, monkeypatch):
+        pattern = CountingPattern(re.compile(r'^(make|perl)\s+', re.MULTILINE))
+        wrapped = []
+        sclize_one_command = self.t.sclize_one_command
+
+        def count_wrapped(command):
+            wrapped.append(command)
+            return sclize_one_command(command)
+
+        monkeypatch.setattr(self.t, 'sclize_one_command', count_wrapped)
+        assert self.t.sclize_all_commands(pattern, self.make_install_section(50000)).count(scl_enable) == 20000
+        # one search and one wrapping per command, the text isn't searched again after wrapping
+        assert len(wrapped) == 20000
+        assert len(pattern.positions) == 20001
+        assert pattern.positions == sorted(pattern.positions)
+
     def test_one_line_pattern_endswith_arbitrary_space_doesnt_hang(self):
         # if one line pattern ends with \s+, then it might match multiple \n
         # therefore it won't get found in lines.split in find_whole_commands
@@ -143,3 +220,112 @@ class TestTransformer(TransformerTestCase):
     def test_transformer_skips_transformer_functions_if_requested(self):
         t = Transformer(options={'skip_functions': ['handle_foo', 'insert_scl_init']})
         assert str(t.transform('foo')) == 'foo'
+
+    def test_tree_is_kept_only_during_transform(self):
+        trees = []
+
+        class NameTransformer(Transformer):
+            def _transform(self, original_spec, spec):
+                trees.append(self.tree)
+                return spec
+
+        t = Transformer(options={'transformers': ['name']})
+        subtransformers = [NameTransformer(options=t.options), NameTransformer(options=t.options)]
+        t.transform('Name: spam\n', transformers=subtransformers)
+        assert trees[0] is trees[1] and trees[0].text == 'Name: spam\n'
+        assert [t.tree] + [s.tree for s in subtransformers] == [None, None, None]
+
+    @pytest.mark.parametrize(('spec', 'skip_functions', 'transformers', 'expected'), [
+        ('Name: spam\n', [], None, ('generic', 'handle_name_tag', '%header')),
+        ('Name: spam\n', ['handle_name_tag'], None, ('generic', 'insert_scl_init', '%header')),
+        ('Name: spam\n', ['insert_scl_init', 'handle_name_tag'], None, None),
+        ('Name: spam\r\n%build\r\nmake\r\n', ['insert_scl_init', 'handle_name_tag'], None, None),
+        ('Summary: spam\n%build\n%{__perl} Makefile.PL\n', ['insert_scl_init'], None,
+         ('perl', 'handle_perl_specific_commands', '%build')),
+        ('Summary: spam\n%build\n%{__perl} Makefile.PL\n', ['insert_scl_init'], ['generic'], None),
+    ])
+    def test_first_change(self, spec, skip_functions, transformers, expected):
+        t = Transformer(options={'skip_functions': skip_functions, 'transformers': transformers})
+        assert t.first_change(spec) == expected
+
+    @pytest.mark.parametrize('spec', [
+        'Name: spam\n%build\n%configure\nmake %{?_smp_mflags}\n\n%install\nmake install\n',
+        'Name: spam\n%build\n%{__perl} Makefile.PL\n./Build\n%check\n./Build test',
+        'Name: spam\n%build\n%{__python} setup.py build\n\n\n%check\nnosetests \\\n  -v\n',
+        'Name: spam\n%install\ngem install -V \\\n  --force x.gem\nrspec spec\n# rspec spec\n',
+        'Name: spam\n%build\n%{__php} x\n%{__pecl} y\nR CMD INSTALL .\necho done\n',
+    ])
+    def test_fused_engine_is_same_as_sequential(self, spec):
+        sequential = str(Transformer().transform(spec))
+        assert str(Transformer(options={'fused': True}).transform(spec)) == sequential
+
+    def test_fused_engine_wraps_commands_once(self):
+        spec = '%build\n%{__perl} Makefile.PL && %{__python} setup.py build\n'
+        converted = str(Transformer(options={'fused': True}).transform(spec))
+        assert converted.count(scl_enable) == 1
+        assert '%build\n' + scl_enable + '%{__perl} Makefile.PL' in converted
+
+    def test_fused_engine_without_combined_pattern(self, monkeypatch):
+        spec = 'Name: spam\n%build\n./Build \\\n  && R CMD x\nmake install\n'
+        expected = str(Transformer(options={'fused': True}).transform(spec))
+        monkeypatch.setattr(transformer, '_wrapping_patterns', {})
+        monkeypatch.setattr(transformer, 'combinable_source', lambda pattern: None)
+        assert str(Transformer(options={'fused': True}).transform(spec)) == expected
+        assert expected.count(scl_enable) == 2
+
+    @pytest.mark.parametrize('spec', [
+        'Name: spam\nRequires: eggs\nBuildRequires: ham\n%build\n%configure\nmake\n%install\nmake install\n',
+        'Name: spam\n# Requires: eggs\nSummary: Provides: x\n  Requires: eggs\nConflicts: y\n',
+        'Name: spam\r\nRequires: eggs\r\n%build\r\n%{__python} setup.py build \\\r\n -v\r\n',
+        'Name: spam\n%package -n x\nRequires: %{name}\n%check\n./Build test \\\n\n%files\n%{_bindir}/x\n',
+    ])
+    @pytest.mark.parametrize('fused', [False, True])
+    def test_tree_is_same_as_text(self, monkeypatch, spec, fused):
+        options = {'fused': fused, 'scl_deps': ['eggs']}
+        expected = str(Transformer(options=dict(options)).transform(spec))
+        monkeypatch.setattr(Transformer, '_tree_section', lambda self, section: False)
+        assert str(Transformer(options=dict(options)).transform(spec)) == expected
+
+    def test_tag_lines_from_tree(self, monkeypatch):
+        scanned = []
+        original_scan = OneLinerDispatcher._scan
+        monkeypatch.setattr(OneLinerDispatcher, '_scan',
+                            lambda self, scanner, text: scanned.append(scanner) or original_scan(self, scanner, text))
+        converted = str(Transformer().transform('Name: spam\nRequires: eggs\nProvides: ham\n'))
+        assert 'Requires: %{?scl_prefix}eggs' in converted
+        assert not [scanner for scanner in scanned if 'Requires:' in scanner.pattern]
+
+    def test_pass_through_sections(self):
+        spec = 'Name: spam\n%install\ncp %{name} %{buildroot}\n\n%changelog\n* Spam - %{name}\n'
+        converted = Transformer().transform(spec)
+        passed = Transformer(options={'pass_through_sections': ['%changelog']}).transform(spec)
+        assert passed.sections[:-1] == converted.sections[:-1]
+        assert converted.sections[-1].text == '%changelog\n* Spam - %{pkg_name}'
+        assert passed.sections[-1].text == '%changelog\n* Spam - %{name}'
+        assert passed.sections[-1].modified is None
+
+    def test_pass_through_sections_first_change(self):
+        spec = '%changelog\n* Spam - %{name}\n'
+        options = {'skip_functions': ['insert_scl_init']}
+        assert Transformer(options=dict(options)).first_change(spec) is not None
+        options['pass_through_sections'] = ['%changelog']
+        assert Transformer(options=options).first_change(spec) is None
+
+
+class TestMetaTransformer(object):
+    @pytest.mark.parametrize(('meta_name', 'name', 'version'), [
+        ('rh-Python36', 'rh-python', '36'),
+        ('spam', 'spam', '2014'),
+    ])
+    def test_meta_name_and_version(self, meta_name, name, version):
+        data = MetaTransformer(meta_name)
+        assert (data.meta_name, data.meta_version) == (name, version)
+
+    def test_variables(self):
+        data = MetaTransformer('spam1', 'A=1,B=2')
+        assert data.variables == {'A': '1', 'B': '2'}
+        assert data.variables is data.variables
+
+    def test_packager_identity_is_resolved_once(self, monkeypatch):
+        monkeypatch.setattr(transformer, '_packager', 'Spam <spam@eggs.org>')
+        assert MetaTransformer('spam1').packager_data.endswith(' Spam <spam@eggs.org>')